@@ -6,16 +6,41 @@ Central access point for all security tools with authentication and HTTPS
 
 import os
 import json
+import importlib.util
+import bisect
+import re
 import subprocess
 import logging
 from datetime import datetime
-from flask import Flask, render_template, jsonify, request, redirect, url_for, flash
+from flask import (Flask, Response, render_template, jsonify, request, redirect, url_for,
+                   flash, stream_with_context)
 from flask_cors import CORS
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 import signal
 import sys
 import ssl
+import tempfile
+
+import psutil
+
+from changelog_store import (ChangelogJournal, SQLiteChangelogStore, ChangelogIndex,
+                             ChangelogStats, ChangelogWriter, SecurityEventStream,
+                             SEVERITIES)
+from container_metrics import ContainerMetricsCollector
+from host_metrics import HostMetricsSampler
+from network_topology import NetworkTopology
+from push_channel import PushBroadcaster
+from rule_inventory import RuleInventory, SigmaRuleIndex, parse_sigma, parse_yara
+import yara_engine
+from yara_engine import ScanResultCache, YaraRulesetCache
+from yara_jobs import ScanJobManager
+from sigma_converter import SigmaConverter
+from timeseries_store import TimeSeriesStore, WINDOWS as TREND_WINDOWS
+from docker_client import (DockerClient, DockerAPIError, format_ports, format_size,
+                           socket_path_from_env)
+from shared_state import connect_state, serve_state
 
 # Configure logging
 logging.basicConfig(
@@ -35,123 +60,616 @@ CORS(app)
 PORT = int(os.environ.get('PORT', 5500))
 HTTPS_PORT = int(os.environ.get('HTTPS_PORT', 5443))
 CHANGELOG_FILE = 'changelog.json'
+CHANGELOG_BACKEND = os.environ.get('CHANGELOG_BACKEND', 'journal').lower()
+CHANGELOG_DIR = os.environ.get('CHANGELOG_DIR', 'changelog')
+CHANGELOG_DB = os.environ.get('CHANGELOG_DB', 'changelog.db')
+# Journal used when the configured changelog storage cannot be opened
+CHANGELOG_FALLBACK_DIR = os.environ.get(
+    'CHANGELOG_FALLBACK_DIR', os.path.join(tempfile.gettempdir(), 'cyberblue-changelog'))
+CHANGELOG_SEGMENT_BYTES = int(os.environ.get(
+    'CHANGELOG_SEGMENT_BYTES', 8 * 1024 * 1024))
+CHANGELOG_FSYNC_BATCH = int(os.environ.get('CHANGELOG_FSYNC_BATCH', 50))
+CHANGELOG_FSYNC_INTERVAL = float(
+    os.environ.get('CHANGELOG_FSYNC_INTERVAL', 1.0))
+CHANGELOG_QUEUE_SIZE = int(os.environ.get('CHANGELOG_QUEUE_SIZE', 10000))
+CHANGELOG_COMMIT_BATCH = int(os.environ.get('CHANGELOG_COMMIT_BATCH', 500))
+CHANGELOG_COMMIT_INTERVAL_MS = int(
+    os.environ.get('CHANGELOG_COMMIT_INTERVAL_MS', 200))
+CHANGELOG_HOT_DAYS = float(os.environ.get('CHANGELOG_HOT_DAYS', 7))
+CHANGELOG_HOT_ENTRIES = int(os.environ.get('CHANGELOG_HOT_ENTRIES', 50000))
+CHANGELOG_RETENTION_DAYS = float(
+    os.environ.get('CHANGELOG_RETENTION_DAYS', 0))
+CHANGELOG_ARCHIVE_COMPRESSION = os.environ.get(
+    'CHANGELOG_ARCHIVE_COMPRESSION', 'gzip')
+CHANGELOG_COMPACT_INTERVAL = int(
+    os.environ.get('CHANGELOG_COMPACT_INTERVAL', 600))
+CHANGELOG_COALESCE_WINDOW = float(
+    os.environ.get('CHANGELOG_COALESCE_WINDOW', 60))
+CHANGELOG_COALESCE_ACTIONS = [
+    action.strip() for action in
+    os.environ.get('CHANGELOG_COALESCE_ACTIONS', 'api_call').split(',')
+    if action.strip()]
+CHANGELOG_SAMPLE_RATES = {
+    item.split('=', 1)[0].strip(): float(item.split('=', 1)[1])
+    for item in os.environ.get('CHANGELOG_SAMPLE_RATES', '').split(',')
+    if '=' in item}
 CONTAINER_STATUS_FILE = 'container_status.json'
+DOCKER_SOCKET = os.environ.get(
+    'DOCKER_SOCKET', socket_path_from_env(os.environ.get('DOCKER_HOST')))
+DOCKER_API_POOL_SIZE = int(os.environ.get('DOCKER_API_POOL_SIZE', 4))
+DOCKER_API_TIMEOUT = float(os.environ.get('DOCKER_API_TIMEOUT', 10))
+DOCKER_EVENTS_ENABLED = os.environ.get(
+    'DOCKER_EVENTS_ENABLED', 'true').lower() == 'true'
+DOCKER_RECONCILE_INTERVAL = int(os.environ.get('DOCKER_RECONCILE_INTERVAL', 300))
+DOCKER_EVENTS_MAX_BACKOFF = int(os.environ.get('DOCKER_EVENTS_MAX_BACKOFF', 60))
+CONTAINER_SNAPSHOT_TTL = float(os.environ.get('CONTAINER_SNAPSHOT_TTL', 5))
+BULK_CONTROL_WORKERS = int(os.environ.get('BULK_CONTROL_WORKERS', 4))
+CONTAINER_METRICS_ENABLED = os.environ.get(
+    'CONTAINER_METRICS_ENABLED', 'true').lower() == 'true'
+CONTAINER_METRICS_SOURCE = os.environ.get('CONTAINER_METRICS_SOURCE', 'docker').lower()
+CONTAINER_METRICS_INTERVAL = float(os.environ.get('CONTAINER_METRICS_INTERVAL', 10))
+CONTAINER_METRICS_HISTORY = int(os.environ.get('CONTAINER_METRICS_HISTORY', 360))
+CGROUP_ROOT = os.environ.get('CGROUP_ROOT', '/sys/fs/cgroup')
+HOST_METRICS_INTERVAL = float(os.environ.get('HOST_METRICS_INTERVAL', 2))
+PUSH_INTERVAL = float(os.environ.get('PUSH_INTERVAL', 2))
+PUSH_HEARTBEAT = float(os.environ.get('PUSH_HEARTBEAT', 15))
+TRENDS_ENABLED = os.environ.get('TRENDS_ENABLED', 'true').lower() == 'true'
+TRENDS_DIR = os.environ.get('TRENDS_DIR', 'trends')
+TRENDS_SAMPLE_INTERVAL = float(os.environ.get('TRENDS_SAMPLE_INTERVAL', 10))
+# Container events that can change what the portal shows for a container
+DOCKER_CONTAINER_EVENTS = ["create", "start", "restart", "die", "stop", "kill",
+                           "pause", "unpause", "destroy", "rename", "health_status"]
+# Network events that change the network topology
+DOCKER_NETWORK_EVENTS = ["create", "connect", "disconnect", "destroy", "remove"]
 SSL_CERT_PATH = os.environ.get('SSL_CERT_PATH', './ssl/cert.pem')
 SSL_KEY_PATH = os.environ.get('SSL_KEY_PATH', './ssl/key.pem')
 ENABLE_HTTPS = os.environ.get('ENABLE_HTTPS', 'true').lower() == 'true'
+# 'gunicorn' serves requests from worker processes, 'development' runs the
+# Werkzeug servers in threads of the main process
+PORTAL_SERVER = os.environ.get('PORTAL_SERVER', 'gunicorn').lower()
+PORTAL_WORKERS = int(os.environ.get('PORTAL_WORKERS', min(4, os.cpu_count() or 1)))
+PORTAL_THREADS = int(os.environ.get('PORTAL_THREADS', 16))
+PORTAL_MAX_REQUESTS = int(os.environ.get('PORTAL_MAX_REQUESTS', 5000))
+PORTAL_WORKER_TIMEOUT = int(os.environ.get('PORTAL_WORKER_TIMEOUT', 60))
+PORTAL_STATE_SOCKET = os.environ.get('PORTAL_STATE_SOCKET', '/tmp/cyberblue-portal-state.sock')
+# Set by the main process for its workers; a worker uses the shared state
+# process instead of creating its own managers
+PORTAL_STATE_AUTHKEY = os.environ.get('PORTAL_STATE_AUTHKEY')
+# multiprocessing imports the portal script as __mp_main__ in the fork server
+# of the scan and conversion pools; those processes need none of its state
+POOL_PROCESS = __name__ == '__mp_main__'
+
+# Hunting rule repositories
+YARA_RULES_DIR = os.environ.get('YARA_RULES_DIR', '/opt/yara-rules')
+SIGMA_RULES_DIR = os.environ.get('SIGMA_RULES_DIR', '/opt/sigma-rules')
+RULE_INVENTORY_CHECK_INTERVAL = float(os.environ.get('RULE_INVENTORY_CHECK_INTERVAL', 30))
+# Parsed Sigma rules, reused across restarts so only changed files are parsed
+SIGMA_RULE_STORE = os.environ.get('SIGMA_RULE_STORE', 'sigma-cache/rules.json')
+# Saved compiled YARA rulesets, shared by all workers
+YARA_CACHE_DIR = os.environ.get('YARA_CACHE_DIR', 'yara-cache')
+YARA_CACHE_RULESETS = int(os.environ.get('YARA_CACHE_RULESETS', 16))
+# Per-file limit of in-process scans (the whole scan with the yara CLI)
+YARA_SCAN_TIMEOUT = int(os.environ.get('YARA_SCAN_TIMEOUT', 60))
+# Scan results by file content digest and ruleset version
+YARA_RESULT_CACHE = os.environ.get('YARA_RESULT_CACHE', os.path.join(YARA_CACHE_DIR, 'results.db'))
+# Background scan jobs: state, matches and scanned-file ledgers
+YARA_JOBS_DIR = os.environ.get('YARA_JOBS_DIR', 'yara-jobs')
+# Scan worker processes (0 = one per CPU)
+YARA_SCAN_WORKERS = int(os.environ.get('YARA_SCAN_WORKERS', 0))
+YARA_JOBS_RETAINED = int(os.environ.get('YARA_JOBS_RETAINED', 50))
+# pySigma conversion workers (0 = min(4, CPUs)) and their output cache
+SIGMA_CONVERT_WORKERS = int(os.environ.get('SIGMA_CONVERT_WORKERS', 0))
+SIGMA_CONVERT_CACHE = os.environ.get('SIGMA_CONVERT_CACHE', 'sigma-cache/conversions.db')
+# Backend loaded by every conversion worker at startup
+SIGMA_DEFAULT_TARGET = os.environ.get('SIGMA_DEFAULT_TARGET', 'opensearch_lucene')
+
+# Changelog keywords that mark an entry as a security event
+SECURITY_EVENT_KEYWORDS = ["container_stopped",
+                           "container_started", "error", "failed", "warning"]
+# Security events kept in memory per severity
+SECURITY_EVENTS_RETAINED = int(os.environ.get('SECURITY_EVENTS_RETAINED', 1000))
 
 # Global flag for graceful shutdown
 shutdown_flag = False
+# gunicorn server processes started by serve_gunicorn()
+web_servers = []
+
+
+def stop_web_servers():
+    """Terminate the gunicorn servers and wait for their workers to finish"""
+    for server in web_servers:
+        if server.poll() is None:
+            server.terminate()
+    for server in web_servers:
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def shutdown():
+    """Stop serving requests, then every component, flushing the changelog last.
+
+    Web servers go first so no request adds entries to a closed changelog,
+    and each component is closed on its own so one failure does not skip
+    the others or the changelog flush. Runs once, whichever path gets here
+    first.
+    """
+    global shutdown_flag
+    if shutdown_flag:
+        return
+    shutdown_flag = True
+    try:
+        for close in (stop_web_servers, host_metrics.stop, trends_store.close,
+                      yara_jobs.close, sigma_converter.close):
+            try:
+                close()
+            except Exception as e:
+                logger.error(f"Error during shutdown: {e}")
+    finally:
+        changelog_manager.close()
 
 
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
-    global shutdown_flag
     logger.info(f"Received signal {signum}, initiating graceful shutdown...")
-    shutdown_flag = True
+    shutdown()
     sys.exit(0)
 
 
-# Register signal handlers
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
+# Register signal handlers (gunicorn installs its own in workers, pool
+# processes set theirs in their initializers)
+if not PORTAL_STATE_AUTHKEY and not POOL_PROCESS:
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
 
 
 class ChangelogManager:
     """Manages changelog entries for all system activities"""
 
-    def __init__(self, changelog_file):
+    def __init__(self, changelog_file, backend=CHANGELOG_BACKEND):
         self.changelog_file = changelog_file
+        self.backend = backend
+        self.storage = None
+        self.storage_error = None
+        self.writer = None
+        self.last_id = 0
+        self._lock = threading.RLock()
+        self.index = ChangelogIndex()
+        self.stats = ChangelogStats()
+        self.security_events = SecurityEventStream(
+            SECURITY_EVENT_KEYWORDS, max_events=SECURITY_EVENTS_RETAINED)
+        self._stopping = threading.Event()
+        self._coalescing = {}
+        self._coalesce_dirty = set()
+        self._sample_seen = {}
         self.load_changelog()
+        self.compaction_thread = threading.Thread(
+            target=self._compaction_loop, name='changelog-compaction', daemon=True)
+        self.compaction_thread.start()
+        self.coalesce_thread = threading.Thread(
+            target=self._coalesce_loop, name='changelog-coalesce', daemon=True)
+        self.coalesce_thread.start()
 
     def load_changelog(self):
-        """Load existing changelog from file"""
+        """Load the hot tier of the changelog storage, importing legacy JSON once.
+
+        If the configured storage cannot be opened or read, entries are kept
+        in a journal under CHANGELOG_FALLBACK_DIR and /health reports the
+        changelog as degraded. Startup fails if that journal fails too.
+        """
         try:
-            if os.path.exists(self.changelog_file):
-                with open(self.changelog_file, 'r') as f:
-                    self.changelog = json.load(f)
-            else:
-                self.changelog = {
-                    "entries": [],
-                    "metadata": {
-                        "created": datetime.now().isoformat(),
-                        "version": "1.0.0",
-                        "total_entries": 0
-                    }
-                }
-                self.save_changelog()
+            self._load(self._open_storage(), import_legacy=True)
         except Exception as e:
-            logger.error(f"Error loading changelog: {e}")
-            self.changelog = {"entries": [], "metadata": {
-                "created": datetime.now().isoformat(), "version": "1.0.0", "total_entries": 0}}
+            logger.error(f"Error loading changelog from {self.backend} storage: {e}")
+            self.storage_error = str(e)
+            if self.storage:
+                try:
+                    self.storage.close()
+                except Exception:
+                    pass
+            logger.warning(f"Recording changelog entries in fallback journal {CHANGELOG_FALLBACK_DIR}")
+            self._load(ChangelogJournal(CHANGELOG_FALLBACK_DIR), import_legacy=False)
+
+    def _load(self, storage, import_legacy):
+        """Read the hot tier of ``storage`` and start its background writer"""
+        self.storage = storage
+        if import_legacy and storage.last_id == 0 and os.path.exists(self.changelog_file):
+            storage.import_legacy(self.changelog_file)
+        self._compact_storage()
+
+        # Coalesced entries are stored once per update; keep the latest
+        latest = {}
+        for entry in storage.read_hot():
+            latest[entry["id"]] = entry
+        hot_first_id = storage.hot_first_id
+        entries = sorted(
+            (entry for entry in latest.values()
+             if hot_first_id is None or entry["id"] >= hot_first_id),
+            key=lambda entry: entry["id"])
+        self.last_id = storage.last_id
+        self.index.rebuild(entries)
+        self.stats.rebuild(entries, archived=storage.archived_counts())
+        self.security_events.rebuild(entries)
+        self.changelog = {
+            "entries": entries,
+            "metadata": {
+                "created": storage.created,
+                "version": "1.0.0",
+                "total_entries": self.stats.total
+            }
+        }
+        self.writer = ChangelogWriter(
+            storage,
+            max_queue=CHANGELOG_QUEUE_SIZE,
+            batch_size=CHANGELOG_COMMIT_BATCH,
+            batch_interval=CHANGELOG_COMMIT_INTERVAL_MS / 1000.0
+        )
+
+    def storage_status(self):
+        """Storage backend in use and why, if it is the fallback journal"""
+        return {
+            "backend": 'journal' if self.storage_error else self.backend,
+            "fallback": self.storage_error is not None,
+            "error": self.storage_error
+        }
+
+    def _open_storage(self):
+        """Create the configured storage engine"""
+        if self.backend == 'sqlite':
+            return SQLiteChangelogStore(CHANGELOG_DB)
+        if self.backend != 'journal':
+            logger.warning(
+                f"Unknown changelog backend '{self.backend}', using journal")
+        return ChangelogJournal(
+            CHANGELOG_DIR,
+            segment_max_bytes=CHANGELOG_SEGMENT_BYTES,
+            fsync_batch=CHANGELOG_FSYNC_BATCH,
+            fsync_interval=CHANGELOG_FSYNC_INTERVAL
+        )
 
     def save_changelog(self):
-        """Save changelog to file"""
+        """Flush pending changelog entries to disk"""
+        try:
+            if self.storage:
+                self.storage.flush()
+        except Exception as e:
+            logger.error(f"Error saving changelog: {e}")
+
+    def _compact_storage(self):
+        """Apply the retention policy to the storage engine"""
+        return self.storage.compact(
+            hot_days=CHANGELOG_HOT_DAYS,
+            hot_entries=CHANGELOG_HOT_ENTRIES,
+            retention_days=CHANGELOG_RETENTION_DAYS,
+            compression=CHANGELOG_ARCHIVE_COMPRESSION
+        )
+
+    def compact(self):
+        """Archive segments past the hot window and drop them from memory"""
+        if not self.storage:
+            return
+        archived, expired = self._compact_storage()
+        if not archived and not expired:
+            return
+
+        with self._lock:
+            for segment in expired:
+                self.stats.discard(segment["count"], segment.get("levels", {}),
+                                   segment.get("actions", {}))
+            hot_first_id = self.storage.hot_first_id
+            if hot_first_id is not None:
+                pos = bisect.bisect_left(self.index.ids, hot_first_id)
+                if pos:
+                    del self.changelog["entries"][:pos]
+                    self.index.rebuild(self.changelog["entries"])
+            self.changelog["metadata"]["total_entries"] = self.stats.total
+
+    def _compaction_loop(self):
+        """Periodically enforce changelog retention"""
+        while not self._stopping.wait(CHANGELOG_COMPACT_INTERVAL):
+            try:
+                self.compact()
+            except Exception as e:
+                logger.error(f"Error compacting changelog: {e}")
+
+    def _coalesce_loop(self):
+        """Persist coalesced counts once their window closes, even when idle"""
+        while not self._stopping.wait(min(1.0, max(CHANGELOG_COALESCE_WINDOW, 0.1))):
+            try:
+                with self._lock:
+                    self._flush_coalesced()
+            except Exception as e:
+                logger.error(f"Error flushing coalesced changelog entries: {e}")
+
+    def close(self):
+        """Flush queued entries and close the storage (shutdown hook)"""
+        self._stopping.set()
+        try:
+            with self._lock:
+                self._flush_coalesced(force=True)
+            if self.writer:
+                self.writer.stop()
+            if self.storage:
+                self.storage.close()
+            logger.info("Changelog flushed and closed")
+        except Exception as e:
+            logger.error(f"Error closing changelog: {e}")
+
+    def _sampled_out(self, action):
+        """Deterministically keep 1 in every 1/rate entries of a sampled action"""
+        rate = CHANGELOG_SAMPLE_RATES.get(action)
+        if rate is None or rate >= 1:
+            return False
+        every = max(1, round(1 / rate)) if rate > 0 else None
+        seen = self._sample_seen.get(action, 0)
+        self._sample_seen[action] = seen + 1
+        return every is None or seen % every != 0
+
+    def _submit(self, entry, update=False):
+        """Hand a copy of an entry (or of an update to a stored one) to the writer"""
         try:
-            with open(self.changelog_file, 'w') as f:
-                json.dump(self.changelog, f, indent=2)
+            if self.writer:
+                self.writer.submit(dict(entry), update=update)
         except Exception as e:
             logger.error(f"Error saving changelog: {e}")
 
+    def _flush_coalesced(self, now=None, force=False):
+        """Persist updated coalesced entries and close expired windows"""
+        now = now or datetime.now()
+        for key, (entry, first_seen) in list(self._coalescing.items()):
+            expired = (now - first_seen).total_seconds() >= CHANGELOG_COALESCE_WINDOW
+            if entry["id"] in self._coalesce_dirty and (expired or force):
+                self._submit(entry, update=True)
+                self._coalesce_dirty.discard(entry["id"])
+            if expired:
+                del self._coalescing[key]
+
+    def _coalesce(self, key, now):
+        """Fold a repeat of a recent identical entry into it, if there is one"""
+        current = self._coalescing.get(key)
+        if current is None:
+            return None
+        entry, first_seen = current
+        if (now - first_seen).total_seconds() >= CHANGELOG_COALESCE_WINDOW:
+            return None
+        entry.setdefault("first_timestamp", entry["timestamp"])
+        entry["count"] = entry.get("count", 1) + 1
+        entry["last_timestamp"] = now.isoformat()
+        self._coalesce_dirty.add(entry["id"])
+        return entry
+
     def add_entry(self, action, details, user="system", level="info"):
-        """Add a new changelog entry"""
-        entry = {
-            "timestamp": datetime.now().isoformat(),
-            "action": action,
-            "details": details,
-            "user": user,
-            "level": level,
-            "id": len(self.changelog["entries"]) + 1
-        }
+        """Add a new changelog entry.
+
+        Repeats of a high-frequency action (``CHANGELOG_COALESCE_ACTIONS``)
+        within ``CHANGELOG_COALESCE_WINDOW`` seconds are folded into the first
+        entry with a count and first/last timestamps, and actions listed in
+        ``CHANGELOG_SAMPLE_RATES`` are only recorded at their sampling rate.
+        """
+        with self._lock:
+            now = datetime.now()
+            coalesce_key = None
+            if action in CHANGELOG_COALESCE_ACTIONS and CHANGELOG_COALESCE_WINDOW > 0:
+                coalesce_key = (action, details, user, level)
+                entry = self._coalesce(coalesce_key, now)
+                if entry is not None:
+                    self.stats.note_suppressed(action)
+                    return entry
+
+            if self._sampled_out(action):
+                self.stats.note_suppressed(action)
+                return {
+                    "timestamp": now.isoformat(),
+                    "action": action,
+                    "details": details,
+                    "user": user,
+                    "level": level,
+                    "sampled": True
+                }
+
+            self.last_id += 1
+            entry = {
+                "timestamp": now.isoformat(),
+                "action": action,
+                "details": details,
+                "user": user,
+                "level": level,
+                "id": self.last_id
+            }
 
-        self.changelog["entries"].append(entry)
-        self.changelog["metadata"]["total_entries"] = len(
-            self.changelog["entries"])
-        self.save_changelog()
+            self.changelog["entries"].append(entry)
+            self.index.add(entry)
+            self.stats.add(entry, when=now)
+            self.security_events.add(entry)
+            self.changelog["metadata"]["total_entries"] = self.stats.total
+            if coalesce_key is not None:
+                self._coalescing[coalesce_key] = (entry, now)
+
+            # Submitted under the lock so storage receives ids in order
+            self._submit(entry)
 
         logger.info(f"Changelog entry added: {action} - {details}")
         return entry
 
-    def get_entries(self, limit=None, level=None):
-        """Get changelog entries with optional filtering"""
-        entries = self.changelog["entries"]
+    def writer_metrics(self):
+        """Changelog writer queue depth and commit counters"""
+        return self.writer.metrics() if self.writer else {}
 
-        if level:
-            entries = [e for e in entries if e["level"] == level]
+    def entry_count(self):
+        """Number of entries in the hot tier"""
+        return len(self.changelog["entries"])
 
-        if limit:
-            entries = entries[-limit:]
+    def latest_id(self):
+        """Id of the most recently added entry"""
+        return self.last_id
 
+    def get_entries(self, limit=None, level=None, **filters):
+        """Get changelog entries with optional filtering"""
+        entries, _ = self.query_entries(limit=limit, level=level, **filters)
         return entries
 
+    def query_entries(self, limit=None, level=None, action=None, user=None,
+                      text=None, since=None, until=None, before=None,
+                      keywords=None):
+        """Query entries through the secondary index.
+
+        Returns the newest ``limit`` matches (oldest first) together with the
+        cursor for the previous page, or None when there is nothing older.
+        Storage outside the hot tier is only consulted for time range
+        (``since``), cursor or ``keywords`` queries that reach past it.
+        """
+        text = text.lower() if text else None
+        with self._lock:
+            matches, next_cursor = self.index.query(
+                self._lookup, limit=limit, before=before, since=since,
+                until=until, text=text, keywords=keywords, level=level,
+                action=action, user=user)
+            hot_first_id = self.index.ids[0] if self.index.ids else None
+
+        if (limit and len(matches) >= limit) or not self.storage:
+            return matches, next_cursor
+        if not since and before is None and not keywords:
+            return matches, next_cursor
+
+        archive_before = hot_first_id if before is None else min(
+            before, hot_first_id or before)
+        filters = {k: v for k, v in (
+            ("level", level), ("action", action), ("user", user)) if v}
+        older = self.storage.query_archive(
+            filters, limit=limit - len(matches) if limit else None,
+            before=archive_before, since=since, until=until, text=text,
+            keywords=keywords)
+
+        matches = older + matches
+        next_cursor = matches[0]["id"] if limit and len(matches) >= limit else None
+        return matches, next_cursor
+
+    def _lookup(self, entry_id):
+        """Find an in-memory entry by id"""
+        ids = self.index.ids
+        pos = bisect.bisect_left(ids, entry_id)
+        if pos < len(ids) and ids[pos] == entry_id:
+            return self.changelog["entries"][pos]
+        return None
+
+    def entries_since(self, after_id, limit=100):
+        """Entries added after ``after_id`` (oldest first, at most ``limit``)"""
+        with self._lock:
+            pos = bisect.bisect_right(self.index.ids, after_id)
+            return [dict(entry) for entry in self.changelog["entries"][pos:pos + limit]]
+
     def get_stats(self):
         """Get changelog statistics"""
-        entries = self.changelog["entries"]
-        stats = {
-            "total_entries": len(entries),
-            "by_level": {},
-            "by_action": {},
-            "recent_activity": len([e for e in entries if self._is_recent(e["timestamp"])])
+        with self._lock:
+            return self.stats.snapshot()
+
+    def get_security_events(self, since=None, severity=None, limit=20):
+        """Classified security events after ``since``, their statistics and the next cursor"""
+        with self._lock:
+            events, cursor = self.security_events.query(
+                since=since, severity=severity, limit=limit)
+            return events, self.security_events.statistics(), cursor
+
+
+# Map tool names to possible container names (with fallbacks, in order of
+# preference). Each name also matches the Docker Compose container naming
+# scheme ``<project>-<name>-<n>`` for any project, e.g. cyber-blue-test-cortex-1.
+TOOL_CONTAINER_MAP = {
+    "velociraptor": ["velociraptor"],
+    "wazuh": ["wazuh", "wazuh-dashboard", "wazuh.dashboard"],
+    "wazuh-dashboard": ["wazuh", "wazuh-dashboard", "wazuh.dashboard"],
+    "misp": ["misp", "misp-core"],
+    "cyberchef": ["cyberchef"],
+    "thehive": ["thehive"],
+    "cortex": ["cortex"],
+    "fleetdm": ["fleet-server"],
+    "arkime": ["arkime-test", "arkime"],
+    "caldera": ["caldera"],
+    "evebox": ["evebox"],
+    "wireshark": ["wireshark"],
+    "mitre": ["mitre-navigator"],
+    "mitre-navigator": ["mitre-navigator"],
+    "portainer": ["portainer"],
+    "shuffle": ["shuffle-frontend"]
+}
+
+
+# Security tool categories, used for category health and bulk control
+TOOL_CATEGORIES = {
+    "dfir": ["velociraptor"],
+    "siem": ["wazuh", "wazuh-dashboard"],
+    "soar": ["shuffle", "thehive", "cortex", "caldera"],
+    "cti": ["misp", "mitre-navigator"],
+    "ids": ["evebox"],
+    "network analysis": ["wireshark", "arkime"],
+    "utility": ["cyberchef"],
+    "management": ["fleetdm", "portainer"]
+}
+
+# Tools that need other tools up first (started first, stopped last)
+TOOL_DEPENDENCIES = {
+    "wazuh-dashboard": ["wazuh"],
+    "thehive": ["cortex"]
+}
+
+
+class ContainerResolver:
+    """Precompiled tool <-> container name index.
+
+    Candidate names are compiled into exact and Compose-prefix patterns once;
+    the tool/container maps are rebuilt only when the set of container names
+    changes, so resolving a tool is a dict lookup.
+    """
+
+    def __init__(self, tool_map):
+        self.tool_map = tool_map
+        self._rules = {
+            tool: [(name, re.compile(rf'^[\w.-]+[-_]{re.escape(name)}[-_]\d+$'))
+                   for name in names]
+            for tool, names in tool_map.items()
         }
+        self._lock = threading.Lock()
+        self._names = None
+        self.tool_to_container = {}
+        self.container_to_tools = {}
+
+    @property
+    def built(self):
+        return self._names is not None
+
+    def update(self, container_names):
+        """Rebuild the index if the set of container names changed"""
+        names = frozenset(container_names)
+        if names == self._names:
+            return False
+        ordered = sorted(names)
+        tool_to_container = {}
+        container_to_tools = {}
+        for tool, rules in self._rules.items():
+            for name, pattern in rules:
+                if name in names:
+                    match = name
+                else:
+                    match = next((c for c in ordered if pattern.match(c)), None)
+                if match:
+                    tool_to_container[tool] = match
+                    container_to_tools.setdefault(match, []).append(tool)
+                    break
+        with self._lock:
+            self._names = names
+            self.tool_to_container = tool_to_container
+            self.container_to_tools = container_to_tools
+        return True
 
-        for entry in entries:
-            # Count by level
-            level = entry["level"]
-            stats["by_level"][level] = stats["by_level"].get(level, 0) + 1
+    def container_for(self, tool_name):
+        """Container name of a tool, or None if it has no container"""
+        return self.tool_to_container.get(tool_name)
 
-            # Count by action
-            action = entry["action"]
-            stats["by_action"][action] = stats["by_action"].get(action, 0) + 1
-
-        return stats
-
-    def _is_recent(self, timestamp, hours=24):
-        """Check if timestamp is within recent hours"""
-        try:
-            entry_time = datetime.fromisoformat(timestamp)
-            return (datetime.now() - entry_time).total_seconds() < hours * 3600
-        except:
-            return False
+    def tool_for(self, container_name):
+        """Primary tool name served by a container, or None"""
+        tools = self.container_to_tools.get(container_name)
+        return tools[0] if tools else None
 
 
 class ContainerMonitor:
@@ -162,37 +680,222 @@ class ContainerMonitor:
         self.previous_status = {}
         self.monitoring = False
         self.monitor_thread = None
+        self.events_thread = None
+        self.events_connected = False
+        self.last_event = None
         self.container_status = {}
+        self._status_lock = threading.RLock()
+        self._wake = threading.Event()
+        self._event_stream = None
+        self._refresh_lock = threading.Lock()
+        # Full listings run one at a time; container ids refreshed by events
+        # map to when their listing started, so an older full listing does
+        # not overwrite them
+        self._reconcile_lock = threading.Lock()
+        self._event_times = {}
+        self._listed_at = None
+        self._snapshot_time = None
+        self._snapshot_epoch = format(int(time.time()), 'x')
+        self.snapshot_version = 0
+        self.resolver = ContainerResolver(TOOL_CONTAINER_MAP)
+        self.docker = DockerClient(DOCKER_SOCKET, pool_size=DOCKER_API_POOL_SIZE,
+                                   timeout=DOCKER_API_TIMEOUT)
+        self.network = NetworkTopology(self.docker)
+        self.metrics = ContainerMetricsCollector(
+            self.docker, interval=CONTAINER_METRICS_INTERVAL,
+            history=CONTAINER_METRICS_HISTORY, source=CONTAINER_METRICS_SOURCE,
+            cgroup_root=CGROUP_ROOT)
 
     def start_monitoring(self):
-        """Start container monitoring in background thread"""
+        """Start container monitoring in background threads"""
         if not self.monitoring:
             self.monitoring = True
+            self._wake.clear()
             self.monitor_thread = threading.Thread(
                 target=self._monitor_loop, daemon=True)
             self.monitor_thread.start()
+            if DOCKER_EVENTS_ENABLED:
+                self.events_thread = threading.Thread(
+                    target=self._events_loop, name='docker-events', daemon=True)
+                self.events_thread.start()
+            if CONTAINER_METRICS_ENABLED:
+                self.metrics.start()
             logger.info("Container monitoring started")
 
     def stop_monitoring(self):
         """Stop container monitoring"""
         self.monitoring = False
-        if self.monitor_thread:
-            self.monitor_thread.join()
+        self._wake.set()
+        stream = self._event_stream
+        if stream:
+            stream.close()
+        self.metrics.stop()
+        for thread in (self.monitor_thread, self.events_thread):
+            if thread:
+                thread.join()
         logger.info("Container monitoring stopped")
 
     def _monitor_loop(self):
-        """Background monitoring loop"""
+        """Background reconciliation loop.
+
+        While the events stream is connected a full listing is only taken
+        every DOCKER_RECONCILE_INTERVAL seconds to catch anything missed;
+        otherwise it falls back to polling every 30 seconds.
+        """
         while self.monitoring:
             try:
-                current_status = self.get_all_container_status()
-                self._check_status_changes(current_status)
-                self.container_status = current_status
-                self.previous_status = {
-                    name: status["status"] for name, status in current_status.items()}
-                time.sleep(30)  # Check every 30 seconds
+                self.reconcile()
+                interval = DOCKER_RECONCILE_INTERVAL if self.events_connected else 30
+                self._wake.wait(interval)
             except Exception as e:
                 logger.error(f"Error in monitoring loop: {e}")
-                time.sleep(60)  # Wait longer on error
+                self._wake.wait(60)  # Wait longer on error
+
+    def reconcile(self):
+        """Replace the cached status with a full container listing.
+
+        Containers refreshed by an event after the listing started keep that
+        newer state instead of what the listing saw.
+        """
+        with self._reconcile_lock:
+            started = time.monotonic()
+            listed = self.docker_status()
+            self.network.invalidate()
+            with self._status_lock:
+                newer = {container_id for container_id, at in self._event_times.items()
+                         if at > started}
+                current_status = {name: record for name, record in listed.items()
+                                  if record["id"] not in newer}
+                current_status.update(
+                    (name, record) for name, record in self.container_status.items()
+                    if record["id"] in newer)
+                self._event_times = {container_id: at for container_id, at
+                                     in self._event_times.items() if at > started}
+                self._listed_at = started
+                self._publish(current_status)
+
+    @staticmethod
+    def _signature(containers):
+        """What a client can see of the containers, ignoring refresh times"""
+        return {name: (record["id"], record["status"], record["status_text"],
+                       record["ports"], record["image"])
+                for name, record in containers.items()}
+
+    def _publish(self, current_status):
+        """Log changes and swap in a new snapshot, bumping its version if it differs"""
+        self._check_status_changes(current_status)
+        if self._signature(current_status) != self._signature(self.container_status):
+            self.snapshot_version += 1
+        self.container_status.clear()
+        self.container_status.update(current_status)
+        self.resolver.update(current_status)
+        self.previous_status = {
+            name: status["status"] for name, status in current_status.items()}
+        self._snapshot_time = time.monotonic()
+
+    def _snapshot_fresh(self):
+        if self._snapshot_time is None:
+            return False
+        # The events stream keeps the snapshot current while it is connected
+        return self.events_connected or \
+            time.monotonic() - self._snapshot_time < CONTAINER_SNAPSHOT_TTL
+
+    def snapshot(self):
+        """Return (etag, containers) from the shared container status snapshot.
+
+        A stale snapshot is refreshed by a single caller while concurrent
+        callers wait for that refresh instead of listing containers again.
+        If the daemon cannot be reached the previous snapshot is served.
+        """
+        if not self._snapshot_fresh():
+            with self._refresh_lock:
+                if not self._snapshot_fresh():
+                    try:
+                        self.reconcile()
+                    except Exception as e:
+                        logger.error(f"Error refreshing container status: {e}")
+                        self._snapshot_time = time.monotonic()
+        with self._status_lock:
+            etag = f"containers-{self._snapshot_epoch}-{self.snapshot_version}"
+            return etag, dict(self.container_status)
+
+    def docker_status(self):
+        """List all containers, raising when the daemon cannot be reached"""
+        return {record["name"]: record for record in map(
+            self._container_record, self.docker.list_containers(all=True))}
+
+    def _events_loop(self):
+        """Follow the Docker events stream, reconnecting with backoff"""
+        backoff = 1
+        filters = {"type": ["container", "network"],
+                   "event": sorted(set(DOCKER_CONTAINER_EVENTS + DOCKER_NETWORK_EVENTS))}
+        while self.monitoring:
+            try:
+                self._event_stream = self.docker.events(filters=filters)
+                self.events_connected = True
+                backoff = 1
+                logger.info("Subscribed to Docker container and network events")
+                # Catch up on anything that happened while disconnected
+                self.reconcile()
+                for event in self._event_stream:
+                    self._handle_event(event)
+                if self.monitoring:
+                    logger.warning("Docker events stream ended, reconnecting")
+            except Exception as e:
+                if self.monitoring:
+                    logger.error(
+                        f"Docker events stream error: {e}; retrying in {backoff}s")
+            finally:
+                self.events_connected = False
+                if self._event_stream:
+                    self._event_stream.close()
+                    self._event_stream = None
+            if self._wake.wait(backoff):
+                break
+            backoff = min(backoff * 2, DOCKER_EVENTS_MAX_BACKOFF)
+
+    def _handle_event(self, event):
+        """Apply one container or network event to the cached state"""
+        actor = event.get("Actor", {})
+        # Attachments, ports and networks all live in the topology model
+        self.network.invalidate()
+        if event.get("Type") == "network":
+            self.last_event = {
+                "action": event.get("Action"),
+                "network": actor.get("Attributes", {}).get("name"),
+                "time": event.get("time")
+            }
+            return
+
+        container_id = actor.get("ID") or event.get("id")
+        if not container_id:
+            return
+        self.last_event = {
+            "action": event.get("Action") or event.get("status"),
+            "container": actor.get("Attributes", {}).get("name"),
+            "time": event.get("time")
+        }
+        started = time.monotonic()
+        try:
+            listed = self.docker.list_containers(
+                all=True, filters={"id": [container_id]})
+        except Exception as e:
+            logger.error(f"Error refreshing container {container_id[:12]}: {e}")
+            return
+
+        with self._status_lock:
+            if self._listed_at is not None and self._listed_at > started:
+                # A full listing taken after this one has already been applied
+                return
+            short_id = container_id[:12]
+            self._event_times[short_id] = started
+            current_status = dict(self.container_status)
+            for name, record in list(current_status.items()):
+                if record.get("id") == short_id:
+                    del current_status[name]
+            for record in map(self._container_record, listed):
+                current_status[record["name"]] = record
+            self._publish(current_status)
 
     def _check_status_changes(self, current_status):
         """Check for container status changes and log them"""
@@ -224,115 +927,104 @@ class ContainerMonitor:
                     level="warning"
                 )
 
+    def status(self):
+        """Monitoring and Docker events stream state"""
+        return {
+            "monitoring_active": self.monitoring,
+            "docker_events_connected": self.events_connected,
+            "last_docker_event": self.last_event
+        }
+
+    def network_topology(self):
+        """Docker networks, attached containers and published ports"""
+        # Without the events stream nothing invalidates the model; age it out
+        return self.network.get(
+            max_age=None if self.events_connected else CONTAINER_SNAPSHOT_TTL)
+
+    def metrics_summary(self):
+        """Latest resource usage of every running container"""
+        return {
+            "containers": self.metrics.summary(),
+            "source": self.metrics.source,
+            "interval": self.metrics.interval,
+            "last_run_ms": self.metrics.last_run_ms
+        }
+
+    def container_metrics(self, container_name, points=None):
+        """Resource usage history of one container, or None if unknown"""
+        return self.metrics.metrics(container_name, points=points)
+
     def get_container_count(self):
         """Get running container count"""
-        try:
-            result = subprocess.run(
-                ['docker', 'ps', '--format', 'table {{.Names}}'],
-                capture_output=True, text=True, timeout=10
-            )
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                return len(lines) - 1  # Subtract header line
-            return 0
-        except Exception as e:
-            logger.error(f"Error getting container count: {e}")
-            return 0
-
-    def get_all_container_status(self):
-        """Get detailed status for all containers"""
-        try:
-            result = subprocess.run(
-                ['docker', 'ps', '-a', '--format',
-                    '{{.Names}}\t{{.Status}}\t{{.Ports}}\t{{.Image}}\t{{.Size}}'],
-                capture_output=True, text=True, timeout=10
-            )
+        _, containers = self.snapshot()
+        return len([c for c in containers.values() if c["status"] == "running"])
+
+    @staticmethod
+    def _container_record(container):
+        """Build the portal status record for a Docker API container"""
+        names = container.get("Names") or [container.get("Id", "")[:12]]
+        state = container.get("State", "")
+
+        # Determine status type
+        if state in ("running", "paused", "restarting"):
+            status_type = "running"
+            status_color = "green"
+        elif state == "exited":
+            status_type = "stopped"
+            status_color = "red"
+        elif state == "created":
+            status_type = "created"
+            status_color = "yellow"
+        else:
+            status_type = "unknown"
+            status_color = "gray"
+
+        return {
+            "id": container.get("Id", "")[:12],
+            "name": names[0].lstrip('/'),
+            "status": status_type,
+            "status_text": container.get("Status", ""),
+            "status_color": status_color,
+            "ports": format_ports(container.get("Ports")),
+            "image": container.get("Image", ""),
+            "size": format_size(container),
+            "last_updated": datetime.now().isoformat()
+        }
 
-            if result.returncode == 0:
-                lines = result.stdout.strip().split('\n')
-                containers = {}
+    def get_all_container_status(self, include_size=False):
+        """Get detailed status for all containers.
 
-                for line in lines:
-                    if line.strip():
-                        # Split by tab character
-                        parts = line.split('\t')
-                        if len(parts) >= 5:
-                            name = parts[0].strip()
-                            status = parts[1].strip()
-                            ports = parts[2].strip()
-                            image = parts[3].strip()
-                            size = parts[4].strip()
-
-                            # Determine status type
-                            if "Up" in status:
-                                status_type = "running"
-                                status_color = "green"
-                            elif "Exited" in status:
-                                status_type = "stopped"
-                                status_color = "red"
-                            elif "Created" in status:
-                                status_type = "created"
-                                status_color = "yellow"
-                            else:
-                                status_type = "unknown"
-                                status_color = "gray"
-
-                            containers[name] = {
-                                "name": name,
-                                "status": status_type,
-                                "status_text": status,
-                                "status_color": status_color,
-                                "ports": ports,
-                                "image": image,
-                                "size": size,
-                                "last_updated": datetime.now().isoformat()
-                            }
-
-                return containers
-            return {}
+        Served from the shared snapshot. Disk usage makes the daemon walk
+        every container filesystem, so ``include_size`` bypasses the snapshot
+        for a live listing with the size field filled in.
+        """
+        if not include_size:
+            return self.snapshot()[1]
+        try:
+            containers = {}
+            for container in self.docker.list_containers(all=True, size=include_size):
+                record = self._container_record(container)
+                containers[record["name"]] = record
+            return containers
         except Exception as e:
             logger.error(f"Error getting container status: {e}")
             return {}
 
-    def get_tool_container_status(self):
+    def get_tool_container_status(self, all_containers=None):
         """Get status for tool-specific containers"""
-        all_containers = self.get_all_container_status()
+        if all_containers is None:
+            all_containers = self.get_all_container_status()
+        self.resolver.update(all_containers)
         tool_containers = {}
 
-        # Map tool names to possible container names (with fallbacks)
-        tool_container_map = {
-            "velociraptor": ["velociraptor"],
-            "wazuh": ["wazuh", "wazuh-dashboard", "cyber-blue-test-wazuh.dashboard-1"],
-            "wazuh-dashboard": ["wazuh", "wazuh-dashboard", "cyber-blue-test-wazuh.dashboard-1"],
-            "misp": ["misp", "misp-core", "cyber-blue-test-misp-core-1"],
-            "cyberchef": ["cyber-blue-test-cyberchef-1", "cyberchef"],
-            "thehive": ["cyber-blue-test-thehive-1", "thehive"],
-            "cortex": ["cyber-blue-test-cortex-1", "cortex"],
-            "fleetdm": ["fleet-server", "cyber-blue-test-fleet-server-1"],
-            "arkime": ["arkime-test", "arkime", "cyber-blue-test-arkime-1"],
-            "caldera": ["caldera", "cyber-blue-test-caldera-1"],
-            "evebox": ["evebox", "cyber-blue-test-evebox-1"],
-            "wireshark": ["wireshark", "cyber-blue-test-wireshark-1"],
-            "mitre": ["mitre-navigator", "cyber-blue-test-mitre-navigator-1"],
-            "mitre-navigator": ["mitre-navigator", "cyber-blue-test-mitre-navigator-1"],
-            "portainer": ["portainer", "cyber-blue-test-portainer-1"],
-            "shuffle": ["shuffle-frontend", "cyber-blue-test-shuffle-frontend-1"]
-        }
-
-        def find_container_name(possible_names):
-            """Find the first matching container name from the list"""
-            for name in possible_names:
-                if name in all_containers:
-                    return name
-            return None
-
-        for tool_name, possible_names in tool_container_map.items():
-            container_name = find_container_name(possible_names)
-            if container_name:
+        for tool_name, possible_names in TOOL_CONTAINER_MAP.items():
+            container_name = self.resolver.container_for(tool_name)
+            if container_name in all_containers:
                 tool_containers[tool_name] = all_containers[container_name]
             else:
                 # Container not found
                 tool_containers[tool_name] = {
+                    "id": None,
                     "name": possible_names[0] if possible_names else tool_name,
                     "status": "not_found",
                     "status_text": "Container not found",
@@ -347,35 +1039,10 @@ class ContainerMonitor:
 
     def get_container_name_for_tool(self, tool_name):
         """Get the actual container name for a tool"""
-        all_containers = self.get_all_container_status()
-
-        # Map tool names to possible container names (with fallbacks)
-        tool_container_map = {
-            "velociraptor": ["velociraptor"],
-            "wazuh": ["wazuh", "wazuh-dashboard", "cyber-blue-test-wazuh.dashboard-1"],
-            "wazuh-dashboard": ["wazuh", "wazuh-dashboard", "cyber-blue-test-wazuh.dashboard-1"],
-            "misp": ["misp", "misp-core", "cyber-blue-test-misp-core-1"],
-            "cyberchef": ["cyber-blue-test-cyberchef-1", "cyberchef"],
-            "thehive": ["cyber-blue-test-thehive-1", "thehive"],
-            "cortex": ["cyber-blue-test-cortex-1", "cortex"],
-            "fleetdm": ["fleet-server", "cyber-blue-test-fleet-server-1"],
-            "arkime": ["arkime-test", "arkime", "cyber-blue-test-arkime-1"],
-            "caldera": ["caldera", "cyber-blue-test-caldera-1"],
-            "evebox": ["evebox", "cyber-blue-test-evebox-1"],
-            "wireshark": ["wireshark", "cyber-blue-test-wireshark-1"],
-            "mitre": ["mitre-navigator", "cyber-blue-test-mitre-navigator-1"],
-            "mitre-navigator": ["mitre-navigator", "cyber-blue-test-mitre-navigator-1"],
-            "portainer": ["portainer", "cyber-blue-test-portainer-1"],
-            "shuffle": ["shuffle-frontend", "cyber-blue-test-shuffle-frontend-1"]
-        }
-
-        if tool_name in tool_container_map:
-            for name in tool_container_map[tool_name]:
-                if name in all_containers:
-                    return name
-
+        if not self.resolver.built:
+            self.snapshot()
         # If not found in tool mapping, return the original name
-        return tool_name
+        return self.resolver.container_for(tool_name) or tool_name
 
     def start_container(self, container_name):
         """Start a specific container"""
@@ -384,19 +1051,16 @@ class ContainerMonitor:
             actual_container_name = self.get_container_name_for_tool(
                 container_name)
 
-            result = subprocess.run(
-                ['docker', 'start', actual_container_name],
-                capture_output=True, text=True, timeout=30
+            try:
+                self.docker.start_container(actual_container_name)
+            except DockerAPIError as e:
+                return {"success": False, "message": f"Failed to start container: {e.message}"}
+            self.changelog.add_entry(
+                "container_started",
+                f"Container '{actual_container_name}' started manually",
+                level="info"
             )
-            if result.returncode == 0:
-                self.changelog.add_entry(
-                    "container_started",
-                    f"Container '{actual_container_name}' started manually",
-                    level="info"
-                )
-                return {"success": True, "message": f"Container {actual_container_name} started successfully"}
-            else:
-                return {"success": False, "message": f"Failed to start container: {result.stderr}"}
+            return {"success": True, "message": f"Container {actual_container_name} started successfully"}
         except Exception as e:
             logger.error(f"Error starting container {container_name}: {e}")
             return {"success": False, "message": f"Error starting container: {str(e)}"}
@@ -408,19 +1072,16 @@ class ContainerMonitor:
             actual_container_name = self.get_container_name_for_tool(
                 container_name)
 
-            result = subprocess.run(
-                ['docker', 'stop', actual_container_name],
-                capture_output=True, text=True, timeout=30
+            try:
+                self.docker.stop_container(actual_container_name)
+            except DockerAPIError as e:
+                return {"success": False, "message": f"Failed to stop container: {e.message}"}
+            self.changelog.add_entry(
+                "container_stopped",
+                f"Container '{actual_container_name}' stopped manually",
+                level="info"
             )
-            if result.returncode == 0:
-                self.changelog.add_entry(
-                    "container_stopped",
-                    f"Container '{actual_container_name}' stopped manually",
-                    level="info"
-                )
-                return {"success": True, "message": f"Container {actual_container_name} stopped successfully"}
-            else:
-                return {"success": False, "message": f"Failed to stop container: {result.stderr}"}
+            return {"success": True, "message": f"Container {actual_container_name} stopped successfully"}
         except Exception as e:
             logger.error(f"Error stopping container {container_name}: {e}")
             return {"success": False, "message": f"Error stopping container: {str(e)}"}
@@ -432,27 +1093,160 @@ class ContainerMonitor:
             actual_container_name = self.get_container_name_for_tool(
                 container_name)
 
-            result = subprocess.run(
-                ['docker', 'restart', actual_container_name],
-                capture_output=True, text=True, timeout=30
+            try:
+                self.docker.restart_container(actual_container_name)
+            except DockerAPIError as e:
+                return {"success": False, "message": f"Failed to restart container: {e.message}"}
+            self.changelog.add_entry(
+                "container_restarted",
+                f"Container '{actual_container_name}' restarted manually",
+                level="info"
             )
-            if result.returncode == 0:
-                self.changelog.add_entry(
-                    "container_restarted",
-                    f"Container '{actual_container_name}' restarted manually",
-                    level="info"
-                )
-                return {"success": True, "message": f"Container {actual_container_name} restarted successfully"}
-            else:
-                return {"success": False, "message": f"Failed to restart container: {result.stderr}"}
+            return {"success": True, "message": f"Container {actual_container_name} restarted successfully"}
         except Exception as e:
             logger.error(f"Error restarting container {container_name}: {e}")
             return {"success": False, "message": f"Error restarting container: {str(e)}"}
 
+    def plan_bulk_control(self, action, tools):
+        """Group tools into waves of distinct containers in dependency order.
+
+        Containers in one wave do not depend on each other and can be handled
+        concurrently. Stopping runs the waves in reverse order.
+        """
+        containers = {}
+        for tool in tools:
+            containers.setdefault(self.get_container_name_for_tool(tool), []).append(tool)
+
+        depends_on = {container: set() for container in containers}
+        for container, container_tools in containers.items():
+            for tool in container_tools:
+                for dependency in TOOL_DEPENDENCIES.get(tool, []):
+                    if dependency in tools:
+                        dep_container = self.get_container_name_for_tool(dependency)
+                        if dep_container != container:
+                            depends_on[container].add(dep_container)
+
+        waves = []
+        remaining = dict(depends_on)
+        while remaining:
+            placed = set().union(*waves) if waves else set()
+            wave = [c for c, deps in remaining.items() if deps <= placed]
+            if not wave:
+                # Dependency cycle: run what is left together
+                wave = list(remaining)
+            waves.append(wave)
+            for container in wave:
+                del remaining[container]
+
+        if action == 'stop':
+            waves.reverse()
+        return waves, containers, depends_on
+
+    def bulk_control(self, action, tools, workers=BULK_CONTROL_WORKERS):
+        """Start, stop or restart containers concurrently, yielding progress.
+
+        Yields a ``plan`` event, one ``result`` event per container as soon as
+        its action finishes, and a final ``done`` summary. When starting or
+        restarting, containers whose dependency failed are skipped.
+        """
+        handlers = {"start": self.start_container, "stop": self.stop_container,
+                    "restart": self.restart_container}
+        handler = handlers[action]
+        waves, containers, depends_on = self.plan_bulk_control(action, tools)
+        yield {"event": "plan", "action": action, "waves": waves,
+               "tools": containers}
+
+        failed = set()
+        succeeded = 0
+        max_workers = max(1, min(workers, max((len(w) for w in waves), default=1)))
+        with ThreadPoolExecutor(max_workers=max_workers,
+                                thread_name_prefix='bulk-control') as pool:
+            for wave_number, wave in enumerate(waves):
+                futures = {}
+                for container in wave:
+                    if action != 'stop' and depends_on[container] & failed:
+                        failed.add(container)
+                        yield {"event": "result", "wave": wave_number,
+                               "container": container, "tools": containers[container],
+                               "success": False, "skipped": True,
+                               "message": "Skipped: a dependency failed to " + action}
+                        continue
+                    futures[pool.submit(handler, container)] = container
+
+                for future in as_completed(futures):
+                    container = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        result = {"success": False, "message": str(e)}
+                    if result.get("success"):
+                        succeeded += 1
+                    else:
+                        failed.add(container)
+                    yield {"event": "result", "wave": wave_number,
+                           "container": container, "tools": containers[container],
+                           **result}
+
+        yield {"event": "done", "action": action, "succeeded": succeeded,
+               "failed": len(failed)}
+
+
+# Trend series: host usage, running containers and 1/0 running state per tool
+TREND_SERIES = ["cpu_percent", "memory_percent", "disk_percent", "container_count"] + \
+    [f"tool:{tool}" for tool in TOOL_CONTAINER_MAP]
 
 # Initialize managers
-changelog_manager = ChangelogManager(CHANGELOG_FILE)
-container_monitor = ContainerMonitor(changelog_manager)
+if POOL_PROCESS:
+    changelog_manager = container_monitor = trends_store = host_metrics = None
+    yara_jobs = sigma_converter = None
+elif PORTAL_STATE_AUTHKEY:
+    # Gunicorn worker: the managers live in the main process
+    _shared = connect_state(PORTAL_STATE_SOCKET, bytes.fromhex(PORTAL_STATE_AUTHKEY))
+    changelog_manager = _shared["changelog_manager"]
+    container_monitor = _shared["container_monitor"]
+    trends_store = _shared["trends_store"]
+    host_metrics = _shared["host_metrics"]
+    yara_jobs = _shared["yara_jobs"]
+    sigma_converter = _shared["sigma_converter"]
+else:
+    changelog_manager = ChangelogManager(CHANGELOG_FILE)
+    container_monitor = ContainerMonitor(changelog_manager)
+    trends_store = TimeSeriesStore(TRENDS_DIR, TREND_SERIES)
+    host_metrics = HostMetricsSampler(HOST_METRICS_INTERVAL)
+    yara_jobs = ScanJobManager(YARA_JOBS_DIR, YARA_CACHE_DIR, YARA_RESULT_CACHE,
+                               workers=YARA_SCAN_WORKERS or None, timeout=YARA_SCAN_TIMEOUT,
+                               retained=YARA_JOBS_RETAINED)
+    sigma_converter = SigmaConverter(SIGMA_CONVERT_CACHE, workers=SIGMA_CONVERT_WORKERS or None,
+                                     warm_target=SIGMA_DEFAULT_TARGET)
+
+
+def sample_trends():
+    """Take one sample of every trend series"""
+    _, containers = container_monitor.snapshot()
+    tool_containers = container_monitor.get_tool_container_status(containers)
+    host = host_metrics.current()
+    values = {
+        "cpu_percent": host["cpu_percent"],
+        "memory_percent": host["memory_percent"],
+        "disk_percent": host["disk_percent"],
+        "container_count": len(
+            [c for c in containers.values() if c["status"] == "running"])
+    }
+    for tool, info in tool_containers.items():
+        values[f"tool:{tool}"] = 1.0 if info["status"] == "running" else 0.0
+    return values
+
+
+def conditional_json(etag, build):
+    """Return 304 when the client already holds ``etag``, else jsonify(build())"""
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    # Make browsers revalidate on every poll instead of reusing a stale copy
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/api/services/control/<service_name>/<action>')
@@ -535,10 +1329,15 @@ def index():
 def get_containers():
     """Get container count API endpoint"""
     try:
-        count = container_monitor.get_container_count()
-        changelog_manager.add_entry(
-            "api_call", f"Container count requested: {count} containers")
-        return jsonify({"count": count})
+        etag, containers = container_monitor.snapshot()
+
+        def build():
+            count = len([c for c in containers.values() if c["status"] == "running"])
+            changelog_manager.add_entry(
+                "api_call", f"Container count requested: {count} containers")
+            return {"count": count}
+
+        return conditional_json(etag, build)
     except Exception as e:
         logger.error(f"Error in container count API: {e}")
         return jsonify({"count": "Unknown", "error": str(e)}), 500
@@ -548,10 +1347,20 @@ def get_containers():
 def get_container_status():
     """Get detailed container status API endpoint"""
     try:
-        containers = container_monitor.get_all_container_status()
-        changelog_manager.add_entry(
-            "api_call", f"Container status requested: {len(containers)} containers")
-        return jsonify({"containers": containers})
+        if request.args.get('size', 'false').lower() == 'true':
+            containers = container_monitor.get_all_container_status(include_size=True)
+            changelog_manager.add_entry(
+                "api_call", f"Container status requested: {len(containers)} containers")
+            return jsonify({"containers": containers})
+
+        etag, containers = container_monitor.snapshot()
+
+        def build():
+            changelog_manager.add_entry(
+                "api_call", f"Container status requested: {len(containers)} containers")
+            return {"containers": containers}
+
+        return conditional_json(etag, build)
     except Exception as e:
         logger.error(f"Error in container status API: {e}")
         return jsonify({"containers": {}, "error": str(e)}), 500
@@ -561,10 +1370,15 @@ def get_container_status():
 def get_tool_container_status():
     """Get tool-specific container status API endpoint"""
     try:
-        tool_containers = container_monitor.get_tool_container_status()
-        changelog_manager.add_entry(
-            "api_call", f"Tool container status requested: {len(tool_containers)} tools")
-        return jsonify({"tool_containers": tool_containers})
+        etag, containers = container_monitor.snapshot()
+
+        def build():
+            tool_containers = container_monitor.get_tool_container_status(containers)
+            changelog_manager.add_entry(
+                "api_call", f"Tool container status requested: {len(tool_containers)} tools")
+            return {"tool_containers": tool_containers}
+
+        return conditional_json(etag, build)
     except Exception as e:
         logger.error(f"Error in tool container status API: {e}")
         return jsonify({"tool_containers": {}, "error": str(e)}), 500
@@ -609,12 +1423,78 @@ def restart_container(container_name):
         return jsonify({"success": False, "message": f"Error: {str(e)}"}), 500
 
 
+@app.route('/api/containers/metrics')
+def get_all_container_metrics():
+    """Latest resource usage sample of every running container"""
+    try:
+        return jsonify(container_monitor.metrics_summary())
+    except Exception as e:
+        logger.error(f"Error in container metrics API: {e}")
+        return jsonify({"containers": {}, "error": str(e)}), 500
+
+
+@app.route('/api/containers/<container_name>/metrics')
+def get_container_metrics(container_name):
+    """CPU, memory, network and block I/O history of one container (or tool)"""
+    try:
+        points = request.args.get('points', type=int)
+        actual_container_name = container_monitor.get_container_name_for_tool(
+            container_name)
+        metrics = container_monitor.container_metrics(actual_container_name, points=points)
+        if metrics is None:
+            return jsonify({"error": f"No metrics for container '{container_name}' yet"}), 404
+        return jsonify(metrics)
+    except Exception as e:
+        logger.error(f"Error in container metrics API for {container_name}: {e}")
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/containers/bulk', methods=['POST'])
+def bulk_container_control():
+    """Start/stop/restart several tools at once, streaming progress as NDJSON.
+
+    Body: ``{"action": "restart", "tools": [...]}`` or
+    ``{"action": "restart", "category": "soar"}``.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"success": False, "message": "Request body must be a JSON object"}), 400
+    action = data.get('action')
+    if action not in ['start', 'stop', 'restart']:
+        return jsonify({"success": False, "message": "Invalid action. Use 'start', 'stop', or 'restart'"}), 400
+
+    tools = data.get('tools') or []
+    category = data.get('category')
+    if not isinstance(tools, list) or not all(isinstance(tool, str) for tool in tools):
+        return jsonify({"success": False, "message": "'tools' must be a list of tool names"}), 400
+    if category is not None and not isinstance(category, str):
+        return jsonify({"success": False, "message": "'category' must be a string"}), 400
+    if category:
+        if category.lower() not in TOOL_CATEGORIES:
+            return jsonify({"success": False, "message": f"Category '{category}' not found"}), 404
+        tools = TOOL_CATEGORIES[category.lower()]
+    if not tools:
+        return jsonify({"success": False, "message": "No tools or category given"}), 400
+
+    changelog_manager.add_entry(
+        "container_action",
+        f"Bulk {action} requested for {category or ', '.join(tools)}", user="api_user")
+
+    def generate():
+        for event in container_monitor.bulk_control(action, list(dict.fromkeys(tools))):
+            yield json.dumps(event) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
 @app.route('/api/containers/stats')
 def get_container_stats():
     """Get container statistics API endpoint"""
     try:
-        all_containers = container_monitor.get_all_container_status()
-        tool_containers = container_monitor.get_tool_container_status()
+        etag, all_containers = container_monitor.snapshot()
+        if request.if_none_match.contains(etag):
+            return conditional_json(etag, dict)
+        tool_containers = container_monitor.get_tool_container_status(all_containers)
 
         # Calculate statistics
         total_containers = len(all_containers)
@@ -647,20 +1527,54 @@ def get_container_stats():
 
         changelog_manager.add_entry(
             "api_call", f"Container stats requested: {stats['health_percentage']}% health")
-        return jsonify(stats)
+        return conditional_json(etag, lambda: stats)
     except Exception as e:
         logger.error(f"Error in container stats API: {e}")
         return jsonify({"error": str(e)}), 500
 
 
+def local_timestamp(value):
+    """Normalize an ISO timestamp to the naive local time entries are stored in"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed.isoformat()
+
+
 @app.route('/api/changelog')
 def get_changelog():
-    """Get changelog entries API endpoint"""
+    """Get changelog entries API endpoint.
+
+    Supports ``level``, ``action``, ``user``, ``q`` (free text), ``since`` and
+    ``until`` (ISO timestamps; with a UTC offset they are converted to local
+    time) filters. Pages are walked backwards by passing
+    the returned ``next_cursor`` as ``cursor``.
+    """
     try:
         limit = request.args.get('limit', type=int)
-        level = request.args.get('level')
-        entries = changelog_manager.get_entries(limit=limit, level=level)
-        return jsonify({"entries": entries})
+        cursor = request.args.get('cursor', type=int)
+        since = request.args.get('since')
+        until = request.args.get('until')
+        try:
+            since = local_timestamp(since) if since else None
+            until = local_timestamp(until) if until else None
+        except ValueError as e:
+            return jsonify({"entries": [], "error": f"Invalid timestamp: {e}"}), 400
+
+        if cursor is not None and not limit:
+            limit = 100
+
+        entries, next_cursor = changelog_manager.query_entries(
+            limit=limit,
+            level=request.args.get('level'),
+            action=request.args.get('action'),
+            user=request.args.get('user'),
+            text=request.args.get('q'),
+            since=since,
+            until=until,
+            before=cursor
+        )
+        return jsonify({"entries": entries, "next_cursor": next_cursor})
     except Exception as e:
         logger.error(f"Error in changelog API: {e}")
         return jsonify({"entries": [], "error": str(e)}), 500
@@ -671,6 +1585,7 @@ def get_changelog_stats():
     """Get changelog statistics API endpoint"""
     try:
         stats = changelog_manager.get_stats()
+        stats["writer"] = changelog_manager.writer_metrics()
         return jsonify(stats)
     except Exception as e:
         logger.error(f"Error in changelog stats API: {e}")
@@ -984,12 +1899,18 @@ def health_check():
     """Health check endpoint"""
     try:
         container_stats = container_monitor.get_container_count()
+        changelog_storage = changelog_manager.storage_status()
         return jsonify({
-            "status": "healthy",
+            # Degraded while changelog entries go to the fallback journal
+            "status": "degraded" if changelog_storage["fallback"] else "healthy",
             "timestamp": datetime.now().isoformat(),
             "container_count": container_stats,
-            "changelog_entries": len(changelog_manager.changelog["entries"]),
-            "monitoring_active": container_monitor.monitoring
+            "changelog_entries": changelog_manager.entry_count(),
+            "changelog_storage": changelog_storage,
+            "changelog_writer": changelog_manager.writer_metrics(),
+            "push_channel": push_broadcaster.metrics(),
+            "worker_pid": os.getpid(),
+            **container_monitor.status()
         })
     except Exception as e:
         logger.error(f"Error in health check: {e}")
@@ -1273,99 +2194,142 @@ def get_tools():
     return jsonify({"tools": tools})
 
 
-@app.route('/api/dashboard/metrics')
-def get_dashboard_metrics():
-    """Get comprehensive dashboard metrics for enhanced visualization"""
-    try:
-        import psutil
-        import time
-        from datetime import datetime, timedelta
-
-        # System metrics
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
+def collect_dashboard_metrics(all_containers=None):
+    """Build the dashboard metrics from the host sampler and container snapshot"""
+    # System metrics from the background sampler (never blocks)
+    host = host_metrics.current()
 
-        # Container metrics
+    # Container metrics
+    if all_containers is None:
         all_containers = container_monitor.get_all_container_status()
-        tool_containers = container_monitor.get_tool_container_status()
-
-        running_containers = len(
-            [c for c in all_containers.values() if c["status"] == "running"])
-        stopped_containers = len(
-            [c for c in all_containers.values() if c["status"] == "stopped"])
-        total_containers = len(all_containers)
-
-        # Tool-specific health
-        tool_health = {}
-        for tool_name, container_info in tool_containers.items():
-            tool_health[tool_name] = {
-                "status": container_info["status"],
-                "health": "healthy" if container_info["status"] == "running" else "unhealthy",
-                "uptime": container_info.get("status_text", "unknown")
-            }
-
-        # Security categories health
-        categories = {
-            "dfir": ["velociraptor"],
-            "siem": ["wazuh", "wazuh-dashboard"],
-            "soar": ["shuffle", "thehive", "cortex", "caldera"],
-            "cti": ["misp", "mitre-navigator"],
-            "ids": ["evebox"],
-            "network analysis": ["wireshark", "arkime"],
-            "utility": ["cyberchef"],
-            "management": ["fleetdm", "portainer"]
+    tool_containers = container_monitor.get_tool_container_status(all_containers)
+
+    running_containers = len(
+        [c for c in all_containers.values() if c["status"] == "running"])
+    stopped_containers = len(
+        [c for c in all_containers.values() if c["status"] == "stopped"])
+    total_containers = len(all_containers)
+
+    # Tool-specific health
+    tool_health = {}
+    for tool_name, container_info in tool_containers.items():
+        tool_health[tool_name] = {
+            "status": container_info["status"],
+            "health": "healthy" if container_info["status"] == "running" else "unhealthy",
+            "uptime": container_info.get("status_text", "unknown")
         }
 
-        category_health = {}
-        for category, tools in categories.items():
-            healthy_tools = 0
-            total_tools = len(tools)
-            for tool in tools:
-                if tool in tool_containers and tool_containers[tool]["status"] == "running":
-                    healthy_tools += 1
-
-            health_percentage = (
-                healthy_tools / total_tools * 100) if total_tools > 0 else 0
-            category_health[category] = {
-                "health_percentage": round(health_percentage, 1),
-                "healthy_tools": healthy_tools,
-                "total_tools": total_tools,
-                "status": "healthy" if health_percentage >= 80 else "degraded" if health_percentage >= 50 else "critical"
-            }
-
-        # Recent activity from changelog
-        recent_entries = changelog_manager.get_entries(limit=10)
-        activity_summary = {
-            "container_starts": len([e for e in recent_entries if "started" in e.get("action", "")]),
-            "container_stops": len([e for e in recent_entries if "stopped" in e.get("action", "")]),
-            "api_calls": len([e for e in recent_entries if "api_call" in e.get("action", "")]),
-            "errors": len([e for e in recent_entries if e.get("level") == "error"])
+    # Security categories health
+    category_health = {}
+    for category, tools in TOOL_CATEGORIES.items():
+        healthy_tools = 0
+        total_tools = len(tools)
+        for tool in tools:
+            if tool in tool_containers and tool_containers[tool]["status"] == "running":
+                healthy_tools += 1
+
+        health_percentage = (
+            healthy_tools / total_tools * 100) if total_tools > 0 else 0
+        category_health[category] = {
+            "health_percentage": round(health_percentage, 1),
+            "healthy_tools": healthy_tools,
+            "total_tools": total_tools,
+            "status": "healthy" if health_percentage >= 80 else "degraded" if health_percentage >= 50 else "critical"
         }
 
-        metrics = {
-            "timestamp": datetime.now().isoformat(),
-            "system": {
-                "cpu_percent": round(cpu_percent, 1),
-                "memory_percent": round(memory.percent, 1),
-                "memory_used_gb": round(memory.used / (1024**3), 2),
-                "memory_total_gb": round(memory.total / (1024**3), 2),
-                "disk_percent": round(disk.percent, 1),
-                "disk_used_gb": round(disk.used / (1024**3), 2),
-                "disk_total_gb": round(disk.total / (1024**3), 2)
-            },
-            "containers": {
-                "total": total_containers,
-                "running": running_containers,
-                "stopped": stopped_containers,
-                "health_percentage": round((running_containers / total_containers * 100) if total_containers > 0 else 0, 1)
-            },
-            "tools": tool_health,
-            "categories": category_health,
-            "activity": activity_summary,
-            "uptime": datetime.now().isoformat()
-        }
+    # Recent activity from changelog
+    recent_entries = changelog_manager.get_entries(limit=10)
+    activity_summary = {
+        "container_starts": len([e for e in recent_entries if "started" in e.get("action", "")]),
+        "container_stops": len([e for e in recent_entries if "stopped" in e.get("action", "")]),
+        "api_calls": len([e for e in recent_entries if "api_call" in e.get("action", "")]),
+        "errors": len([e for e in recent_entries if e.get("level") == "error"])
+    }
+
+    metrics = {
+        "timestamp": datetime.now().isoformat(),
+        "system": {
+            "cpu_percent": round(host["cpu_percent"], 1),
+            "memory_percent": round(host["memory_percent"], 1),
+            "memory_used_gb": round(host["memory_used"] / (1024**3), 2),
+            "memory_total_gb": round(host["memory_total"] / (1024**3), 2),
+            "disk_percent": round(host["disk_percent"], 1),
+            "disk_used_gb": round(host["disk_used"] / (1024**3), 2),
+            "disk_total_gb": round(host["disk_total"] / (1024**3), 2),
+            "load_average": host["load_average"],
+            "rates": host["rates"],
+            "sampled_at": datetime.fromtimestamp(host["timestamp"]).isoformat()
+        },
+        "containers": {
+            "total": total_containers,
+            "running": running_containers,
+            "stopped": stopped_containers,
+            "health_percentage": round((running_containers / total_containers * 100) if total_containers > 0 else 0, 1)
+        },
+        "tools": tool_health,
+        "categories": category_health,
+        "activity": activity_summary,
+        "uptime": datetime.now().isoformat()
+    }
+    return metrics
+
+
+def collect_push_state():
+    """Dashboard state and new changelog entries for the push channel"""
+    _, containers = container_monitor.snapshot()
+    metrics = collect_dashboard_metrics(containers)
+    host = host_metrics.current()
+
+    global push_changelog_cursor
+    if push_changelog_cursor is None:
+        push_changelog_cursor = changelog_manager.latest_id()
+    entries = changelog_manager.entries_since(push_changelog_cursor)
+    if entries:
+        push_changelog_cursor = entries[-1]["id"]
+
+    def stable(records):
+        # Refresh times change on every listing; only push real changes
+        return {name: {k: v for k, v in record.items() if k != "last_updated"}
+                for name, record in records.items()}
+
+    sections = {
+        "metrics": {key: metrics[key] for key in ("system", "containers", "tools", "categories")},
+        "containers": stable(containers),
+        "tools": stable(container_monitor.get_tool_container_status(containers)),
+        "network": {key: value for key, value in {**host["counters"], **host["rates"]}.items()
+                    if key.startswith('net_')}
+    }
+    return sections, {"changelog": entries}
+
+
+push_changelog_cursor = None
+if PORTAL_STATE_AUTHKEY:
+    # One producer in the main process diffs and serializes every update
+    # once for the streams of all workers
+    push_broadcaster = _shared["push_broadcaster"]
+else:
+    push_broadcaster = PushBroadcaster(
+        collect_push_state, interval=PUSH_INTERVAL, heartbeat=PUSH_HEARTBEAT)
+
+
+@app.route('/api/stream')
+def dashboard_stream():
+    """Server-Sent Events stream of dashboard updates.
+
+    Sends a ``snapshot`` event with the full state (metrics, containers,
+    tools, network counters) and then ``diff`` events with changed and
+    removed keys per section plus new changelog entries.
+    """
+    return Response(stream_with_context(push_broadcaster.listen()),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 
+@app.route('/api/dashboard/metrics')
+def get_dashboard_metrics():
+    """Get comprehensive dashboard metrics for enhanced visualization"""
+    try:
+        metrics = collect_dashboard_metrics()
         changelog_manager.add_entry("api_call", "Dashboard metrics requested")
         return jsonify(metrics)
 
@@ -1376,37 +2340,31 @@ def get_dashboard_metrics():
 
 @app.route('/api/dashboard/trends')
 def get_dashboard_trends():
-    """Get trending data for charts and graphs"""
+    """Get trending data for charts and graphs.
+
+    ``window`` selects 1h (10s points), 24h (1m points) or 7d (1h points).
+    Buckets without samples are null.
+    """
     try:
-        # For now, we'll generate sample trending data
-        # In a real implementation, this would come from a time-series database
-        from datetime import datetime, timedelta
-        import random
-
-        now = datetime.now()
-        hours = []
-        cpu_data = []
-        memory_data = []
-        container_data = []
-
-        # Generate 24 hours of sample data
-        for i in range(24):
-            timestamp = now - timedelta(hours=23-i)
-            hours.append(timestamp.strftime("%H:%M"))
-
-            # Simulate realistic trending data
-            cpu_data.append(round(random.uniform(10, 80), 1))
-            memory_data.append(round(random.uniform(30, 90), 1))
-            container_data.append(random.randint(25, 28))
+        window = request.args.get('window', '24h')
+        if window not in TREND_WINDOWS:
+            return jsonify({"error": f"Invalid window. Use one of: {', '.join(TREND_WINDOWS)}"}), 400
+
+        buckets, series = trends_store.query(window)
+        label_format = "%m-%d %H:%M" if window == '7d' else "%H:%M"
 
         trends = {
-            "timestamp": now.isoformat(),
-            "timeframe": "24h",
+            "timestamp": datetime.now().isoformat(),
+            "timeframe": window,
             "data": {
-                "labels": hours,
-                "cpu_usage": cpu_data,
-                "memory_usage": memory_data,
-                "container_count": container_data
+                "labels": [datetime.fromtimestamp(b).strftime(label_format) for b in buckets],
+                "cpu_usage": series["cpu_percent"],
+                "memory_usage": series["memory_percent"],
+                "disk_usage": series["disk_percent"],
+                "container_count": series["container_count"],
+                "tool_status": {name.split(':', 1)[1]: values
+                                for name, values in series.items()
+                                if name.startswith('tool:')}
             }
         }
 
@@ -1420,65 +2378,35 @@ def get_dashboard_trends():
 
 @app.route('/api/dashboard/security-events')
 def get_security_events():
-    """Get recent security-related events and alerts"""
+    """Get recent security-related events and alerts.
+
+    Events are classified when their changelog entry is added. ``since``
+    returns the oldest events newer than that id (pass back ``cursor`` to
+    poll for new events; a burst larger than ``limit`` takes several polls),
+    ``severity`` selects high, medium or low, and ``limit`` caps the number
+    of events (default 20).
+    """
     try:
-        # Get recent changelog entries related to security
-        recent_entries = changelog_manager.get_entries(limit=50)
-
-        security_events = []
-        for entry in recent_entries:
-            # Classify events as security-related
-            action = entry.get("action", "")
-            details = entry.get("details", "")
-            level = entry.get("level", "info")
-
-            if any(keyword in action.lower() or keyword in details.lower()
-                   for keyword in ["container_stopped", "container_started", "error", "failed", "warning"]):
-
-                # Determine event severity
-                if level == "error" or "failed" in details.lower():
-                    severity = "high"
-                    icon = "fas fa-exclamation-triangle"
-                    color = "danger"
-                elif level == "warning" or "stopped" in action:
-                    severity = "medium"
-                    icon = "fas fa-exclamation-circle"
-                    color = "warning"
-                else:
-                    severity = "low"
-                    icon = "fas fa-info-circle"
-                    color = "info"
-
-                security_events.append({
-                    "id": entry.get("id"),
-                    "timestamp": entry.get("timestamp"),
-                    "title": action.replace("_", " ").title(),
-                    "description": details,
-                    "severity": severity,
-                    "icon": icon,
-                    "color": color,
-                    "user": entry.get("user", "system")
-                })
-
-        # Limit to 20 most recent events
-        security_events = security_events[:20]
-
-        # Event statistics
-        event_stats = {
-            "total": len(security_events),
-            "high": len([e for e in security_events if e["severity"] == "high"]),
-            "medium": len([e for e in security_events if e["severity"] == "medium"]),
-            "low": len([e for e in security_events if e["severity"] == "low"])
-        }
+        since = request.args.get('since', type=int)
+        severity = request.args.get('severity')
+        limit = min(request.args.get('limit', 20, type=int), SECURITY_EVENTS_RETAINED)
+        if severity and severity not in SEVERITIES:
+            return jsonify({"error": f"Unknown severity '{severity}'"}), 400
+
+        security_events, event_stats, cursor = changelog_manager.get_security_events(
+            since=since, severity=severity, limit=limit)
 
         result = {
             "timestamp": datetime.now().isoformat(),
             "events": security_events,
-            "statistics": event_stats
+            "statistics": event_stats,
+            "cursor": cursor
         }
 
-        changelog_manager.add_entry(
-            "api_call", f"Security events requested: {len(security_events)} events")
+        # Only full loads are logged; cursor polls would flood the changelog
+        if since is None:
+            changelog_manager.add_entry(
+                "api_call", f"Security events requested: {len(security_events)} events")
         return jsonify(result)
 
     except Exception as e:
@@ -1488,58 +2416,47 @@ def get_security_events():
 
 @app.route('/api/dashboard/network-stats')
 def get_network_stats():
-    """Get network statistics for containers and system"""
-    try:
-        import psutil
+    """Get network statistics for containers and system.
 
-        # Get network interface statistics
-        network_stats = psutil.net_io_counters()
+    Counters and per-interface rates come from the background host sampler
+    and the Docker networks from the cached topology model, so a request
+    neither forks the docker CLI nor lists containers.
+    """
+    try:
+        host = host_metrics.current()
+        counters = host["counters"]
+        rates = host["rates"]
 
-        # Docker network information
         try:
-            result = subprocess.run(
-                ['docker', 'network', 'ls', '--format',
-                    '{{.Name}}\t{{.Driver}}\t{{.Scope}}'],
-                capture_output=True, text=True, timeout=10
-            )
-
-            networks = []
-            if result.returncode == 0:
-                for line in result.stdout.strip().split('\n'):
-                    if line.strip():
-                        parts = line.split('\t')
-                        if len(parts) >= 3:
-                            networks.append({
-                                "name": parts[0],
-                                "driver": parts[1],
-                                "scope": parts[2]
-                            })
-        except Exception:
-            networks = []
+            topology = container_monitor.network_topology()
+        except Exception as e:
+            logger.error(f"Error getting Docker network topology: {e}")
+            topology = {"networks": [], "published_ports": []}
+        networks = topology["networks"]
 
         # Container port mappings
-        all_containers = container_monitor.get_all_container_status()
-        active_ports = []
-        for container in all_containers.values():
-            if container["status"] == "running" and container["ports"]:
-                ports = container["ports"]
-                if ports and ports != "":
-                    active_ports.append({
-                        "container": container["name"],
-                        "ports": ports
-                    })
+        _, all_containers = container_monitor.snapshot()
+        active_ports = [{"container": container["name"], "ports": container["ports"]}
+                        for container in all_containers.values()
+                        if container["status"] == "running" and container["ports"]]
 
         stats = {
             "timestamp": datetime.now().isoformat(),
             "system_network": {
-                "bytes_sent": network_stats.bytes_sent,
-                "bytes_recv": network_stats.bytes_recv,
-                "packets_sent": network_stats.packets_sent,
-                "packets_recv": network_stats.packets_recv,
-                "errors_in": network_stats.errin,
-                "errors_out": network_stats.errout
+                "bytes_sent": counters["net_bytes_sent"],
+                "bytes_recv": counters["net_bytes_recv"],
+                "packets_sent": counters["net_packets_sent"],
+                "packets_recv": counters["net_packets_recv"],
+                "errors_in": counters["net_errors_in"],
+                "errors_out": counters["net_errors_out"],
+                "bytes_sent_per_sec": rates.get("net_bytes_sent_per_sec"),
+                "bytes_recv_per_sec": rates.get("net_bytes_recv_per_sec"),
+                "packets_sent_per_sec": rates.get("net_packets_sent_per_sec"),
+                "packets_recv_per_sec": rates.get("net_packets_recv_per_sec")
             },
+            "interfaces": host["interfaces"],
             "docker_networks": networks,
+            "published_ports": topology["published_ports"],
             "active_ports": active_ports,
             "network_health": "healthy" if len(networks) > 0 else "warning"
         }
@@ -1556,63 +2473,75 @@ def get_network_stats():
 # YARA & Sigma Hunting Rules Management API
 # ============================================================================
 
+# Rule file indexes, refreshed from directory mtimes instead of walking the
+# trees on every request
+yara_inventory = RuleInventory(
+    YARA_RULES_DIR, ('.yar',), parse_yara,
+    check_interval=RULE_INVENTORY_CHECK_INTERVAL)
+sigma_inventory = RuleInventory(
+    os.path.join(SIGMA_RULES_DIR, 'rules'), ('.yml',), parse_sigma,
+    relative_to=SIGMA_RULES_DIR, default_category='unknown',
+    check_interval=RULE_INVENTORY_CHECK_INTERVAL, store_path=SIGMA_RULE_STORE)
+sigma_index = SigmaRuleIndex(sigma_inventory)
+
+if POOL_PROCESS:
+    yara_rulesets = scan_results = None
+elif yara_engine.yara is not None:
+    yara_rulesets = YaraRulesetCache(YARA_CACHE_DIR, YARA_CACHE_RULESETS)
+    scan_results = ScanResultCache(YARA_RESULT_CACHE)
+else:
+    logger.warning("yara-python not installed, YARA scans use the yara CLI")
+    yara_rulesets = None
+    scan_results = None
+
+_tool_versions = {}
+
+
+def tool_version(command, first_line=False):
+    """Version output of a command-line tool, looked up once per process"""
+    key = tuple(command)
+    if key not in _tool_versions:
+        try:
+            result = subprocess.run(command, capture_output=True, text=True, timeout=5)
+            version = result.stdout.strip() if result.returncode == 0 else "Unknown"
+            if first_line:
+                version = version.split('\n')[0]
+        except Exception:
+            version = "Unknown"
+        _tool_versions[key] = version
+    return _tool_versions[key]
+
+
+def last_update_line(log_path):
+    """Last line of a rule update log, or 'Never' if there is none"""
+    if os.path.exists(log_path):
+        try:
+            with open(log_path, 'rb') as f:
+                # Only the tail is needed; the log grows with every update
+                f.seek(max(0, os.path.getsize(log_path) - 4096))
+                lines = f.read().decode('utf-8', 'replace').splitlines()
+                if lines:
+                    return lines[-1].strip()[:50]
+        except Exception:
+            pass
+    return "Never"
+
+
 @app.route('/api/hunting/yara/stats')
 def get_yara_stats():
     """Get YARA installation statistics"""
     try:
-        result = subprocess.run(['yara', '--version'],
-                                capture_output=True, text=True, timeout=5)
-        version = result.stdout.strip() if result.returncode == 0 else "Unknown"
-
-        # Count rules
-        yara_rules_path = "/opt/yara-rules"
-        if os.path.exists(yara_rules_path):
-            rule_files = subprocess.run(
-                ['find', yara_rules_path, '-name', '*.yar', '-type', 'f'],
-                capture_output=True, text=True, timeout=10
-            )
-            total_rules = len(rule_files.stdout.strip().split(
-                '\n')) if rule_files.stdout.strip() else 0
-
-            # Get categories
-            categories = []
-            if os.path.exists(yara_rules_path):
-                for item in os.listdir(yara_rules_path):
-                    item_path = os.path.join(yara_rules_path, item)
-                    if os.path.isdir(item_path) and not item.startswith('.'):
-                        cat_rules = subprocess.run(
-                            ['find', item_path, '-name', '*.yar', '-type', 'f'],
-                            capture_output=True, text=True, timeout=5
-                        )
-                        count = len(cat_rules.stdout.strip().split(
-                            '\n')) if cat_rules.stdout.strip() else 0
-                        categories.append({
-                            'name': item,
-                            'count': count,
-                            'path': item_path
-                        })
-        else:
-            total_rules = 0
-            categories = []
-
-        # Check last update
-        last_update = "Never"
-        if os.path.exists('/var/log/yara-update.log'):
-            try:
-                with open('/var/log/yara-update.log', 'r') as f:
-                    lines = f.readlines()
-                    if lines:
-                        last_update = lines[-1].strip()[:50]
-            except:
-                pass
-
         stats = {
             'installed': os.path.exists('/usr/bin/yara'),
-            'version': version,
-            'total_rules': total_rules,
-            'rules_path': yara_rules_path,
-            'categories': categories,
-            'last_update': last_update
+            'version': tool_version(['yara', '--version']),
+            'total_rules': yara_inventory.total(),
+            'rule_count': sum(rule['rule_count'] for rule in yara_inventory.rules()),
+            'rules_path': YARA_RULES_DIR,
+            'categories': yara_inventory.categories(),
+            'last_update': last_update_line('/var/log/yara-update.log'),
+            'scan_engine': 'yara-python' if yara_rulesets is not None else 'yara-cli',
+            'compiled_rulesets': yara_rulesets.stats() if yara_rulesets is not None else None,
+            'result_cache': scan_results.stats() if scan_results is not None else None
         }
 
         return jsonify(stats)
@@ -1625,60 +2554,14 @@ def get_yara_stats():
 def get_sigma_stats():
     """Get Sigma installation statistics"""
     try:
-        result = subprocess.run(['sigma', 'version'],
-                                capture_output=True, text=True, timeout=5)
-        version = result.stdout.strip().split(
-            '\n')[0] if result.returncode == 0 else "Unknown"
-
-        # Count rules
-        sigma_rules_path = "/opt/sigma-rules/rules"
-        if os.path.exists(sigma_rules_path):
-            rule_files = subprocess.run(
-                ['find', sigma_rules_path, '-name', '*.yml', '-type', 'f'],
-                capture_output=True, text=True, timeout=10
-            )
-            total_rules = len(rule_files.stdout.strip().split(
-                '\n')) if rule_files.stdout.strip() else 0
-
-            # Get main categories
-            categories = []
-            if os.path.exists(sigma_rules_path):
-                for item in os.listdir(sigma_rules_path):
-                    item_path = os.path.join(sigma_rules_path, item)
-                    if os.path.isdir(item_path):
-                        cat_rules = subprocess.run(
-                            ['find', item_path, '-name', '*.yml', '-type', 'f'],
-                            capture_output=True, text=True, timeout=5
-                        )
-                        count = len(cat_rules.stdout.strip().split(
-                            '\n')) if cat_rules.stdout.strip() else 0
-                        categories.append({
-                            'name': item,
-                            'count': count,
-                            'path': item_path
-                        })
-        else:
-            total_rules = 0
-            categories = []
-
-        # Check last update
-        last_update = "Never"
-        if os.path.exists('/var/log/sigma-update.log'):
-            try:
-                with open('/var/log/sigma-update.log', 'r') as f:
-                    lines = f.readlines()
-                    if lines:
-                        last_update = lines[-1].strip()[:50]
-            except:
-                pass
-
         stats = {
             'installed': os.path.exists('/usr/local/bin/sigma'),
-            'version': version,
-            'total_rules': total_rules,
-            'rules_path': sigma_rules_path,
-            'categories': categories,
-            'last_update': last_update
+            'version': tool_version(['sigma', 'version'], first_line=True),
+            'total_rules': sigma_inventory.total(),
+            'rules_path': sigma_inventory.root,
+            'categories': sigma_inventory.categories(),
+            'last_update': last_update_line('/var/log/sigma-update.log'),
+            'converter': sigma_converter.stats()
         }
 
         return jsonify(stats)
@@ -1699,7 +2582,7 @@ def update_hunting_rules():
         if rule_type in ['yara', 'all']:
             # Update YARA rules
             yara_result = subprocess.run(
-                ['git', '-C', '/opt/yara-rules', 'pull'],
+                ['git', '-C', YARA_RULES_DIR, 'pull'],
                 capture_output=True, text=True, timeout=30
             )
             results['yara'] = {
@@ -1719,11 +2602,12 @@ def update_hunting_rules():
                 user="portal",
                 level="info"
             )
+            yara_inventory.refresh(force=True)
 
         if rule_type in ['sigma', 'all']:
             # Update Sigma rules
             sigma_result = subprocess.run(
-                ['git', '-C', '/opt/sigma-rules', 'pull'],
+                ['git', '-C', SIGMA_RULES_DIR, 'pull'],
                 capture_output=True, text=True, timeout=30
             )
             results['sigma'] = {
@@ -1743,6 +2627,7 @@ def update_hunting_rules():
                 user="portal",
                 level="info"
             )
+            sigma_inventory.refresh(force=True)
 
         return jsonify({
             'success': True,
@@ -1822,29 +2707,56 @@ def get_hunting_logs():
         return jsonify({'error': str(e)}), 500
 
 
+def yara_scan_request(data):
+    """Check the target path and rule file of a scan request.
+
+    Returns ``(target_path, rule_category, rule_path, None)``, or an error
+    response as the last element.
+    """
+    target_path = data.get('path', '/tmp')
+    rule_category = data.get('category', 'malware_index.yar')
+
+    # Security: Prevent directory traversal
+    if '..' in target_path or target_path.startswith(YARA_RULES_DIR):
+        return None, None, None, (jsonify({'success': False, 'error': 'Invalid path'}), 400)
+    if '..' in rule_category:
+        return None, None, None, (jsonify({'success': False, 'error': 'Invalid rule'}), 400)
+
+    rule_path = os.path.join(YARA_RULES_DIR, rule_category)
+    if not os.path.exists(rule_path):
+        return None, None, None, (jsonify(
+            {'success': False, 'error': f'Rule file not found: {rule_category}'}), 404)
+    if not os.path.exists(target_path):
+        return None, None, None, (jsonify(
+            {'success': False, 'error': f'Path not found: {target_path}'}), 404)
+    return target_path, rule_category, rule_path, None
+
+
 @app.route('/api/hunting/yara/scan', methods=['POST'])
 def run_yara_scan():
     """Run YARA scan on specified path"""
     try:
-        data = request.get_json() or {}
-        target_path = data.get('path', '/tmp')
-        rule_category = data.get('category', 'malware_index.yar')
-
-        # Security: Prevent directory traversal
-        if '..' in target_path or target_path.startswith('/opt/yara-rules'):
-            return jsonify({'success': False, 'error': 'Invalid path'}), 400
-
-        rule_path = f"/opt/yara-rules/{rule_category}"
-        if not os.path.exists(rule_path):
-            return jsonify({'success': False, 'error': f'Rule file not found: {rule_category}'}), 404
+        target_path, rule_category, rule_path, error = yara_scan_request(request.get_json() or {})
+        if error:
+            return error
 
-        # Run YARA scan
-        result = subprocess.run(
-            ['yara', '-r', rule_path, target_path],
-            capture_output=True, text=True, timeout=60
-        )
+        started = time.time()
+        if yara_rulesets is not None:
+            try:
+                rules, ruleset, ruleset_source = yara_rulesets.get(rule_path)
+            except yara_engine.yara.Error as e:
+                return jsonify({'success': False, 'error': f'Rule compilation failed: {e}'}), 400
+            if ruleset_source == 'compiled':
+                scan_results.set_ruleset(os.path.realpath(rule_path), ruleset)
+            result = yara_engine.scan_path(rules, target_path, timeout=YARA_SCAN_TIMEOUT,
+                                           results=scan_results, ruleset=ruleset)
+            engine = 'yara-python'
+        else:
+            result = yara_engine.scan_path_cli(rule_path, target_path, timeout=YARA_SCAN_TIMEOUT)
+            ruleset_source = 'compiled'
+            engine = 'yara-cli'
 
-        matches = result.stdout.strip().split('\n') if result.stdout.strip() else []
+        matches = result['matches']
 
         changelog_manager.add_entry(
             "yara_scan",
@@ -1857,40 +2769,157 @@ def run_yara_scan():
             'success': True,
             'matches': matches,
             'match_count': len(matches),
+            'files_scanned': result['files_scanned'],
+            'files_cached': result['files_cached'],
+            'bytes_scanned': result['bytes_scanned'],
+            'errors': result['errors'][:100],
+            'error_count': len(result['errors']),
             'target_path': target_path,
             'rule_used': rule_category,
+            'engine': engine,
+            'ruleset_source': ruleset_source,
+            'duration': round(time.time() - started, 3),
             'timestamp': datetime.now().isoformat()
         })
 
     except subprocess.TimeoutExpired:
-        return jsonify({'success': False, 'error': 'Scan timeout (60s exceeded)'}), 500
+        return jsonify({'success': False, 'error': f'Scan timeout ({YARA_SCAN_TIMEOUT}s exceeded)'}), 500
     except Exception as e:
         logger.error(f"Error running YARA scan: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/hunting/yara/jobs', methods=['POST'])
+def submit_yara_scan_job():
+    """Start a background YARA scan of a large tree.
+
+    Body as for ``/api/hunting/yara/scan``. Follow the job with
+    ``/api/hunting/yara/jobs/<id>`` or stream its matches from
+    ``/api/hunting/yara/jobs/<id>/matches``.
+    """
+    if yara_engine.yara is None:
+        return jsonify({'success': False, 'error': 'yara-python is required for scan jobs'}), 503
+    try:
+        target_path, rule_category, rule_path, error = yara_scan_request(request.get_json() or {})
+        if error:
+            return error
+        try:
+            job = yara_jobs.submit(target_path, rule_path, rule_category)
+        except yara_engine.yara.Error as e:
+            return jsonify({'success': False, 'error': f'Rule compilation failed: {e}'}), 400
+
+        changelog_manager.add_entry(
+            "yara_scan",
+            f"YARA scan job {job['id']} started: {target_path} with {rule_category}",
+            user="portal",
+            level="info"
+        )
+        return jsonify({'success': True, 'job': job}), 202
+
+    except Exception as e:
+        logger.error(f"Error starting YARA scan job: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+@app.route('/api/hunting/yara/jobs')
+def list_yara_scan_jobs():
+    """Recent YARA scan jobs, newest first"""
+    try:
+        return jsonify({'jobs': yara_jobs.list_jobs()})
+    except Exception as e:
+        logger.error(f"Error listing YARA scan jobs: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/hunting/yara/jobs/<job_id>')
+def get_yara_scan_job(job_id):
+    """Progress of a YARA scan job: counts, files/s, bytes/s and ETA"""
+    job = yara_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/hunting/yara/jobs/<job_id>', methods=['DELETE'])
+def cancel_yara_scan_job(job_id):
+    """Cancel an active YARA scan job"""
+    if yara_jobs.status(job_id) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if not yara_jobs.cancel(job_id):
+        return jsonify({'success': False, 'error': 'Job is not running'}), 409
+    return jsonify({'success': True})
+
+
+@app.route('/api/hunting/yara/jobs/<job_id>/matches')
+def stream_yara_scan_job(job_id):
+    """Stream a job's matches as NDJSON as they are found.
+
+    ``offset`` skips matches already received; ``follow=false`` returns the
+    matches found so far instead of waiting for the job to finish.
+    """
+    if yara_jobs.status(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+    offset = request.args.get('offset', 0, type=int)
+    follow = request.args.get('follow', 'true').lower() != 'false'
+
+    def generate():
+        for event in yara_jobs.stream(job_id, offset, follow):
+            yield json.dumps(event) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def sigma_conversion_target(data):
+    """Target and pipelines of a conversion request, or an error response"""
+    target = data.get('target', 'opensearch_lucene')
+    pipelines = data.get('pipeline') or []
+    if isinstance(pipelines, str):
+        pipelines = [pipelines]
+    plugins = sigma_converter.plugins()
+    if target not in plugins['targets']:
+        return None, None, (jsonify({'success': False, 'error': f"Unknown target '{target}'",
+                                     'targets': plugins['targets']}), 400)
+    unknown = [p for p in pipelines if p not in plugins['pipelines']]
+    if unknown:
+        return None, None, (jsonify({'success': False,
+                                     'error': f"Unknown pipeline: {', '.join(unknown)}",
+                                     'pipelines': plugins['pipelines']}), 400)
+    return target, pipelines, None
+
+
 @app.route('/api/hunting/sigma/convert', methods=['POST'])
 def convert_sigma_rule():
     """Convert Sigma rule to target format"""
     try:
         data = request.get_json() or {}
         rule_path = data.get('rule_path', '')
-        target = data.get('target', 'opensearch_lucene')
 
         # Security: Prevent directory traversal
-        if '..' in rule_path or not rule_path.startswith('/opt/sigma-rules'):
+        if '..' in rule_path or not rule_path.startswith(SIGMA_RULES_DIR):
             return jsonify({'success': False, 'error': 'Invalid rule path'}), 400
 
         if not os.path.exists(rule_path):
             return jsonify({'success': False, 'error': 'Rule file not found'}), 404
 
-        # Run Sigma conversion
-        result = subprocess.run(
-            ['sigma', 'convert', '-t', target, '--without-pipeline', rule_path],
-            capture_output=True, text=True, timeout=30
-        )
+        if sigma_converter.available():
+            target, pipelines, error = sigma_conversion_target(data)
+            if error:
+                return error
+            result = sigma_converter.convert(rule_path, target, pipelines)
+            output = result.get('output', '')
+            failure = None if result['success'] else {'error': result['error'], 'stdout': ''}
+        else:
+            # Without pySigma in the portal fall back to the sigma CLI
+            target = data.get('target', 'opensearch_lucene')
+            result = {'cached': False}
+            cli = subprocess.run(
+                ['sigma', 'convert', '-t', target, '--without-pipeline', rule_path],
+                capture_output=True, text=True, timeout=30
+            )
+            output = cli.stdout
+            failure = None if cli.returncode == 0 else {'error': cli.stderr, 'stdout': cli.stdout}
 
-        if result.returncode == 0:
+        if failure is None:
             changelog_manager.add_entry(
                 "sigma_convert",
                 f"Sigma rule converted: {os.path.basename(rule_path)} to {target}",
@@ -1900,60 +2929,120 @@ def convert_sigma_rule():
 
             return jsonify({
                 'success': True,
-                'converted_rule': result.stdout,
+                'converted_rule': output,
                 'target': target,
                 'source_file': os.path.basename(rule_path),
+                'cached': result['cached'],
                 'timestamp': datetime.now().isoformat()
             })
         else:
-            return jsonify({
-                'success': False,
-                'error': result.stderr,
-                'stdout': result.stdout
-            }), 400
+            return jsonify({'success': False, **failure}), 400
 
     except Exception as e:
         logger.error(f"Error converting Sigma rule: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/hunting/sigma/convert/batch', methods=['POST'])
+def convert_sigma_batch():
+    """Convert a category or the whole Sigma rule tree, streaming NDJSON.
+
+    Body: ``{"target": "opensearch_lucene", "category": "windows/process_creation",
+    "pipeline": [...], "include_output": true}``; without ``category`` every
+    rule is converted. One ``result`` line is streamed per rule as it is
+    converted, then a ``done`` line with the totals.
+    """
+    if not sigma_converter.available():
+        return jsonify({'success': False, 'error': 'pySigma is required for batch conversion'}), 503
+    try:
+        data = request.get_json() or {}
+        category = data.get('category', '')
+        if '..' in category:
+            return jsonify({'success': False, 'error': 'Invalid category'}), 400
+        search_path = os.path.join(
+            sigma_inventory.root, category) if category else sigma_inventory.root
+        if not sigma_inventory.has_directory(search_path):
+            return jsonify({'success': False, 'error': 'Category not found'}), 404
+
+        target, pipelines, error = sigma_conversion_target(data)
+        if error:
+            return error
+        rule_paths = [rule['path'] for rule in sigma_inventory.rules(under=search_path)]
+        include_output = bool(data.get('include_output', True))
+
+        changelog_manager.add_entry(
+            "sigma_convert",
+            f"Sigma batch conversion of {category or 'all rules'} ({len(rule_paths)}) to {target}",
+            user="portal",
+            level="info"
+        )
+    except Exception as e:
+        logger.error(f"Error starting Sigma batch conversion: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+    def generate():
+        for event in sigma_converter.convert_batch(rule_paths, target, pipelines, include_output):
+            yield json.dumps(event) + '\n'
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/api/hunting/sigma/targets')
+def list_sigma_targets():
+    """Conversion targets and processing pipelines of the installed pySigma plugins"""
+    if not sigma_converter.available():
+        return jsonify({'error': 'pySigma is not installed'}), 503
+    try:
+        return jsonify(sigma_converter.plugins())
+    except Exception as e:
+        logger.error(f"Error listing Sigma targets: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/hunting/sigma/rules')
 def list_sigma_rules():
-    """List available Sigma rules by category"""
+    """List Sigma rules by category, level, logsource and ATT&CK tag.
+
+    ``level``, ``status``, ``product``, ``service``, ``logsource_category``,
+    ``tag`` (``T1059`` includes its sub-techniques) and ``field`` accept
+    comma-separated values; ``logsource=windows/process_creation`` is short
+    for product and category. ``q`` searches titles and file names.
+    """
     try:
         category = request.args.get('category', '')
         limit = int(request.args.get('limit', 100))
+        offset = int(request.args.get('offset', 0))
 
-        sigma_base = "/opt/sigma-rules/rules"
         search_path = os.path.join(
-            sigma_base, category) if category else sigma_base
+            sigma_inventory.root, category) if category else sigma_inventory.root
 
-        if not os.path.exists(search_path):
+        if not sigma_inventory.has_directory(search_path):
             return jsonify({'error': 'Category not found'}), 404
 
-        # Find rules
-        result = subprocess.run(
-            ['find', search_path, '-name', '*.yml', '-type', 'f'],
-            capture_output=True, text=True, timeout=10
-        )
+        facets = {
+            'level': request.args.get('level'),
+            'status': request.args.get('status'),
+            'product': request.args.get('product'),
+            'service': request.args.get('service'),
+            'category': request.args.get('logsource_category'),
+            'tag': request.args.get('tag'),
+            'field': request.args.get('field')
+        }
+        logsource = request.args.get('logsource')
+        if logsource:
+            product, _, logsource_category = logsource.partition('/')
+            facets['product'] = facets['product'] or product
+            facets['category'] = facets['category'] or logsource_category
 
-        rule_files = result.stdout.strip().split('\n') if result.stdout.strip() else []
-        rule_files = [f for f in rule_files if f][:limit]
-
-        rules = []
-        for rule_file in rule_files:
-            rel_path = rule_file.replace('/opt/sigma-rules/', '')
-            rules.append({
-                'name': os.path.basename(rule_file),
-                'path': rule_file,
-                'relative_path': rel_path,
-                'category': rel_path.split('/')[1] if '/' in rel_path else 'unknown',
-                'size': os.path.getsize(rule_file) if os.path.exists(rule_file) else 0
-            })
+        matched = sigma_index.query(
+            under=search_path if category else None, text=request.args.get('q'), **facets)
+        rules = matched[offset:offset + limit]
 
         return jsonify({
             'rules': rules,
             'total': len(rules),
+            'matched': len(matched),
+            'offset': offset,
             'category': category or 'all'
         })
 
@@ -1962,38 +3051,29 @@ def list_sigma_rules():
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/hunting/sigma/rules/facets')
+def get_sigma_rule_facets():
+    """Rule counts per level, status, logsource, ATT&CK tag and field"""
+    try:
+        return jsonify(sigma_index.facets(top=request.args.get('top', 50, type=int)))
+    except Exception as e:
+        logger.error(f"Error getting Sigma rule facets: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/hunting/yara/rules')
 def list_yara_rules():
     """List available YARA rules by category"""
     try:
         category = request.args.get('category', '')
 
-        yara_base = "/opt/yara-rules"
         search_path = os.path.join(
-            yara_base, category) if category else yara_base
+            yara_inventory.root, category) if category else yara_inventory.root
 
-        if not os.path.exists(search_path):
+        if not yara_inventory.has_directory(search_path):
             return jsonify({'error': 'Category not found'}), 404
 
-        # Find rule files
-        result = subprocess.run(
-            ['find', search_path, '-name', '*.yar', '-type', 'f'],
-            capture_output=True, text=True, timeout=10
-        )
-
-        rule_files = result.stdout.strip().split('\n') if result.stdout.strip() else []
-        rule_files = [f for f in rule_files if f]
-
-        rules = []
-        for rule_file in rule_files:
-            rel_path = rule_file.replace('/opt/yara-rules/', '')
-            rules.append({
-                'name': os.path.basename(rule_file),
-                'path': rule_file,
-                'relative_path': rel_path,
-                'category': os.path.dirname(rel_path).split('/')[0] if '/' in rel_path else 'root',
-                'size': os.path.getsize(rule_file) if os.path.exists(rule_file) else 0
-            })
+        rules = yara_inventory.rules(under=search_path)
 
         return jsonify({
             'rules': rules,
@@ -2013,7 +3093,7 @@ def get_rule_content():
         rule_path = request.args.get('path', '')
 
         # Security: Ensure path is within allowed directories
-        if not rule_path.startswith('/opt/yara-rules/') and not rule_path.startswith('/opt/sigma-rules/'):
+        if not rule_path.startswith(YARA_RULES_DIR + '/') and not rule_path.startswith(SIGMA_RULES_DIR + '/'):
             return jsonify({'error': 'Invalid path - must be in yara-rules or sigma-rules'}), 400
 
         # Prevent directory traversal
@@ -2485,11 +3565,12 @@ def get_agent_info():
     """Get information about Velociraptor agent deployment"""
     try:
         # Check if velociraptor is running
-        veloci_status = container_monitor.get_tool_container_status().get('velociraptor', {})
+        all_containers = container_monitor.get_all_container_status()
+        veloci_status = container_monitor.get_tool_container_status(
+            all_containers).get('velociraptor', {})
 
         # Check if port 8000 is exposed
-        veloci_container_info = container_monitor.get_all_container_status().get(
-            'velociraptor', {})
+        veloci_container_info = all_containers.get('velociraptor', {})
         ports = veloci_container_info.get('ports', '')
         port_8000_exposed = '8000' in ports
 
@@ -2802,6 +3883,97 @@ def sync_misp_feeds():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+def serve_development():
+    """Run the Werkzeug HTTP and HTTPS servers in threads of this process"""
+    def run_http():
+        logger.info(f"🌐 Starting HTTP server on port {PORT}")
+        changelog_manager.add_entry(
+            "system_startup", f"Portal started with HTTP on port {PORT}", level="info")
+        app.run(host='0.0.0.0', port=PORT, debug=False, threaded=True, ssl_context=None, use_reloader=False)
+
+    def run_https():
+        if ENABLE_HTTPS and os.path.exists(SSL_CERT_PATH) and os.path.exists(SSL_KEY_PATH):
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            ssl_context.load_cert_chain(SSL_CERT_PATH, SSL_KEY_PATH)
+            logger.info(f"🔒 Starting HTTPS server on port {HTTPS_PORT}")
+            changelog_manager.add_entry(
+                "system_startup", f"Portal started with HTTPS on port {HTTPS_PORT}", level="success")
+            app.run(host='0.0.0.0', port=HTTPS_PORT, debug=False,
+                    threaded=True, ssl_context=ssl_context, use_reloader=False)
+        else:
+            logger.warning("⚠️  SSL certificates not found, HTTPS server not started")
+
+    # Start HTTP server in a separate thread
+    http_thread = threading.Thread(target=run_http, daemon=True)
+    http_thread.start()
+
+    # Start HTTPS server in the main thread
+    run_https()
+    # Without HTTPS keep serving HTTP until shutdown
+    http_thread.join()
+
+
+def serve_gunicorn():
+    """Serve HTTP and HTTPS from gunicorn worker processes.
+
+    This process keeps the only changelog manager, container monitor and
+    metric samplers and serves them to the workers over a UNIX socket, so
+    adding workers adds request capacity without adding Docker monitors,
+    changelog writers or dashboard push producers. Workers are recycled after PORTAL_MAX_REQUESTS
+    requests.
+    """
+    authkey = os.urandom(16)
+    serve_state({
+        "changelog_manager": changelog_manager,
+        "container_monitor": container_monitor,
+        "host_metrics": host_metrics,
+        "trends_store": trends_store,
+        "yara_jobs": yara_jobs,
+        "sigma_converter": sigma_converter,
+        "push_broadcaster": push_broadcaster
+    }, PORTAL_STATE_SOCKET, authkey)
+
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '--chdir', os.path.dirname(os.path.abspath(__file__)),
+        '--worker-class', 'gthread',
+        '--workers', str(PORTAL_WORKERS),
+        # Each open dashboard stream holds one worker thread
+        '--threads', str(PORTAL_THREADS),
+        '--max-requests', str(PORTAL_MAX_REQUESTS),
+        '--max-requests-jitter', str(PORTAL_MAX_REQUESTS // 10),
+        '--timeout', str(PORTAL_WORKER_TIMEOUT),
+        '--graceful-timeout', '10',
+    ]
+    env = dict(os.environ, PORTAL_STATE_AUTHKEY=authkey.hex())
+
+    web_servers.append(
+        subprocess.Popen(command + ['--bind', f'0.0.0.0:{PORT}', 'app:app'], env=env))
+    logger.info(f"🌐 Starting HTTP server on port {PORT} with {PORTAL_WORKERS} workers")
+    changelog_manager.add_entry(
+        "system_startup", f"Portal started with HTTP on port {PORT}", level="info")
+
+    if ENABLE_HTTPS and os.path.exists(SSL_CERT_PATH) and os.path.exists(SSL_KEY_PATH):
+        web_servers.append(subprocess.Popen(
+            command + ['--bind', f'0.0.0.0:{HTTPS_PORT}', '--certfile', SSL_CERT_PATH,
+                       '--keyfile', SSL_KEY_PATH, 'app:app'], env=env))
+        logger.info(f"🔒 Starting HTTPS server on port {HTTPS_PORT} with {PORTAL_WORKERS} workers")
+        changelog_manager.add_entry(
+            "system_startup", f"Portal started with HTTPS on port {HTTPS_PORT}", level="success")
+    else:
+        logger.warning("⚠️  SSL certificates not found, HTTPS server not started")
+
+    try:
+        while all(server.poll() is None for server in web_servers):
+            time.sleep(1)
+        logger.error("A gunicorn server exited, shutting down the portal")
+        changelog_manager.add_entry(
+            "system_error", "Web server process exited unexpectedly", level="error")
+    finally:
+        shutdown()
+    sys.exit(1)
+
+
 if __name__ == '__main__':
     logger.info(f"🚀 Starting CyberBlueBox Portal on port {PORT}")
     logger.info(f"📱 Access the portal at: http://localhost:{PORT}")
@@ -2819,6 +3991,14 @@ if __name__ == '__main__':
         def start_monitoring_async():
             try:
                 container_monitor.start_monitoring()
+                host_metrics.start()
+                if TRENDS_ENABLED:
+                    trends_store.start(sample_trends, interval=TRENDS_SAMPLE_INTERVAL)
+                sigma_converter.warm()
+                resumed = yara_jobs.resume()
+                if resumed:
+                    changelog_manager.add_entry(
+                        "yara_scan", f"Resumed {resumed} interrupted YARA scan job(s)", level="info")
             except Exception as e:
                 logger.error(f"Error starting container monitoring: {e}")
 
@@ -2826,40 +4006,25 @@ if __name__ == '__main__':
             target=start_monitoring_async, daemon=True)
         monitoring_thread.start()
 
-        # Start HTTP and HTTPS servers in separate threads
-        def run_http():
-            logger.info(f"🌐 Starting HTTP server on port {PORT}")
-            changelog_manager.add_entry(
-                "system_startup", f"Portal started with HTTP on port {PORT}", level="info")
-            app.run(host='0.0.0.0', port=PORT, debug=False, threaded=True, ssl_context=None, use_reloader=False)
-
-        def run_https():
-            if ENABLE_HTTPS and os.path.exists(SSL_CERT_PATH) and os.path.exists(SSL_KEY_PATH):
-                ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-                ssl_context.load_cert_chain(SSL_CERT_PATH, SSL_KEY_PATH)
-                logger.info(f"🔒 Starting HTTPS server on port {HTTPS_PORT}")
-                changelog_manager.add_entry(
-                    "system_startup", f"Portal started with HTTPS on port {HTTPS_PORT}", level="success")
-                app.run(host='0.0.0.0', port=HTTPS_PORT, debug=False, 
-                       threaded=True, ssl_context=ssl_context, use_reloader=False)
-            else:
-                logger.warning("⚠️  SSL certificates not found, HTTPS server not started")
-
-        # Start HTTP server in a separate thread
-        http_thread = threading.Thread(target=run_http, daemon=True)
-        http_thread.start()
-
-        # Start HTTPS server in the main thread
-        run_https()
+        use_gunicorn = PORTAL_SERVER == 'gunicorn'
+        if use_gunicorn and importlib.util.find_spec('gunicorn') is None:
+            logger.warning("⚠️  gunicorn is not installed, using the development server")
+            use_gunicorn = False
+        if use_gunicorn:
+            serve_gunicorn()
+        else:
+            serve_development()
 
     except KeyboardInterrupt:
         logger.info("Shutting down CyberBlueBox Portal...")
         changelog_manager.add_entry(
             "system_shutdown", "CyberBlueBox Portal shut down gracefully")
+        shutdown()
     except Exception as e:
         logger.error(f"Error starting server: {e}")
         changelog_manager.add_entry(
             "system_error", f"Server startup error: {e}", level="error")
         # Don't exit immediately, try to log the error
         time.sleep(5)
+        shutdown()
         sys.exit(1)
@@ -0,0 +1,1293 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Changelog Storage
+Pluggable changelog storage engines (append-only JSON-lines journal with
+compressed archive tiers, or SQLite/WAL) plus in-memory indexes and stats
+"""
+
+import io
+import os
+import gzip
+import json
+import logging
+import shutil
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = 'index.json'
+ARCHIVE_DIR = 'archive'
+SEGMENT_PREFIX = 'segment-'
+SEGMENT_SUFFIX = '.jsonl'
+COMPRESSION_SUFFIXES = {'gzip': '.gz', 'zstd': '.zst'}
+ENTRY_COLUMNS = ("id", "timestamp", "action", "details", "user", "level")
+# Columns usable as equality filters; SQL column names cannot be parameters
+FILTER_COLUMNS = ("level", "action", "user")
+
+# Entries are bucketed per hour ("YYYY-MM-DDTHH") for time range lookups
+TIME_BUCKET_CHARS = 13
+
+# Security event severities, most severe first, with their dashboard style
+SEVERITIES = ("high", "medium", "low")
+SEVERITY_STYLES = {
+    "high": ("fas fa-exclamation-triangle", "danger"),
+    "medium": ("fas fa-exclamation-circle", "warning"),
+    "low": ("fas fa-info-circle", "info")
+}
+
+
+def entry_matches(entry, filters, since=None, until=None, text=None,
+                  keywords=None):
+    """Check an entry against equality filters, a time range and free text.
+
+    ``text`` must match the action or details; ``keywords`` matches when any
+    of them does. Both are expected in lowercase.
+    """
+    if any(entry.get(field) != value for field, value in filters.items()):
+        return False
+    if since and entry["timestamp"] < since:
+        return False
+    if until and entry["timestamp"] > until:
+        return False
+    if text or keywords:
+        haystack = entry.get("action", "").lower() + "\n" + \
+            str(entry.get("details", "")).lower()
+        if text and text not in haystack:
+            return False
+        if keywords and not any(keyword in haystack for keyword in keywords):
+            return False
+    return True
+
+
+class ChangelogStorage:
+    """Interface implemented by changelog storage engines.
+
+    ChangelogManager keeps the newest ("hot") entries in memory and asks the
+    storage for everything older. Engines persist entries in id order and
+    report the counts of the entries outside the hot tier so statistics can
+    be seeded without reading them.
+    """
+
+    @property
+    def created(self):
+        raise NotImplementedError
+
+    @property
+    def last_id(self):
+        """Highest entry id stored"""
+        raise NotImplementedError
+
+    @property
+    def hot_first_id(self):
+        """First entry id of the hot tier, or None when it is empty"""
+        raise NotImplementedError
+
+    def append(self, entry, update=False):
+        raise NotImplementedError
+
+    def append_batch(self, entries, update=False):
+        """Persist several entries with a single commit.
+
+        ``update`` marks new versions of entries that are already stored
+        (coalesced repeats); they replace the stored version without being
+        counted again.
+        """
+        raise NotImplementedError
+
+    def read_hot(self):
+        """Yield the hot entries, oldest first"""
+        raise NotImplementedError
+
+    def archived_counts(self):
+        """Total, per-level and per-action counts outside the hot tier"""
+        raise NotImplementedError
+
+    def compact(self, hot_days=7, hot_entries=50000, retention_days=90,
+                compression='gzip', now=None):
+        """Apply the retention policy, returning (archived, expired) records"""
+        raise NotImplementedError
+
+    def query_archive(self, filters, limit=None, before=None, since=None,
+                      until=None, text=None, keywords=None):
+        """Return the newest matches outside the hot tier, oldest first"""
+        raise NotImplementedError
+
+    def import_legacy(self, legacy_file):
+        """Import a legacy changelog.json file in one pass"""
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class ChangelogJournal(ChangelogStorage):
+    """Append-only changelog journal split into rotating JSON-lines segments.
+
+    Every entry is written as a single line to the active segment, so adding
+    an entry costs one small write instead of re-serializing the history.
+    Segments are rotated once they reach ``segment_max_bytes`` and described
+    in ``index.json`` (id range, time range, size, level/action counts), which
+    is only rewritten on rotation, compaction and close.
+
+    Sealed segments that leave the hot window are compacted into compressed
+    files under ``archive/``; they stay listed in the index so time range
+    queries can still reach them without loading them at startup.
+    """
+
+    def __init__(self, directory, segment_max_bytes=8 * 1024 * 1024,
+                 fsync_batch=50, fsync_interval=1.0):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.index_path = os.path.join(directory, INDEX_FILE)
+
+        self._lock = threading.RLock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self._open_active_segment()
+
+    # ------------------------------------------------------------------
+    # Index handling
+    # ------------------------------------------------------------------
+
+    def _load_index(self):
+        """Load the segment index, recovering it from disk if missing"""
+        self.index = None
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    self.index = json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading changelog index, rebuilding: {e}")
+
+        if self.index is None:
+            self.index = {
+                "version": 1,
+                "created": datetime.now().isoformat(),
+                "segments": []
+            }
+            last_id = 0
+            for name in self._segment_files():
+                record = self._scan_segment(name, after_id=last_id)
+                record["archived"] = name.startswith(ARCHIVE_DIR + '/')
+                self.index["segments"].append(record)
+                last_id = max(last_id, record["last_id"] or 0)
+            self._write_index()
+
+        # The active segment may have grown since the index was last written
+        if self.index["segments"]:
+            active = self.index["segments"][-1]
+            previous = [segment["last_id"] or 0 for segment in self.index["segments"][:-1]]
+            self.index["segments"][-1] = self._scan_segment(
+                active["name"], after_id=max(previous, default=0))
+
+    def _write_index(self):
+        """Atomically persist the segment index"""
+        tmp_path = self.index_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    def _segment_files(self):
+        """List hot and archived segment file names in id order"""
+        names = [
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        ]
+        archive_dir = os.path.join(self.directory, ARCHIVE_DIR)
+        if os.path.isdir(archive_dir):
+            names.extend(
+                f"{ARCHIVE_DIR}/{name}" for name in os.listdir(archive_dir)
+                if name.startswith(SEGMENT_PREFIX)
+            )
+        return sorted(names, key=os.path.basename)
+
+    def _segment_path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _scan_segment(self, name, after_id=0):
+        """Build the index record for a segment by reading it once.
+
+        Entries whose id is not above ``after_id`` or an id already seen are
+        updates of earlier entries (coalesced repeats) and are not counted.
+        """
+        info = {
+            "name": name,
+            "first_id": None,
+            "last_id": None,
+            "first_ts": None,
+            "last_ts": None,
+            "count": 0,
+            "bytes": 0,
+            "levels": {},
+            "actions": {}
+        }
+        path = self._segment_path(name)
+        if not os.path.exists(path):
+            return info
+
+        for entry in self._read_segment(name):
+            if entry["id"] > max(after_id, info["last_id"] or 0):
+                self._account(info, entry)
+        info["bytes"] = os.path.getsize(path)
+        return info
+
+    @staticmethod
+    def _account(info, entry):
+        """Fold a single entry into a segment index record"""
+        if info["first_id"] is None:
+            info["first_id"] = entry["id"]
+            info["first_ts"] = entry["timestamp"]
+        info["last_id"] = max(info["last_id"] or 0, entry["id"])
+        info["last_ts"] = entry["timestamp"]
+        info["count"] += 1
+        levels = info.setdefault("levels", {})
+        levels[entry.get("level")] = levels.get(entry.get("level"), 0) + 1
+        actions = info.setdefault("actions", {})
+        actions[entry.get("action")] = actions.get(entry.get("action"), 0) + 1
+
+    # ------------------------------------------------------------------
+    # Segment handling
+    # ------------------------------------------------------------------
+
+    def _open_active_segment(self):
+        """Open the newest segment for appending, creating one if needed"""
+        if not self.index["segments"]:
+            self._new_segment()
+            return
+        active = self.index["segments"][-1]
+        path = self._segment_path(active["name"])
+        if os.path.exists(path):
+            active["bytes"] = self._truncate_torn_line(path)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _truncate_torn_line(path):
+        """Cut a partly written last line left by a crash; returns the new size.
+
+        Otherwise the next entry would be appended to it and be unreadable.
+        """
+        with open(path, 'rb+') as f:
+            size = f.seek(0, os.SEEK_END)
+            end = size
+            while end > 0:
+                start = max(0, end - 4096)
+                f.seek(start)
+                newline = f.read(end - start).rfind(b'\n')
+                if newline != -1:
+                    end = start + newline + 1
+                    break
+                end = start
+            if end < size:
+                logger.warning(f"Truncating torn last line of changelog segment {path}")
+                f.truncate(end)
+        return end
+
+    def _new_segment(self):
+        """Start a new active segment"""
+        number = 1
+        if self.index["segments"]:
+            last = os.path.basename(self.index["segments"][-1]["name"])
+            number = int(last[len(SEGMENT_PREFIX):].split('.')[0]) + 1
+        name = f"{SEGMENT_PREFIX}{number:06d}{SEGMENT_SUFFIX}"
+        self.index["segments"].append({
+            "name": name,
+            "first_id": None,
+            "last_id": None,
+            "first_ts": None,
+            "last_ts": None,
+            "count": 0,
+            "bytes": 0,
+            "levels": {},
+            "actions": {}
+        })
+        self._file = open(self._segment_path(name), 'a', encoding='utf-8')
+        self._write_index()
+
+    def _rotate(self):
+        """Seal the active segment and start a new one"""
+        self._sync()
+        self._file.close()
+        logger.info(
+            f"Changelog segment {self.index['segments'][-1]['name']} sealed")
+        self._new_segment()
+
+    def _open_segment(self, name):
+        """Open a hot or archived segment for reading as text"""
+        path = self._segment_path(name)
+        if name.endswith('.gz'):
+            return gzip.open(path, 'rt', encoding='utf-8')
+        if name.endswith('.zst'):
+            if zstandard is None:
+                raise RuntimeError(
+                    f"zstandard is required to read archived segment {name}")
+            reader = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'))
+            return io.TextIOWrapper(reader, encoding='utf-8')
+        return open(path, 'r', encoding='utf-8')
+
+    def _read_segment(self, name):
+        """Yield the entries stored in a segment, skipping torn lines"""
+        with self._open_segment(name) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping corrupt changelog line in {name}")
+
+    def _sync(self):
+        """Flush buffered writes and fsync the active segment"""
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    @property
+    def created(self):
+        return self.index.get("created")
+
+    @property
+    def last_id(self):
+        """Highest entry id stored in the journal"""
+        for segment in reversed(self.index["segments"]):
+            if segment["last_id"] is not None:
+                return segment["last_id"]
+        return 0
+
+    @property
+    def total_entries(self):
+        return sum(segment["count"] for segment in self.index["segments"])
+
+    def _write(self, entry, update=False):
+        """Write one entry to the active segment, rotating when it is full.
+
+        An ``update`` is another version of an entry that is already stored;
+        it is not counted again and readers keep the last version of each id.
+        """
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+        size = len(line.encode('utf-8'))
+        active = self.index["segments"][-1]
+        if active["count"] and active["bytes"] + size > self.segment_max_bytes:
+            self._rotate()
+            active = self.index["segments"][-1]
+
+        self._file.write(line)
+        if not update:
+            self._account(active, entry)
+        active["bytes"] += size
+
+    def append(self, entry, update=False):
+        """Append one entry to the active segment"""
+        with self._lock:
+            self._write(entry, update)
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_batch or
+                    time.monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+
+    def append_batch(self, entries, update=False):
+        """Append several entries and make them durable with a single fsync"""
+        with self._lock:
+            for entry in entries:
+                self._write(entry, update)
+            self._sync()
+
+    def read_hot(self):
+        """Yield the entries of segments that have not been archived.
+
+        Updated entries appear once per stored version; callers keep the last.
+        """
+        with self._lock:
+            self._file.flush()
+            names = [segment["name"] for segment in self.index["segments"]
+                     if not segment.get("archived")]
+        for name in names:
+            yield from self._read_segment(name)
+
+    @property
+    def hot_first_id(self):
+        """First entry id held in the hot (non-archived) segments"""
+        for segment in self.index["segments"]:
+            if not segment.get("archived") and segment["first_id"] is not None:
+                return segment["first_id"]
+        return None
+
+    def archived_counts(self):
+        """Total, per-level and per-action counts of archived entries"""
+        total = 0
+        levels = Counter()
+        actions = Counter()
+        with self._lock:
+            for segment in self.index["segments"]:
+                if segment.get("archived"):
+                    total += segment["count"]
+                    levels.update(segment.get("levels", {}))
+                    actions.update(segment.get("actions", {}))
+        return {"total": total, "levels": levels, "actions": actions}
+
+    def _archive_segment(self, segment, compression):
+        """Compress a sealed segment into the archive directory"""
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard not installed, archiving with gzip")
+            compression = 'gzip'
+
+        archive_dir = os.path.join(self.directory, ARCHIVE_DIR)
+        os.makedirs(archive_dir, exist_ok=True)
+        name = f"{ARCHIVE_DIR}/{segment['name']}{COMPRESSION_SUFFIXES[compression]}"
+        source = self._segment_path(segment["name"])
+        target = self._segment_path(name)
+
+        with open(source, 'rb') as src, open(target + '.tmp', 'wb') as raw:
+            if compression == 'zstd':
+                with zstandard.ZstdCompressor().stream_writer(raw, closefd=False) as dst:
+                    shutil.copyfileobj(src, dst)
+            else:
+                with gzip.GzipFile(fileobj=raw, mode='wb') as dst:
+                    shutil.copyfileobj(src, dst)
+            raw.flush()
+            os.fsync(raw.fileno())
+        os.replace(target + '.tmp', target)
+        return name
+
+    def compact(self, hot_days=7, hot_entries=50000, retention_days=90,
+                compression='gzip', now=None):
+        """Archive sealed segments outside the hot window and expire old ones.
+
+        A sealed segment leaves the hot tier once its newest entry is older
+        than ``hot_days`` or keeping it would hold more than ``hot_entries``
+        entries hot. Archived segments whose newest entry is older than
+        ``retention_days`` (0 keeps them forever) are deleted. Returns the
+        index records of the archived and the expired segments.
+        """
+        now = now or datetime.now()
+        hot_cutoff = (now - timedelta(days=hot_days)).isoformat()
+
+        with self._lock:
+            hot = [segment for segment in self.index["segments"]
+                   if not segment.get("archived")]
+            to_archive = []
+            kept = hot[-1]["count"] if hot else 0
+            for segment in reversed(hot[:-1]):
+                if (to_archive or (segment["last_ts"] or '') < hot_cutoff or
+                        kept + segment["count"] > hot_entries):
+                    to_archive.append(segment)
+                else:
+                    kept += segment["count"]
+
+        archived = []
+        for segment in reversed(to_archive):
+            # Sealed segments are immutable, so compression runs unlocked
+            try:
+                name = self._archive_segment(segment, compression)
+            except Exception as e:
+                logger.error(f"Error archiving changelog segment {segment['name']}: {e}")
+                break
+            with self._lock:
+                old_path = self._segment_path(segment["name"])
+                segment["name"] = name
+                segment["archived"] = True
+                segment["bytes"] = os.path.getsize(self._segment_path(name))
+                self._write_index()
+            os.remove(old_path)
+            archived.append(segment)
+
+        expired = []
+        if retention_days:
+            retention_cutoff = (now - timedelta(days=retention_days)).isoformat()
+            with self._lock:
+                for segment in list(self.index["segments"]):
+                    if segment.get("archived") and (segment["last_ts"] or '') < retention_cutoff:
+                        self.index["segments"].remove(segment)
+                        expired.append(segment)
+                if expired:
+                    self._write_index()
+            for segment in expired:
+                try:
+                    os.remove(self._segment_path(segment["name"]))
+                except OSError as e:
+                    logger.warning(f"Could not remove expired segment {segment['name']}: {e}")
+
+        if archived or expired:
+            logger.info(
+                f"Changelog compaction: {len(archived)} segments archived, {len(expired)} expired")
+        return archived, expired
+
+    def query_archive(self, filters, limit=None, before=None, since=None,
+                      until=None, text=None, keywords=None):
+        """Scan archived segments overlapping the window, newest first.
+
+        Returns matching entries oldest first, at most ``limit`` of them.
+        """
+        with self._lock:
+            segments = [dict(segment) for segment in self.index["segments"]
+                        if segment.get("archived")]
+
+        matches = []
+        for segment in reversed(segments):
+            if segment["first_id"] is None:
+                continue
+            if before is not None and segment["first_id"] >= before:
+                continue
+            if since and (segment["last_ts"] or '') < since:
+                break
+            if until and (segment["first_ts"] or '') > until:
+                continue
+
+            latest = {}
+            for entry in self._read_segment(segment["name"]):
+                latest[entry["id"]] = entry
+            found = [entry for entry in latest.values()
+                     if (before is None or entry["id"] < before) and
+                     entry_matches(entry, filters, since, until, text, keywords)]
+            matches = found + matches
+            if limit and len(matches) >= limit:
+                return matches[-limit:]
+        return matches
+
+    def read_all(self):
+        """Yield every entry in the journal, oldest first"""
+        with self._lock:
+            self._file.flush()
+            names = [segment["name"] for segment in self.index["segments"]]
+        for name in names:
+            yield from self._read_segment(name)
+
+    def import_legacy(self, legacy_file):
+        """Import a legacy changelog.json file into the journal in one pass"""
+        with open(legacy_file, 'r') as f:
+            legacy = json.load(f)
+
+        entries = legacy.get("entries", [])
+        with self._lock:
+            created = legacy.get("metadata", {}).get("created")
+            if created:
+                self.index["created"] = created
+            self.append_batch(entries)
+            self._write_index()
+
+        os.replace(legacy_file, legacy_file + '.migrated')
+        logger.info(
+            f"Imported {len(entries)} changelog entries from {legacy_file}")
+        return len(entries)
+
+    def flush(self):
+        """Force buffered entries to disk"""
+        with self._lock:
+            if self._file and not self._file.closed:
+                self._sync()
+
+    def close(self):
+        """Flush the active segment and persist the index"""
+        with self._lock:
+            if self._file and not self._file.closed:
+                self._sync()
+                self._file.close()
+                self._write_index()
+
+
+class SQLiteChangelogStore(ChangelogStorage):
+    """SQLite (WAL mode) changelog storage engine.
+
+    Entries live in an indexed ``entries`` table, so filtering, pagination
+    and aggregation outside the in-memory hot tier run as SQL instead of
+    scanning files. Writes go through one serialized connection; readers use
+    per-thread connections, which WAL lets run alongside the writer.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY,
+            timestamp TEXT NOT NULL,
+            action TEXT,
+            details TEXT,
+            user TEXT,
+            level TEXT,
+            extra TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_timestamp ON entries(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_entries_level ON entries(level, id);
+        CREATE INDEX IF NOT EXISTS idx_entries_action ON entries(action, id);
+        CREATE TABLE IF NOT EXISTS metadata (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._hot_first_id = None
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = self._connect()
+        with self._lock, self._conn:
+            self._conn.executescript(self.SCHEMA)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO metadata (key, value) VALUES ('created', ?)",
+                (datetime.now().isoformat(),))
+        self._last_id = self._conn.execute(
+            "SELECT COALESCE(MAX(id), 0) FROM entries").fetchone()[0]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        """Per-thread read connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _to_row(entry):
+        extra = {k: v for k, v in entry.items() if k not in ENTRY_COLUMNS}
+        return (entry["id"], entry["timestamp"], entry.get("action"),
+                entry.get("details"), entry.get("user"), entry.get("level"),
+                json.dumps(extra) if extra else None)
+
+    @staticmethod
+    def _from_row(row):
+        entry = dict(zip(ENTRY_COLUMNS, row[:6]))
+        if row[6]:
+            entry.update(json.loads(row[6]))
+        return entry
+
+    @property
+    def created(self):
+        row = self._reader().execute(
+            "SELECT value FROM metadata WHERE key = 'created'").fetchone()
+        return row[0] if row else None
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    @property
+    def hot_first_id(self):
+        return self._hot_first_id
+
+    def append(self, entry, update=False):
+        self.append_batch([entry], update)
+
+    def append_batch(self, entries, update=False):
+        # INSERT OR REPLACE stores new entries and updates alike
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [self._to_row(entry) for entry in entries])
+            self._last_id = max(self._last_id, max(e["id"] for e in entries))
+
+    def read_hot(self):
+        first_id = self._hot_first_id if self._hot_first_id is not None else self._last_id + 1
+        cursor = self._reader().execute(
+            "SELECT * FROM entries WHERE id >= ? ORDER BY id", (first_id,))
+        for row in cursor:
+            yield self._from_row(row)
+
+    def archived_counts(self):
+        first_id = self._hot_first_id if self._hot_first_id is not None else self._last_id + 1
+        conn = self._reader()
+        total = conn.execute(
+            "SELECT COUNT(*) FROM entries WHERE id < ?", (first_id,)).fetchone()[0]
+        levels = Counter(dict(conn.execute(
+            "SELECT level, COUNT(*) FROM entries WHERE id < ? GROUP BY level", (first_id,))))
+        actions = Counter(dict(conn.execute(
+            "SELECT action, COUNT(*) FROM entries WHERE id < ? GROUP BY action", (first_id,))))
+        return {"total": total, "levels": levels, "actions": actions}
+
+    def compact(self, hot_days=7, hot_entries=50000, retention_days=90,
+                compression='gzip', now=None):
+        """Delete rows past retention and move the in-memory window.
+
+        Rows are never moved: "archiving" only means they drop out of the hot
+        tier and are answered by SQL from then on. ``compression`` is unused.
+        """
+        now = now or datetime.now()
+        expired = []
+        if retention_days:
+            cutoff = (now - timedelta(days=retention_days)).isoformat()
+            with self._lock, self._conn:
+                count = self._conn.execute(
+                    "SELECT COUNT(*) FROM entries WHERE timestamp < ?", (cutoff,)).fetchone()[0]
+                if count:
+                    levels = dict(self._conn.execute(
+                        "SELECT level, COUNT(*) FROM entries WHERE timestamp < ? GROUP BY level",
+                        (cutoff,)))
+                    actions = dict(self._conn.execute(
+                        "SELECT action, COUNT(*) FROM entries WHERE timestamp < ? GROUP BY action",
+                        (cutoff,)))
+                    self._conn.execute(
+                        "DELETE FROM entries WHERE timestamp < ?", (cutoff,))
+                    expired.append({"count": count, "levels": levels, "actions": actions})
+                    logger.info(f"Changelog retention removed {count} entries")
+
+        hot_cutoff = (now - timedelta(days=hot_days)).isoformat()
+        row = self._reader().execute(
+            "SELECT MIN(id) FROM entries WHERE timestamp >= ?", (hot_cutoff,)).fetchone()
+        first_id = row[0] if row[0] is not None else self._last_id + 1
+        first_id = max(first_id, self._last_id - hot_entries + 1)
+
+        archived = []
+        previous = self._hot_first_id
+        self._hot_first_id = first_id
+        if previous is not None and first_id > previous:
+            archived.append({"first_id": previous, "last_id": first_id - 1})
+        return archived, expired
+
+    @staticmethod
+    def _like_pattern(term):
+        """Substring LIKE pattern matching ``%``, ``_`` and ``\\`` literally"""
+        escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"%{escaped}%"
+
+    def query_archive(self, filters, limit=None, before=None, since=None,
+                      until=None, text=None, keywords=None):
+        clauses = []
+        params = []
+        for field, value in filters.items():
+            if field not in FILTER_COLUMNS:
+                raise ValueError(f"Unsupported changelog filter: {field}")
+            clauses.append(f"{field} = ?")
+            params.append(value)
+        if before is not None:
+            clauses.append("id < ?")
+            params.append(before)
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp <= ?")
+            params.append(until)
+        matches_term = "action LIKE ? ESCAPE '\\' OR details LIKE ? ESCAPE '\\'"
+        if text:
+            clauses.append(f"({matches_term})")
+            params.extend([self._like_pattern(text)] * 2)
+        if keywords:
+            clauses.append("(" + " OR ".join([matches_term] * len(keywords)) + ")")
+            for keyword in keywords:
+                params.extend([self._like_pattern(keyword)] * 2)
+
+        sql = "SELECT * FROM entries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY id DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        return [self._from_row(row) for row in reversed(rows)]
+
+    def import_legacy(self, legacy_file):
+        with open(legacy_file, 'r') as f:
+            legacy = json.load(f)
+
+        entries = legacy.get("entries", [])
+        created = legacy.get("metadata", {}).get("created")
+        with self._lock, self._conn:
+            if created:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO metadata (key, value) VALUES ('created', ?)",
+                    (created,))
+        if entries:
+            self.append_batch(entries)
+
+        os.replace(legacy_file, legacy_file + '.migrated')
+        logger.info(
+            f"Imported {len(entries)} changelog entries from {legacy_file} into {self.path}")
+        return len(entries)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ChangelogIndex:
+    """In-memory secondary index over changelog entries.
+
+    Keeps ascending id posting lists per level, action and user plus the
+    first id of every hourly time bucket. Entries are appended in id order,
+    so every list stays sorted and is maintained with plain appends.
+    """
+
+    FIELDS = ("level", "action", "user")
+
+    def __init__(self):
+        self.ids = []
+        self.postings = {field: defaultdict(list) for field in self.FIELDS}
+        self.buckets = []
+        self.bucket_first_id = []
+
+    def add(self, entry):
+        """Index a single entry (entries must arrive in ascending id order)"""
+        entry_id = entry["id"]
+        self.ids.append(entry_id)
+        for field in self.FIELDS:
+            self.postings[field][entry.get(field)].append(entry_id)
+
+        bucket = entry["timestamp"][:TIME_BUCKET_CHARS]
+        if not self.buckets or bucket > self.buckets[-1]:
+            self.buckets.append(bucket)
+            self.bucket_first_id.append(entry_id)
+
+    def rebuild(self, entries):
+        """Rebuild the index from scratch"""
+        self.__init__()
+        for entry in entries:
+            self.add(entry)
+
+    def _id_bounds(self, since=None, until=None, before=None):
+        """Translate time range and cursor into an id window [low, high)"""
+        low = 0
+        high = None
+        if since:
+            pos = bisect_left(self.buckets, since[:TIME_BUCKET_CHARS])
+            if pos >= len(self.buckets):
+                return None, None
+            low = self.bucket_first_id[pos]
+        if until:
+            pos = bisect_right(self.buckets, until[:TIME_BUCKET_CHARS])
+            if pos < len(self.buckets):
+                high = self.bucket_first_id[pos]
+        if before is not None:
+            high = before if high is None else min(high, before)
+        return low, high
+
+    def query(self, lookup, limit=None, before=None, since=None, until=None,
+              text=None, keywords=None, **filters):
+        """Return (entries, next_cursor) for the newest matching entries.
+
+        ``lookup`` maps an id to its entry. Equality ``filters`` on level,
+        action and user are answered from the smallest posting list, which is
+        walked backwards from the cursor until ``limit`` matches are found.
+        Results are returned oldest first, and ``next_cursor`` is the id to
+        pass as ``before`` to fetch the previous page.
+        """
+        filters = {k: v for k, v in filters.items() if v}
+        candidates = self.ids
+        for field, value in filters.items():
+            posting = self.postings[field].get(value, [])
+            if len(posting) < len(candidates):
+                candidates = posting
+
+        low, high = self._id_bounds(since, until, before)
+        if low is None:
+            return [], None
+
+        text = text.lower() if text else None
+        start = len(candidates) if high is None else bisect_left(candidates, high)
+        stop = bisect_left(candidates, low)
+
+        matches = []
+        for pos in range(start - 1, stop - 1, -1):
+            entry = lookup(candidates[pos])
+            if entry is None or not entry_matches(entry, filters, since, until,
+                                                  text, keywords):
+                continue
+            matches.append(entry)
+            if limit and len(matches) >= limit:
+                break
+
+        matches.reverse()
+        next_cursor = None
+        if limit and len(matches) >= limit:
+            next_cursor = matches[0]["id"]
+        return matches, next_cursor
+
+
+class ChangelogStats:
+    """Running changelog aggregates updated as entries are added.
+
+    Counts by level and action are plain counters, and "recent activity" is a
+    ring of per-minute buckets covering ``window_minutes`` with a running sum,
+    so reading the statistics never touches the entries themselves.
+    """
+
+    def __init__(self, window_minutes=24 * 60):
+        self.window = window_minutes
+        self.total = 0
+        self.by_level = Counter()
+        self.by_action = Counter()
+        self._bucket_minute = [None] * window_minutes
+        self._bucket_count = [0] * window_minutes
+        self._head = None
+        self._recent = 0
+        self.suppressed = Counter()
+
+    @staticmethod
+    def _minute(when):
+        return int(when.timestamp() // 60)
+
+    def _advance(self, minute):
+        """Expire buckets that fell out of the window up to ``minute``"""
+        if self._head is None:
+            self._head = minute
+            return
+        if minute <= self._head:
+            return
+        start = max(self._head + 1, minute - self.window + 1)
+        for m in range(start, minute + 1):
+            slot = m % self.window
+            self._recent -= self._bucket_count[slot]
+            self._bucket_count[slot] = 0
+            self._bucket_minute[slot] = m
+        self._head = minute
+
+    def add(self, entry, when=None):
+        """Account for one entry; ``when`` skips re-parsing its timestamp"""
+        self.total += 1
+        self.by_level[entry.get("level")] += 1
+        self.by_action[entry.get("action")] += 1
+
+        if when is None:
+            try:
+                when = datetime.fromisoformat(entry["timestamp"])
+            except (KeyError, ValueError):
+                return
+        self._record(self._minute(when))
+
+    def _record(self, minute):
+        self._advance(minute)
+        if minute <= self._head - self.window:
+            return
+        slot = minute % self.window
+        if self._bucket_minute[slot] != minute:
+            self._recent -= self._bucket_count[slot]
+            self._bucket_count[slot] = 0
+            self._bucket_minute[slot] = minute
+        self._bucket_count[slot] += 1
+        self._recent += 1
+
+    def note_suppressed(self, action):
+        """Count an occurrence folded into an existing entry or sampled out"""
+        self.suppressed[action] += 1
+
+    def discard(self, total, levels, actions):
+        """Remove counts of entries that were deleted by retention"""
+        self.total -= total
+        self.by_level.subtract(levels)
+        self.by_action.subtract(actions)
+        self.by_level += Counter()
+        self.by_action += Counter()
+
+    def rebuild(self, entries, archived=None):
+        """Recompute aggregates, parsing only timestamps inside the window.
+
+        ``archived`` carries the precomputed counts of archived entries,
+        taken from the journal index rather than from the entries.
+        """
+        self.__init__(self.window)
+        if archived:
+            self.total = archived["total"]
+            self.by_level.update(archived["levels"])
+            self.by_action.update(archived["actions"])
+        now = datetime.now()
+        cutoff = datetime.fromtimestamp(
+            (self._minute(now) - self.window + 1) * 60).isoformat()
+
+        recent_start = len(entries)
+        while recent_start > 0 and entries[recent_start - 1]["timestamp"] >= cutoff:
+            recent_start -= 1
+
+        for entry in entries[:recent_start]:
+            self.total += 1
+            self.by_level[entry.get("level")] += 1
+            self.by_action[entry.get("action")] += 1
+        for entry in entries[recent_start:]:
+            self.add(entry)
+        self._advance(self._minute(now))
+
+    def recent_activity(self, now=None):
+        """Entries added within the window ending at ``now``"""
+        self._advance(self._minute(now or datetime.now()))
+        return self._recent
+
+    def snapshot(self):
+        """Return the statistics in the /api/changelog/stats format"""
+        return {
+            "total_entries": self.total,
+            "by_level": dict(self.by_level),
+            "by_action": dict(self.by_action),
+            "recent_activity": self.recent_activity(),
+            "suppressed_by_action": dict(self.suppressed)
+        }
+
+
+class SecurityEventStream:
+    """Security events classified once, when their changelog entry is added.
+
+    An entry matching any of ``keywords`` becomes an event with a severity
+    (high for errors and failures, medium for warnings and stops, low
+    otherwise). Each severity keeps its newest ``max_events`` events in its
+    own ring, so a burst of low severity events never pushes out high ones.
+    Events carry the changelog id, which serves as the since-cursor.
+    """
+
+    def __init__(self, keywords, max_events=1000):
+        self.keywords = [keyword.lower() for keyword in keywords]
+        self.max_events = max_events
+        self.by_severity = {severity: deque(maxlen=max_events) for severity in SEVERITIES}
+        self.counts = Counter()
+        self.last_id = 0
+
+    @staticmethod
+    def severity(entry):
+        """Severity of a security-related entry"""
+        level = entry.get("level", "info")
+        if level == "error" or "failed" in str(entry.get("details", "")).lower():
+            return "high"
+        if level == "warning" or "stopped" in entry.get("action", ""):
+            return "medium"
+        return "low"
+
+    def add(self, entry):
+        """Classify one entry and record it if it is a security event"""
+        if not entry_matches(entry, {}, keywords=self.keywords):
+            return None
+        severity = self.severity(entry)
+        icon, color = SEVERITY_STYLES[severity]
+        action = entry.get("action", "")
+        event = {
+            "id": entry["id"],
+            "timestamp": entry.get("timestamp"),
+            "title": action.replace("_", " ").title(),
+            "description": entry.get("details", ""),
+            "severity": severity,
+            "icon": icon,
+            "color": color,
+            "user": entry.get("user", "system")
+        }
+        self.by_severity[severity].append(event)
+        self.counts[severity] += 1
+        self.last_id = entry["id"]
+        return event
+
+    def rebuild(self, entries):
+        """Reclassify entries from scratch (oldest first)"""
+        self.__init__(self.keywords, self.max_events)
+        for entry in entries:
+            self.add(entry)
+
+    def query(self, since=None, severity=None, limit=20):
+        """Return (events, cursor) with events oldest first.
+
+        Without ``since`` these are the newest ``limit`` events. With it they
+        are the oldest ``limit`` events after that id, so a burst larger than
+        ``limit`` is delivered over several polls; each ring is only walked
+        back to ``since``, so polling costs O(new). ``cursor`` is the id to
+        pass as ``since`` next: the last event returned when more are
+        waiting, otherwise the newest classified id.
+        """
+        rings = [self.by_severity[severity]] if severity else self.by_severity.values()
+        events = []
+        for ring in rings:
+            taken = 0
+            for event in reversed(ring):
+                if since is not None and event["id"] <= since:
+                    break
+                events.append(event)
+                taken += 1
+                if since is None and limit and taken >= limit:
+                    break
+        events.sort(key=lambda event: event["id"])
+        cursor = max(self.last_id, since or 0)
+        if limit and len(events) > limit:
+            if since is None:
+                events = events[-limit:]
+            else:
+                events = events[:limit]
+                cursor = events[-1]["id"]
+        return events, cursor
+
+    def statistics(self):
+        """Events classified per severity since the stream was built"""
+        stats = {severity: self.counts[severity] for severity in SEVERITIES}
+        stats["total"] = sum(stats.values())
+        return stats
+
+
+class ChangelogWriter:
+    """Background writer that group-commits changelog entries to storage.
+
+    Callers enqueue entries on a bounded queue and return immediately. The
+    writer thread waits up to ``batch_interval`` seconds for ``batch_size``
+    entries and commits what it has with one fsync. When the queue is full
+    the caller commits everything queued plus its own entry itself, so
+    entries always reach storage in submission order.
+
+    A batch that fails to commit is kept and retried ahead of newer entries,
+    backing off up to ``max_retry_delay`` seconds between attempts.
+    """
+
+    def __init__(self, storage, max_queue=10000, batch_size=500,
+                 batch_interval=0.2, retry_delay=0.5, max_retry_delay=30.0):
+        self.storage = storage
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+
+        # Queued (entry, update) items; entries are only taken off it with
+        # _commit_lock held, so one thread writes and batches stay in order
+        self._queue = deque()
+        self._ready = threading.Condition()
+        self._commit_lock = threading.Lock()
+        self._retry = []
+        self._failures = 0
+        self._stopping = threading.Event()
+        self._metrics_lock = threading.Lock()
+        self._batches = 0
+        self._committed = 0
+        self._sync_writes = 0
+        self._failed_commits = 0
+        self._last_error = None
+        self._max_depth = 0
+        self._last_commit_ms = 0.0
+
+        self.thread = threading.Thread(
+            target=self._run, name='changelog-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, entry, update=False):
+        """Queue an entry (or, with ``update``, a new version of a stored one)"""
+        item = (entry, update)
+        if not self._stopping.is_set():
+            with self._ready:
+                if len(self._queue) < self.max_queue:
+                    self._queue.append(item)
+                    self._max_depth = max(self._max_depth, len(self._queue))
+                    self._ready.notify()
+                    return
+            logger.warning("Changelog writer queue full, committing on the caller thread")
+
+        with self._commit_lock:
+            self._commit(self._take_pending() + self._take() + [item])
+        with self._metrics_lock:
+            self._sync_writes += 1
+
+    def _take_pending(self):
+        """Entries of a failed batch, which go before anything queued"""
+        pending, self._retry = self._retry, []
+        return pending
+
+    def _take(self, limit=None):
+        """Take up to ``limit`` (default all) queued items, oldest first"""
+        with self._ready:
+            count = len(self._queue) if limit is None else min(limit, len(self._queue))
+            return [self._queue.popleft() for _ in range(count)]
+
+    def _commit(self, batch):
+        """Commit ``(entry, update)`` items in order, keeping the rest for a retry on failure"""
+        started = time.monotonic()
+        done = 0
+        try:
+            for update, run in groupby(batch, key=itemgetter(1)):
+                entries = [entry for entry, _ in run]
+                self.storage.append_batch(entries, update=update)
+                done += len(entries)
+        except Exception as e:
+            self._retry = batch[done:]
+            self._failures += 1
+            logger.error(
+                f"Error committing {len(self._retry)} changelog entries, will retry: {e}")
+            with self._metrics_lock:
+                self._committed += done
+                self._failed_commits += 1
+                self._last_error = str(e)
+            return False
+
+        self._failures = 0
+        with self._metrics_lock:
+            self._batches += 1
+            self._committed += done
+            self._last_commit_ms = (time.monotonic() - started) * 1000
+        return True
+
+    def _wait_for_batch(self):
+        """Wait for a queued entry, then up to ``batch_interval`` for a full batch"""
+        with self._ready:
+            if not self._ready.wait_for(
+                    lambda: self._queue or self._retry or self._stopping.is_set(),
+                    timeout=0.5):
+                return
+            self._ready.wait_for(
+                lambda: len(self._queue) >= self.batch_size or self._retry or
+                self._stopping.is_set(), timeout=self.batch_interval)
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wait_for_batch()
+            with self._commit_lock:
+                batch = self._take_pending() or self._take(self.batch_size)
+                if not batch:
+                    continue
+                committed = self._commit(batch)
+            if not committed:
+                self._stopping.wait(min(self.max_retry_delay,
+                                        self.retry_delay * 2 ** (self._failures - 1)))
+
+        # Shutdown: commit whatever is still pending or queued
+        with self._commit_lock:
+            remaining = self._take_pending() + self._take()
+            if remaining and not self._commit(remaining):
+                logger.error(
+                    f"{len(self._retry)} changelog entries could not be written at shutdown")
+
+    def stop(self, timeout=10):
+        """Flush queued entries and stop the writer thread"""
+        self._stopping.set()
+        with self._ready:
+            self._ready.notify_all()
+        self.thread.join(timeout)
+
+    def metrics(self):
+        """Queue depth and commit counters for health reporting"""
+        with self._metrics_lock:
+            return {
+                "queue_depth": len(self._queue),
+                "queue_capacity": self.max_queue,
+                "max_queue_depth": self._max_depth,
+                "batches_committed": self._batches,
+                "entries_committed": self._committed,
+                "synchronous_writes": self._sync_writes,
+                "failed_commits": self._failed_commits,
+                "entries_awaiting_retry": len(self._retry),
+                "last_error": self._last_error,
+                "avg_batch_size": round(self._committed / self._batches, 1) if self._batches else 0,
+                "last_commit_ms": round(self._last_commit_ms, 2)
+            }
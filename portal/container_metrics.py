@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Container Metrics
+Background per-container CPU, memory, network and block I/O sampling from the
+Docker stats API or cgroup v2 files, kept in fixed-size ring buffers
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Fields of one ring buffer sample, stored as a tuple to keep history compact
+SAMPLE_FIELDS = ("timestamp", "cpu_percent", "memory_bytes", "memory_limit",
+                 "net_rx_bps", "net_tx_bps", "block_read_bps", "block_write_bps")
+
+
+class ContainerMetricsCollector:
+    """Samples resource usage of every running container at a fixed interval.
+
+    Counters (CPU time, network and block I/O bytes) are turned into rates
+    from the difference with the previous sample of the same container, so
+    one cheap one-shot reading per container and interval is enough. CPU is
+    reported like ``docker stats``: 100% is one fully used core.
+
+    ``source`` is ``docker`` (Engine stats API) or ``cgroup`` (read cgroup v2
+    files under ``cgroup_root`` directly; network counters are not available
+    there and are reported as None).
+    """
+
+    def __init__(self, docker, interval=10, history=360, source='docker',
+                 cgroup_root='/sys/fs/cgroup'):
+        self.docker = docker
+        self.interval = interval
+        self.history = history
+        self.source = source
+        self.cgroup_root = cgroup_root
+        self.samples = {}
+        self._previous = {}
+        self._cgroup_paths = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.thread = None
+        self.last_run_ms = None
+
+    def start(self):
+        """Start the sampler thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stopping.clear()
+        self.thread = threading.Thread(
+            target=self._run, name='container-metrics', daemon=True)
+        self.thread.start()
+        logger.info(f"Container metrics collector started ({self.source}, every {self.interval}s)")
+
+    def stop(self):
+        """Stop the sampler thread"""
+        self._stopping.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                self.collect()
+            except Exception as e:
+                logger.error(f"Error collecting container metrics: {e}")
+            self.last_run_ms = round((time.monotonic() - started) * 1000, 1)
+            self._stopping.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def collect(self):
+        """Take one sample of every running container"""
+        running = {}
+        for container in self.docker.list_containers(all=False):
+            names = container.get("Names") or [container["Id"][:12]]
+            running[names[0].lstrip('/')] = container["Id"]
+
+        for name, container_id in running.items():
+            try:
+                if self.source == 'cgroup':
+                    counters = self._read_cgroup(container_id)
+                else:
+                    counters = self._read_docker(container_id)
+            except Exception as e:
+                logger.debug(f"No metrics for container {name}: {e}")
+                continue
+            if counters:
+                self._record(name, counters)
+
+        with self._lock:
+            for name in list(self.samples):
+                if name not in running:
+                    del self.samples[name]
+                    self._previous.pop(name, None)
+        for container_id in list(self._cgroup_paths):
+            if container_id not in running.values():
+                del self._cgroup_paths[container_id]
+
+    def _read_docker(self, container_id):
+        """Raw counters from the Docker stats API"""
+        stats = self.docker.container_stats(container_id)
+        if not stats or not stats.get("cpu_stats"):
+            return None
+        cpu = stats["cpu_stats"]
+        memory = stats.get("memory_stats", {})
+        memory_stats = memory.get("stats", {})
+        # Match `docker stats`: page cache is not counted as used memory
+        cache = memory_stats.get("inactive_file", memory_stats.get("cache", 0))
+        networks = (stats.get("networks") or {}).values()
+        blkio = (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []
+        return {
+            "cpu_ns": cpu.get("cpu_usage", {}).get("total_usage", 0),
+            "system_ns": cpu.get("system_cpu_usage"),
+            "online_cpus": cpu.get("online_cpus") or
+            len(cpu.get("cpu_usage", {}).get("percpu_usage") or []) or 1,
+            "memory_bytes": max(0, memory.get("usage", 0) - cache),
+            "memory_limit": memory.get("limit"),
+            "net_rx": sum(n.get("rx_bytes", 0) for n in networks),
+            "net_tx": sum(n.get("tx_bytes", 0) for n in networks),
+            "block_read": sum(e.get("value", 0) for e in blkio
+                              if e.get("op", "").lower() == "read"),
+            "block_write": sum(e.get("value", 0) for e in blkio
+                               if e.get("op", "").lower() == "write")
+        }
+
+    def _cgroup_path(self, container_id):
+        """Locate the cgroup v2 directory of a container (systemd or cgroupfs driver)"""
+        if container_id not in self._cgroup_paths:
+            candidates = [
+                os.path.join(self.cgroup_root, 'system.slice', f'docker-{container_id}.scope'),
+                os.path.join(self.cgroup_root, 'docker', container_id),
+            ]
+            self._cgroup_paths[container_id] = next(
+                (path for path in candidates if os.path.isdir(path)), None)
+        return self._cgroup_paths[container_id]
+
+    @staticmethod
+    def _read_keyed(path):
+        """Parse a flat keyed cgroup file such as cpu.stat"""
+        values = {}
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(' ')
+                values[key] = value.strip()
+        return values
+
+    def _read_cgroup(self, container_id):
+        """Raw counters from the cgroup v2 files of a container"""
+        path = self._cgroup_path(container_id)
+        if not path:
+            return None
+
+        cpu = self._read_keyed(os.path.join(path, 'cpu.stat'))
+        memory_stat = self._read_keyed(os.path.join(path, 'memory.stat'))
+        with open(os.path.join(path, 'memory.current')) as f:
+            memory_current = int(f.read())
+        with open(os.path.join(path, 'memory.max')) as f:
+            memory_max = f.read().strip()
+
+        block_read = block_write = 0
+        with open(os.path.join(path, 'io.stat')) as f:
+            for line in f:
+                for field in line.split()[1:]:
+                    key, _, value = field.partition('=')
+                    if key == 'rbytes':
+                        block_read += int(value)
+                    elif key == 'wbytes':
+                        block_write += int(value)
+
+        return {
+            "cpu_ns": int(cpu.get("usage_usec", 0)) * 1000,
+            "system_ns": None,
+            "online_cpus": None,
+            "memory_bytes": max(0, memory_current - int(memory_stat.get("inactive_file", 0))),
+            "memory_limit": None if memory_max == 'max' else int(memory_max),
+            "net_rx": None,
+            "net_tx": None,
+            "block_read": block_read,
+            "block_write": block_write
+        }
+
+    def _record(self, name, counters):
+        """Turn counters into rates against the previous sample and store them"""
+        now = time.time()
+        previous = self._previous.get(name)
+        self._previous[name] = (now, counters)
+        if previous is None:
+            return
+        then, before = previous
+        elapsed = now - then
+        if elapsed <= 0:
+            return
+
+        def rate(key):
+            if counters[key] is None or before[key] is None:
+                return None
+            return round(max(0, counters[key] - before[key]) / elapsed, 1)
+
+        cpu_delta = max(0, counters["cpu_ns"] - before["cpu_ns"])
+        if counters["system_ns"] is not None and before["system_ns"] is not None:
+            system_delta = counters["system_ns"] - before["system_ns"]
+            cpu_percent = (cpu_delta / system_delta * counters["online_cpus"] * 100
+                           if system_delta > 0 else 0.0)
+        else:
+            cpu_percent = cpu_delta / (elapsed * 1e9) * 100
+
+        sample = (round(now, 3), round(cpu_percent, 2), counters["memory_bytes"],
+                  counters["memory_limit"], rate("net_rx"), rate("net_tx"),
+                  rate("block_read"), rate("block_write"))
+        with self._lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.history)
+            self.samples[name].append(sample)
+
+    def metrics(self, name, points=None):
+        """Latest sample and history of a container, or None if unknown"""
+        with self._lock:
+            buffer = self.samples.get(name)
+            if not buffer:
+                return None
+            history = list(buffer)
+        if points:
+            history = history[-points:]
+        history = [dict(zip(SAMPLE_FIELDS, sample)) for sample in history]
+        return {
+            "container": name,
+            "source": self.source,
+            "interval": self.interval,
+            "latest": history[-1],
+            "history": history
+        }
+
+    def summary(self):
+        """Latest sample of every container"""
+        with self._lock:
+            return {name: dict(zip(SAMPLE_FIELDS, buffer[-1]))
+                    for name, buffer in self.samples.items() if buffer}
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+"""
+Docker Engine API client for the CyberBlueSOC Portal
+Talks HTTP over the Docker UNIX socket with a pool of keep-alive connections
+"""
+
+import json
+import queue
+import socket
+import logging
+import http.client
+from collections import namedtuple
+from urllib.parse import quote, urlencode
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET = '/var/run/docker.sock'
+
+# Errors raised when a pooled keep-alive connection was closed by the daemon
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.CannotSendRequest,
+                           BrokenPipeError, ConnectionResetError)
+
+
+# A port published on the host: host address and port -> container port/protocol
+PublishedPort = namedtuple('PublishedPort', 'host_ip host_port container_port protocol')
+
+
+class DockerAPIError(Exception):
+    """Error response returned by the Docker Engine API"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP connection over a UNIX domain socket"""
+
+    def __init__(self, socket_path, timeout=10):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def socket_path_from_env(docker_host=None, default=DEFAULT_SOCKET):
+    """Resolve the daemon socket from a DOCKER_HOST style value"""
+    if docker_host and docker_host.startswith('unix://'):
+        return docker_host[len('unix://'):]
+    return default
+
+
+def human_size(size):
+    """Format a byte count the way the docker CLI does (decimal units)"""
+    units = ['B', 'kB', 'MB', 'GB', 'TB', 'PB']
+    value = float(size or 0)
+    unit = 0
+    while value >= 1000 and unit < len(units) - 1:
+        value /= 1000.0
+        unit += 1
+    return f"{value:.4g}{units[unit]}"
+
+
+def format_ports(ports):
+    """Format the Ports list of a container like `docker ps` does"""
+    published = []
+    exposed = []
+    for port in ports or []:
+        private = f"{port.get('PrivatePort')}/{port.get('Type', 'tcp')}"
+        if port.get('PublicPort'):
+            published.append(f"{port.get('IP', '0.0.0.0')}:{port['PublicPort']}->{private}")
+        elif private not in exposed:
+            exposed.append(private)
+    return ', '.join(sorted(set(published)) + exposed)
+
+
+def published_ports(ports):
+    """Parse the Ports list of a container into sorted PublishedPort tuples"""
+    return sorted({
+        PublishedPort(port.get('IP', '0.0.0.0'), port['PublicPort'],
+                      port.get('PrivatePort'), port.get('Type', 'tcp'))
+        for port in ports or [] if port.get('PublicPort')
+    })
+
+
+def format_size(container):
+    """Format SizeRw/SizeRootFs like `docker ps --size` does"""
+    if 'SizeRw' not in container and 'SizeRootFs' not in container:
+        return ''
+    return (f"{human_size(container.get('SizeRw'))} "
+            f"(virtual {human_size(container.get('SizeRootFs'))})")
+
+
+class EventStream:
+    """Iterator over a streaming /events response, closable from another thread"""
+
+    def __init__(self, conn, response):
+        self.conn = conn
+        self.response = response
+        self.closed = False
+
+    def __iter__(self):
+        while not self.closed:
+            try:
+                line = self.response.readline()
+            except Exception:
+                # close() from another thread tears down the socket mid-read
+                if self.closed:
+                    break
+                raise
+            if not line:
+                break
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+    def close(self):
+        """Stop the stream, unblocking a reader waiting for the next event"""
+        self.closed = True
+        sock = self.conn.sock
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.conn.close()
+
+
+class DockerClient:
+    """Minimal Docker Engine API client with connection pooling.
+
+    Each request borrows a keep-alive connection from the pool, so listing
+    containers costs one round trip on an open socket instead of forking the
+    docker CLI. A request that fails because the daemon closed an idle pooled
+    connection is retried once on a fresh one.
+    """
+
+    def __init__(self, socket_path=DEFAULT_SOCKET, pool_size=4, timeout=10):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connection(self):
+        """Borrow a pooled connection or open a new one"""
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout), False
+
+    def _release(self, conn):
+        """Return a connection to the pool, closing it if the pool is full"""
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def request(self, method, path, params=None, body=None, timeout=None):
+        """Perform an API request and return the decoded JSON body (or None)"""
+        if params:
+            path = f"{path}?{urlencode(params)}"
+        headers = {'Host': 'docker'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers['Content-Type'] = 'application/json'
+
+        for attempt in range(2):
+            conn, reused = self._connection()
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused and attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            break
+
+        content_type = response.getheader('Content-Type', '')
+        decoded = None
+        if data and 'json' in content_type:
+            decoded = json.loads(data)
+        if response.status >= 400:
+            message = decoded.get('message') if isinstance(decoded, dict) else None
+            raise DockerAPIError(response.status,
+                                 message or data.decode('utf-8', 'replace').strip()
+                                 or response.reason)
+        return decoded
+
+    def ping(self):
+        """Check that the daemon answers"""
+        try:
+            self.request('GET', '/_ping')
+            return True
+        except Exception:
+            return False
+
+    def list_containers(self, all=True, size=False, filters=None):
+        """List containers; disk usage is only computed when size is True"""
+        params = {'all': int(bool(all)), 'size': int(bool(size))}
+        if filters:
+            params['filters'] = json.dumps(filters)
+        return self.request('GET', '/containers/json', params=params) or []
+
+    def list_networks(self):
+        """List networks with their driver, scope and IPAM configuration"""
+        return self.request('GET', '/networks') or []
+
+    def inspect_container(self, name):
+        """Return the low-level information of a container"""
+        return self.request('GET', f"/containers/{quote(name, safe='')}/json")
+
+    def container_stats(self, name):
+        """Single resource usage sample of a running container"""
+        return self.request('GET', f"/containers/{quote(name, safe='')}/stats",
+                            params={'stream': 'false', 'one-shot': 'true'})
+
+    def start_container(self, name):
+        """Start a container (already running is not an error)"""
+        self.request('POST', f"/containers/{quote(name, safe='')}/start", timeout=30)
+
+    def stop_container(self, name, wait=10):
+        """Stop a container (already stopped is not an error)"""
+        self.request('POST', f"/containers/{quote(name, safe='')}/stop",
+                     params={'t': wait}, timeout=wait + 30)
+
+    def restart_container(self, name, wait=10):
+        """Restart a container"""
+        self.request('POST', f"/containers/{quote(name, safe='')}/restart",
+                     params={'t': wait}, timeout=wait + 30)
+
+    def events(self, filters=None, since=None):
+        """Open the /events stream on a dedicated connection without read timeout"""
+        params = {}
+        if filters:
+            params['filters'] = json.dumps(filters)
+        if since is not None:
+            params['since'] = str(since)
+        path = '/events'
+        if params:
+            path = f"{path}?{urlencode(params)}"
+
+        conn = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        try:
+            conn.request('GET', path, headers={'Host': 'docker'})
+            conn.sock.settimeout(None)
+            response = conn.getresponse()
+        except Exception:
+            conn.close()
+            raise
+        if response.status >= 400:
+            data = response.read()
+            conn.close()
+            raise DockerAPIError(response.status,
+                                 data.decode('utf-8', 'replace').strip() or response.reason)
+        return EventStream(conn, response)
+
+    def close(self):
+        """Close all pooled connections"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Host Metrics
+Background sampler keeping the latest host CPU, memory, disk and network
+readings, with host and per-interface rates computed from the difference
+between samples
+"""
+
+import time
+import logging
+import threading
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Per-interface counters that are turned into per-second rates
+INTERFACE_RATE_FIELDS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv")
+
+
+class HostMetricsSampler:
+    """Samples host usage every ``interval`` seconds in a background thread.
+
+    ``psutil.cpu_percent(interval=None)`` measures CPU usage since the previous
+    call, so sampling on a fixed cadence gives an accurate figure without ever
+    blocking a request. Readers get the latest sample as a plain dict; the
+    sample is replaced as a whole so no locking is needed to read it. Taking
+    a sample is serialized, since each one updates the previous counters.
+    """
+
+    def __init__(self, interval=2.0, disk_path='/'):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.latest = None
+        self.samples_taken = 0
+        self._previous = None
+        self._previous_interfaces = None
+        self._sample_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self.thread = None
+        # Prime the CPU counters so the first sample covers one interval
+        psutil.cpu_percent(interval=None)
+
+    def start(self):
+        """Start the sampler thread (takes a first sample synchronously)"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stopping.clear()
+        self.sample()
+        self.thread = threading.Thread(
+            target=self._run, name='host-metrics', daemon=True)
+        self.thread.start()
+        logger.info(f"Host metrics sampler started (every {self.interval}s)")
+
+    def stop(self):
+        """Stop the sampler thread"""
+        self._stopping.set()
+        if self.thread:
+            self.thread.join()
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.error(f"Error sampling host metrics: {e}")
+
+    def sample(self):
+        """Take one sample and publish it as ``latest``"""
+        with self._sample_lock:
+            return self._sample()
+
+    def _sample(self):
+        now = time.time()
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        nics = psutil.net_io_counters(pernic=True)
+        try:
+            disk_io = psutil.disk_io_counters()
+        except Exception:
+            disk_io = None
+
+        # Host totals are the sum over interfaces, as psutil computes them
+        counters = {
+            "net_bytes_sent": sum(nic.bytes_sent for nic in nics.values()),
+            "net_bytes_recv": sum(nic.bytes_recv for nic in nics.values()),
+            "net_packets_sent": sum(nic.packets_sent for nic in nics.values()),
+            "net_packets_recv": sum(nic.packets_recv for nic in nics.values()),
+            "net_errors_in": sum(nic.errin for nic in nics.values()),
+            "net_errors_out": sum(nic.errout for nic in nics.values()),
+            "disk_read_bytes": disk_io.read_bytes if disk_io else None,
+            "disk_write_bytes": disk_io.write_bytes if disk_io else None,
+        }
+
+        rates = {}
+        if self._previous:
+            then, before = self._previous
+            elapsed = now - then
+            for key, value in counters.items():
+                if elapsed > 0 and value is not None and before.get(key) is not None:
+                    # Counters can wrap or reset (interface restart)
+                    rates[f"{key}_per_sec"] = round(max(0, value - before[key]) / elapsed, 1)
+        self._previous = (now, counters)
+        interfaces = self._interface_rates(now, nics)
+
+        self.latest = {
+            "timestamp": now,
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "cpu_count": psutil.cpu_count(),
+            "load_average": list(psutil.getloadavg()),
+            "memory_percent": memory.percent,
+            "memory_used": memory.used,
+            "memory_total": memory.total,
+            "disk_percent": disk.percent,
+            "disk_used": disk.used,
+            "disk_total": disk.total,
+            "counters": counters,
+            "rates": rates,
+            "interfaces": interfaces
+        }
+        self.samples_taken += 1
+        return self.latest
+
+    def _interface_rates(self, now, nics):
+        """Counters and per-second rates of every network interface"""
+        previous = self._previous_interfaces
+        self._previous_interfaces = (now, nics)
+        interfaces = {}
+        for name, nic in nics.items():
+            info = {
+                "bytes_sent": nic.bytes_sent,
+                "bytes_recv": nic.bytes_recv,
+                "packets_sent": nic.packets_sent,
+                "packets_recv": nic.packets_recv,
+                "errors_in": nic.errin,
+                "errors_out": nic.errout,
+                "drops_in": nic.dropin,
+                "drops_out": nic.dropout
+            }
+            if previous and name in previous[1]:
+                elapsed = now - previous[0]
+                before = previous[1][name]
+                for field in INTERFACE_RATE_FIELDS:
+                    if elapsed > 0:
+                        info[f"{field}_per_sec"] = round(
+                            max(0, getattr(nic, field) - getattr(before, field)) / elapsed, 1)
+            interfaces[name] = info
+        return interfaces
+
+    def current(self):
+        """Latest sample, taking one now if the sampler has not run yet"""
+        if self.latest is None:
+            with self._sample_lock:
+                # Concurrent first readers share a single sample
+                if self.latest is None:
+                    self._sample()
+        return self.latest
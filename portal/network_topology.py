@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Network Topology
+Cached model of Docker networks, their attached containers and the ports
+published on the host, rebuilt only after Docker reports a change
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime
+
+from docker_client import published_ports
+
+logger = logging.getLogger(__name__)
+
+
+class NetworkTopology:
+    """Docker network inventory built from one network and one container listing.
+
+    The model is reused until ``invalidate()`` is called (the container
+    monitor does so for every Docker network or container event) or, when no
+    events are being received, until it is older than the ``max_age`` the
+    caller accepts. Concurrent callers of a stale model wait for a single
+    rebuild instead of listing again.
+    """
+
+    def __init__(self, docker):
+        self.docker = docker
+        self.builds = 0
+        self._model = None
+        self._built = None
+        self._dirty = True
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Mark the model stale; the next reader rebuilds it"""
+        self._dirty = True
+
+    def _fresh(self, max_age):
+        if self._model is None or self._dirty:
+            return False
+        return max_age is None or time.monotonic() - self._built < max_age
+
+    def get(self, max_age=None):
+        """Return the current model, rebuilding it if stale"""
+        if not self._fresh(max_age):
+            with self._lock:
+                if not self._fresh(max_age):
+                    # Cleared first so an event arriving mid-build marks it stale again
+                    self._dirty = False
+                    try:
+                        self._model = self.build()
+                    except Exception:
+                        self._dirty = True
+                        raise
+                    self._built = time.monotonic()
+                    self.builds += 1
+        return self._model
+
+    def build(self):
+        """List networks and containers and join them into the topology model"""
+        networks = self.docker.list_networks()
+        containers = self.docker.list_containers(all=True)
+
+        attached = {}
+        ports = []
+        for container in containers:
+            names = container.get("Names") or [container["Id"][:12]]
+            name = names[0].lstrip('/')
+            endpoints = (container.get("NetworkSettings") or {}).get("Networks") or {}
+            for network_name, endpoint in endpoints.items():
+                # Older daemons leave NetworkID empty; fall back to the name
+                key = (endpoint or {}).get("NetworkID") or network_name
+                attached.setdefault(key, []).append({
+                    "container": name,
+                    "state": container.get("State"),
+                    "ipv4_address": (endpoint or {}).get("IPAddress") or None
+                })
+            if container.get("State") == "running":
+                ports.extend({"container": name, **port._asdict()}
+                             for port in published_ports(container.get("Ports")))
+
+        model_networks = []
+        for network in sorted(networks, key=lambda n: n.get("Name", "")):
+            ipam = (network.get("IPAM") or {}).get("Config") or []
+            model_networks.append({
+                "id": network["Id"][:12],
+                "name": network.get("Name"),
+                "driver": network.get("Driver"),
+                "scope": network.get("Scope"),
+                "internal": network.get("Internal", False),
+                "subnets": [config["Subnet"] for config in ipam if config.get("Subnet")],
+                "containers": sorted(
+                    attached.get(network["Id"]) or attached.get(network.get("Name")) or [],
+                    key=lambda c: c["container"])
+            })
+
+        ports.sort(key=lambda p: (p["host_port"], p["protocol"], p["host_ip"]))
+        return {
+            "networks": model_networks,
+            "published_ports": ports,
+            "built_at": datetime.now().isoformat()
+        }
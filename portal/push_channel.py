@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Push Channel
+Server-Sent Events broadcaster: one producer collects dashboard state and
+fans out diffs to every subscribed browser tab
+"""
+
+import json
+import queue
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def sse_message(event, data, event_id=None):
+    """Format one Server-Sent Events message"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
+
+
+def diff_sections(old, new):
+    """Key-level diff of {section: {key: value}} states"""
+    changed = {}
+    removed = {}
+    for section, values in new.items():
+        before = old.get(section, {})
+        section_changed = {k: v for k, v in values.items() if before.get(k) != v}
+        section_removed = [k for k in before if k not in values]
+        if section_changed:
+            changed[section] = section_changed
+        if section_removed:
+            removed[section] = section_removed
+    return changed, removed
+
+
+class PushBroadcaster:
+    """Fans dashboard updates out to all subscribers from a single producer.
+
+    ``collect()`` returns ``(sections, appended)``: ``sections`` is the full
+    current state as ``{section: {key: value}}`` and ``appended`` holds lists
+    of new items (such as changelog entries) since the previous call. The
+    producer thread only runs while someone is subscribed, diffs each state
+    against the previous one and serializes every message once, so backend
+    work does not grow with the number of open tabs.
+
+    A subscriber that falls ``max_queue`` messages behind is disconnected;
+    its browser reconnects and starts again from a full snapshot.
+    """
+
+    def __init__(self, collect, interval=2.0, heartbeat=15.0, max_queue=64):
+        self.collect = collect
+        self.interval = interval
+        self.heartbeat = heartbeat
+        self.max_queue = max_queue
+        self.version = 0
+        self.messages_sent = 0
+        self._state = None
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._collect_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def _refresh(self):
+        """Collect the current state and return the diff message, if any"""
+        with self._collect_lock:
+            sections, appended = self.collect()
+            appended = {name: items for name, items in appended.items() if items}
+            if self._state is None:
+                self._state = sections
+                self.version += 1
+                return None
+            changed, removed = diff_sections(self._state, sections)
+            self._state = sections
+            if not changed and not removed and not appended:
+                return None
+            self.version += 1
+            return sse_message("diff", {
+                "version": self.version,
+                "changed": changed,
+                "removed": removed,
+                "appended": appended
+            }, event_id=self.version)
+
+    def _publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+                self.messages_sent += 1
+            except queue.Full:
+                logger.warning("Dropping slow push channel subscriber")
+                self.unsubscribe(subscriber)
+                self._disconnect(subscriber)
+
+    @staticmethod
+    def _disconnect(subscriber):
+        """Discard a dropped subscriber's backlog and queue the end-of-stream marker.
+
+        The queued diffs are stale once the client has to start from a new
+        snapshot, and emptying the queue makes room for the ``None`` marker
+        (nothing else is queued once the subscriber is unregistered).
+        """
+        while True:
+            try:
+                subscriber.get_nowait()
+            except queue.Empty:
+                break
+        subscriber.put_nowait(None)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    self.thread = None
+                    self._state = None
+                    return
+            started = time.monotonic()
+            try:
+                message = self._refresh()
+                if message:
+                    self._publish(message)
+            except Exception as e:
+                logger.error(f"Error producing push update: {e}")
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def subscribe(self):
+        """Register a subscriber queue and start the producer if needed"""
+        subscriber = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self._run, name='push-producer', daemon=True)
+                self.thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def snapshot_message(self):
+        """Full state message for a new subscriber"""
+        with self._collect_lock:
+            state = self._state
+            version = self.version
+        if state is None:
+            self._refresh()
+            with self._collect_lock:
+                state = self._state
+                version = self.version
+        return sse_message("snapshot", {"version": version, "sections": state},
+                           event_id=version)
+
+    def stream(self, subscriber):
+        """Yield SSE messages for one subscriber until it disconnects"""
+        try:
+            yield f"retry: {int(self.interval * 1000) + 1000}\n\n"
+            yield self.snapshot_message()
+            while True:
+                try:
+                    message = subscriber.get(timeout=self.heartbeat)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscriber)
+
+    def listen(self):
+        """Subscribe and return the SSE message generator for the new subscriber"""
+        return self.stream(self.subscribe())
+
+    def metrics(self):
+        return {
+            "subscribers": self.subscriber_count,
+            "version": self.version,
+            "messages_sent": self.messages_sent,
+            "producer_running": self.thread is not None
+        }
@@ -0,0 +1,408 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Rule Inventory
+In-memory index of the YARA and Sigma rule files on disk, built with one
+os.scandir walk and kept current by directory and file mtime checks, plus
+a Sigma rule index by level, logsource and ATT&CK tag
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from collections import Counter, defaultdict
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# Bumped when parsed records change shape, so saved stores are re-parsed
+STORE_FORMAT = 2
+
+# rule [private|global] NAME [: TAG TAG] {
+YARA_RULE_PATTERN = re.compile(
+    r'^[ \t]*(?:(?:private|global)\s+)*rule\s+(\w+)\s*(?::\s*([\w \t]+?))?\s*\{', re.M)
+
+LOGSOURCE_KEYS = ("product", "service", "category")
+
+
+def parse_yara(text):
+    """Rule names and the union of their tags in a YARA source file"""
+    names = []
+    tags = set()
+    for match in YARA_RULE_PATTERN.finditer(text):
+        names.append(match.group(1))
+        if match.group(2):
+            tags.update(match.group(2).split())
+    return {"rules": names, "rule_count": len(names), "tags": sorted(tags)}
+
+
+def _detection_fields(detection):
+    """Field names used by the selections of a Sigma detection (without modifiers)"""
+    fields = set()
+    for name, selection in detection.items():
+        if name in ('condition', 'timeframe'):
+            continue
+        maps = selection if isinstance(selection, list) else [selection]
+        for item in maps:
+            if isinstance(item, dict):
+                fields.update(str(key).split('|')[0] for key in item if key)
+    return fields
+
+
+def parse_sigma(text):
+    """Id, title, level, status, logsource, tags and detection fields of a Sigma rule"""
+    info = {"title": None, "id": None, "level": None, "status": None}
+    logsource = {}
+    tags = []
+    fields = set()
+    try:
+        # Multi-document rules put the shared parts in the first document
+        documents = [doc for doc in yaml.load_all(text, Loader=YAML_LOADER)
+                     if isinstance(doc, dict)]
+    except yaml.YAMLError as e:
+        logger.debug(f"Invalid Sigma YAML: {e}")
+        documents = []
+    for doc in documents:
+        for key in info:
+            if info[key] is None and doc.get(key) is not None:
+                info[key] = str(doc[key])
+        if isinstance(doc.get("logsource"), dict):
+            for key in LOGSOURCE_KEYS:
+                if doc["logsource"].get(key) and key not in logsource:
+                    logsource[key] = str(doc["logsource"][key])
+        if isinstance(doc.get("tags"), list):
+            tags.extend(str(tag) for tag in doc["tags"] if str(tag) not in tags)
+        if isinstance(doc.get("detection"), dict):
+            fields |= _detection_fields(doc["detection"])
+    return {
+        "title": info["title"],
+        "rule_id": info["id"],
+        "level": info["level"],
+        "status": info["status"],
+        "logsource": logsource,
+        "fields": sorted(fields),
+        "rules": [info["title"]] if info["title"] else [],
+        "rule_count": 1,
+        "tags": tags
+    }
+
+
+def tag_keys(tag):
+    """Index keys of a Sigma tag: ``attack.t1059.001`` is found by its full
+    name, by ``t1059.001`` and by its parent technique ``t1059``"""
+    tag = tag.lower()
+    keys = {tag}
+    if tag.startswith('attack.'):
+        name = tag[len('attack.'):]
+        keys.add(name)
+        if re.match(r'^t\d{4}\.\d{3}$', name):
+            keys.add(name.split('.')[0])
+    return keys
+
+
+class RuleInventory:
+    """Index of the rule files under ``root`` with their parsed rule names and tags.
+
+    The first use walks the tree once with ``os.scandir``. Afterwards, at
+    most every ``check_interval`` seconds, only the directory mtimes are
+    checked: a directory whose mtime changed (files added, removed or
+    replaced, as ``git pull`` does) is listed again, and only files whose
+    size or mtime changed are re-read. ``refresh(force=True)`` re-stats every
+    file, which also catches rules edited in place.
+
+    ``relative_path`` is reported relative to ``relative_to`` and the
+    category is the first directory below ``root`` (``default_category``
+    for files directly in it). ``version`` changes whenever a file changes.
+
+    With a ``store_path`` the parsed records are saved after every change
+    and loaded at startup, so a restarted portal (or another worker) only
+    parses the files that changed since.
+    """
+
+    def __init__(self, root, extensions, parser, relative_to=None,
+                 default_category='root', check_interval=30, store_path=None):
+        self.root = root.rstrip('/') or '/'
+        self.extensions = tuple(extensions)
+        self.parser = parser
+        self.relative_to = (relative_to or root).rstrip('/')
+        self.default_category = default_category
+        self.check_interval = check_interval
+        self.store_path = store_path
+        self.files = {}
+        self.parsed = 0
+        self.dirs = {}
+        self.version = 0
+        self.walks = 0
+        self._checked = None
+        self._sorted = []
+        self._sorted_version = None
+        self._lock = threading.Lock()
+
+    def _record(self, path, stat):
+        """Build the record of one rule file"""
+        rel_root = os.path.relpath(path, self.root)
+        category = rel_root.split(os.sep)[0] if os.sep in rel_root else self.default_category
+        self.parsed += 1
+        try:
+            with open(path, 'r', errors='replace') as f:
+                parsed = self.parser(f.read())
+        except Exception as e:
+            logger.warning(f"Could not parse rule file {path}: {e}")
+            parsed = {"rules": [], "rule_count": 0, "tags": []}
+        return {
+            "name": os.path.basename(path),
+            "path": path,
+            "relative_path": os.path.relpath(path, self.relative_to),
+            "category": category,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "_signature": (stat.st_size, stat.st_mtime_ns, stat.st_ino),
+            **parsed
+        }
+
+    def _scan_dir(self, directory, recursive):
+        """List one directory, re-reading files whose size, mtime or inode changed.
+
+        Subdirectories are descended into when they are new or ``recursive``
+        is set. Returns True if any file was added, changed or removed.
+        """
+        changed = False
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+            entries = list(os.scandir(directory))
+        except OSError:
+            return self._purge(directory)
+
+        _, old_files, old_subdirs = self.dirs.get(directory, (None, set(), set()))
+        files = set()
+        subdirs = set()
+        for entry in entries:
+            if entry.name.startswith('.'):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(entry.path)
+                    if entry.path not in self.dirs or recursive:
+                        changed |= self._scan_dir(entry.path, True)
+                elif entry.name.endswith(self.extensions) and entry.is_file():
+                    files.add(entry.path)
+                    known = self.files.get(entry.path)
+                    stat = entry.stat()
+                    signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                    if known is None or known["_signature"] != signature:
+                        self.files[entry.path] = self._record(entry.path, stat)
+                        changed = True
+            except OSError as e:
+                logger.debug(f"Skipping {entry.path}: {e}")
+
+        for path in old_files - files:
+            del self.files[path]
+            changed = True
+        for path in old_subdirs - subdirs:
+            changed |= self._purge(path)
+        self.dirs[directory] = (mtime, files, subdirs)
+        return changed
+
+    def _purge(self, directory):
+        """Forget a directory that disappeared, with everything below it"""
+        if directory not in self.dirs:
+            return False
+        _, files, subdirs = self.dirs.pop(directory)
+        for path in files:
+            self.files.pop(path, None)
+        removed = bool(files)
+        for path in subdirs:
+            removed |= self._purge(path)
+        return removed
+
+    def _load_store(self):
+        """Records saved by a previous run; checked against the files by the first walk"""
+        try:
+            with open(self.store_path, 'r') as f:
+                store = json.load(f)
+        except (OSError, ValueError):
+            return
+        if store.get("format") != STORE_FORMAT or store.get("root") != self.root:
+            return
+        for record in store["records"]:
+            record["_signature"] = tuple(record["_signature"])
+            self.files[record["path"]] = record
+        logger.info(f"Loaded {len(self.files)} rule records from {self.store_path}")
+
+    def _save_store(self):
+        temp = f"{self.store_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.store_path)), exist_ok=True)
+            with open(temp, 'w') as f:
+                json.dump({"format": STORE_FORMAT, "root": self.root,
+                           "records": list(self.files.values())}, f, separators=(',', ':'))
+            os.replace(temp, self.store_path)
+        except OSError as e:
+            logger.warning(f"Could not save rule store {self.store_path}: {e}")
+
+    def refresh(self, force=False):
+        """Bring the index up to date (rate limited unless ``force``)"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._checked is not None and \
+                    now - self._checked < self.check_interval:
+                return
+            self._checked = now
+
+            if not os.path.isdir(self.root):
+                if self.files or self.dirs:
+                    self.files.clear()
+                    self.dirs.clear()
+                    self.version += 1
+                return
+
+            if force or not self.dirs:
+                first = not self.dirs
+                if first and self.store_path:
+                    self._load_store()
+                changed = self._scan_dir(self.root, True)
+                self.walks += 1
+                if first and self.files:
+                    # Stored records of files that no longer exist
+                    present = set().union(*(files for _, files, _ in self.dirs.values()))
+                    for path in set(self.files) - present:
+                        del self.files[path]
+                        changed = True
+            else:
+                changed = False
+                for directory, (mtime, _, _) in list(self.dirs.items()):
+                    if directory not in self.dirs:
+                        continue
+                    try:
+                        current = os.stat(directory).st_mtime_ns
+                    except OSError:
+                        changed |= self._purge(directory)
+                        continue
+                    if current != mtime:
+                        changed |= self._scan_dir(directory, False)
+            if changed:
+                self.version += 1
+                if self.store_path:
+                    self._save_store()
+
+    @staticmethod
+    def _public(record):
+        return {key: value for key, value in record.items() if not key.startswith('_')}
+
+    def rules(self, under=None):
+        """Rule file records sorted by path, optionally only those below a directory"""
+        self.refresh()
+        with self._lock:
+            if self._sorted_version != self.version:
+                self._sorted = sorted(self.files.values(), key=lambda record: record["path"])
+                self._sorted_version = self.version
+            records = self._sorted
+        if under:
+            prefix = under.rstrip('/') + '/'
+            records = [record for record in records if record["path"].startswith(prefix)]
+        return [self._public(record) for record in records]
+
+    def has_directory(self, path):
+        """Whether ``path`` is an indexed directory of the tree"""
+        self.refresh()
+        return path.rstrip('/') in self.dirs
+
+    def categories(self):
+        """Top-level directories with the number of rule files below each"""
+        self.refresh()
+        with self._lock:
+            counts = Counter(record["category"] for record in self.files.values())
+            top_level = sorted(d for d in self.dirs if os.path.dirname(d) == self.root)
+        return [{"name": os.path.basename(d), "count": counts.get(os.path.basename(d), 0),
+                 "path": d} for d in top_level]
+
+    def total(self):
+        """Number of rule files"""
+        self.refresh()
+        return len(self.files)
+
+
+class SigmaRuleIndex:
+    """Sigma rules of an inventory indexed by level, status, logsource
+    product/service/category, ATT&CK tag and detection field.
+
+    The index is rebuilt from the already parsed inventory records whenever
+    the inventory version changes, so queries never parse YAML. Every facet
+    accepts several comma-separated values (any of them matches); facets are
+    combined with AND.
+    """
+
+    FACETS = ("level", "status", "product", "service", "category", "tag", "field")
+
+    def __init__(self, inventory):
+        self.inventory = inventory
+        self._version = None
+        self._records = []
+        self._index = {}
+        self._lock = threading.Lock()
+
+    def _keys(self, record):
+        logsource = record.get("logsource") or {}
+        keys = {
+            "level": {record["level"].lower()} if record.get("level") else set(),
+            "status": {record["status"].lower()} if record.get("status") else set(),
+            "tag": set().union(*(tag_keys(tag) for tag in record.get("tags") or [])),
+            "field": {field.lower() for field in record.get("fields") or []}
+        }
+        for key in LOGSOURCE_KEYS:
+            keys[key] = {logsource[key].lower()} if logsource.get(key) else set()
+        return keys
+
+    def _current(self):
+        self.inventory.refresh()
+        with self._lock:
+            if self._version != self.inventory.version:
+                version = self.inventory.version
+                records = self.inventory.rules()
+                index = {facet: defaultdict(set) for facet in self.FACETS}
+                for position, record in enumerate(records):
+                    for facet, values in self._keys(record).items():
+                        for value in values:
+                            index[facet][value].add(position)
+                self._records = records
+                self._index = index
+                self._version = version
+            return self._records, self._index
+
+    def query(self, under=None, text=None, **facets):
+        """Records matching every given facet, in path order"""
+        records, index = self._current()
+        selected = None
+        for facet, wanted in facets.items():
+            if not wanted:
+                continue
+            values = [v.strip().lower() for v in str(wanted).split(',') if v.strip()]
+            positions = set().union(*(index[facet].get(value, set()) for value in values))
+            selected = positions if selected is None else selected & positions
+        results = [records[i] for i in sorted(selected)] if selected is not None else records
+        if under:
+            prefix = under.rstrip('/') + '/'
+            results = [record for record in results if record["path"].startswith(prefix)]
+        if text:
+            text = text.lower()
+            results = [record for record in results
+                       if text in (record.get("title") or '').lower()
+                       or text in record["name"].lower()]
+        return results
+
+    def facets(self, top=50):
+        """Rule counts per value of every facet (the ``top`` most common for tags and fields)"""
+        _, index = self._current()
+        counts = {}
+        for facet in self.FACETS:
+            values = Counter({value: len(positions) for value, positions in index[facet].items()})
+            if facet in ("tag", "field"):
+                counts[facet] = dict(values.most_common(top))
+            else:
+                counts[facet] = dict(sorted(values.items()))
+        return counts
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Shared State
+Serves the changelog, container monitor, metric samplers, YARA scan jobs,
+Sigma converter and dashboard push channel from a single process to every
+web server worker over a multiprocessing manager socket
+"""
+
+import os
+import time
+import logging
+import threading
+from multiprocessing.managers import BaseManager, IteratorProxy
+
+logger = logging.getLogger(__name__)
+
+# Objects that exist once per portal and are shared by all workers
+SHARED_OBJECTS = ("changelog_manager", "container_monitor", "host_metrics", "trends_store",
+                  "yara_jobs", "sigma_converter", "push_broadcaster")
+
+# Methods returning generators: the generator stays in the state process and
+# the worker iterates it through a proxy, so progress still streams
+ITERATOR_METHODS = {
+    "container_monitor": {"bulk_control": "Iterator"},
+    "yara_jobs": {"stream": "Iterator"},
+    "sigma_converter": {"convert_batch": "Iterator"},
+    "push_broadcaster": {"listen": "Iterator"}
+}
+
+
+class PortalStateManager(BaseManager):
+    """Manager serving the shared portal objects"""
+
+
+PortalStateManager.register('Iterator', proxytype=IteratorProxy, create_method=False)
+
+
+def serve_state(objects, address, authkey):
+    """Serve ``objects`` (name -> instance) on a UNIX socket from a daemon thread.
+
+    Every worker connection is handled by its own thread, so the shared
+    objects see the same concurrency as under a threaded development server.
+    Only public methods are callable; attribute access is not proxied.
+    """
+    for name in SHARED_OBJECTS:
+        PortalStateManager.register(name, callable=lambda obj=objects[name]: obj,
+                                    method_to_typeid=ITERATOR_METHODS.get(name))
+    if os.path.exists(address):
+        # Left over from a previous run that did not shut down cleanly
+        os.unlink(address)
+    server = PortalStateManager(address=address, authkey=authkey).get_server()
+    thread = threading.Thread(target=server.serve_forever, name='state-server', daemon=True)
+    thread.start()
+    logger.info(f"Shared state served on {address}")
+    return server
+
+
+def connect_state(address, authkey, timeout=30):
+    """Connect to the state process and return proxies by object name"""
+    for name in SHARED_OBJECTS:
+        PortalStateManager.register(name)
+    manager = PortalStateManager(address=address, authkey=authkey)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            manager.connect()
+            break
+        except (FileNotFoundError, ConnectionRefusedError):
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.2)
+    logger.info(f"Worker {os.getpid()} connected to shared state on {address}")
+    return {name: getattr(manager, name)() for name in SHARED_OBJECTS}
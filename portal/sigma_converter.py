@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Sigma Converter
+pySigma conversion on a pool of worker processes that keep the plugins
+and backends loaded, with converted queries cached by rule content,
+target and pipeline
+"""
+
+import os
+import time
+import signal
+import hashlib
+import logging
+import sqlite3
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from importlib.metadata import version as package_version
+
+try:
+    from sigma.collection import SigmaCollection
+    from sigma.plugins import InstalledSigmaPlugins
+except ImportError:
+    SigmaCollection = None
+    InstalledSigmaPlugins = None
+
+logger = logging.getLogger(__name__)
+
+# Rules sent to a worker at a time by batch conversions
+BATCH_CHUNK = 16
+
+
+def sigma_version():
+    """Installed pySigma version; part of the cache key so upgrades reconvert"""
+    try:
+        return package_version('pySigma')
+    except Exception:
+        return 'unknown'
+
+
+# Pool worker state: plugins are discovered once and one backend is kept
+# per (target, pipelines)
+_plugins = None
+_backends = {}
+
+
+def _load_plugins():
+    global _plugins
+    if _plugins is None:
+        _plugins = InstalledSigmaPlugins.autodiscover()
+    return _plugins
+
+
+def _backend(target, pipelines):
+    key = (target, pipelines)
+    if key not in _backends:
+        plugins = _load_plugins()
+        backend_class = plugins.backends.get(target)
+        if backend_class is None:
+            raise ValueError(f"Unknown target '{target}'")
+        # No pipeline is the library equivalent of 'sigma convert --without-pipeline'
+        pipeline = plugins.get_pipeline_resolver().resolve(list(pipelines)) if pipelines else None
+        _backends[key] = backend_class(processing_pipeline=pipeline)
+    return _backends[key]
+
+
+def _init_worker(warm_target):
+    # The portal's shutdown handler must only run in the portal itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    try:
+        if warm_target:
+            _backend(warm_target, ())
+        else:
+            _load_plugins()
+    except Exception as e:
+        logger.warning(f"Could not preload Sigma backend {warm_target}: {e}")
+
+
+def _ready():
+    return os.getpid()
+
+
+def _plugin_names():
+    plugins = _load_plugins()
+    return sorted(plugins.backends), sorted(plugins.pipelines)
+
+
+def convert_text(target, pipelines, text):
+    """Convert one rule's YAML; returns ``(output, error)``"""
+    try:
+        result = _backend(target, pipelines).convert(SigmaCollection.from_yaml(text))
+        if isinstance(result, list):
+            return '\n'.join(str(query) for query in result), None
+        return str(result), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _convert_chunk(target, pipelines, items):
+    return [(key, *convert_text(target, pipelines, text)) for key, text in items]
+
+
+class SigmaConverter:
+    """Converts Sigma rules with pySigma on a pool of warm worker processes.
+
+    Each worker discovers the installed pySigma plugins once and reuses a
+    backend per target and pipeline, so a conversion costs only the
+    conversion itself instead of an interpreter start and plugin imports.
+    Results (including conversion errors, which are just as deterministic)
+    are cached in SQLite by rule content hash, target, pipelines and
+    pySigma version.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS conversions (
+            rule_hash TEXT NOT NULL,
+            target TEXT NOT NULL,
+            pipeline TEXT NOT NULL,
+            version TEXT NOT NULL,
+            output TEXT,
+            error TEXT,
+            converted_at REAL,
+            PRIMARY KEY (rule_hash, target, pipeline, version)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, cache_path, workers=None, warm_target=None):
+        self.cache_path = cache_path
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.warm_target = warm_target
+        self.version = sigma_version() if SigmaCollection is not None else None
+        self.hits = 0
+        self.conversions = 0
+        self._pool = None
+        self._plugin_names = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript(self.SCHEMA)
+
+    def available(self):
+        """Whether pySigma is installed"""
+        return SigmaCollection is not None
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.cache_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Forked from the single-threaded fork server rather than the
+                # portal; preloading this module imports pySigma there once
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['__main__', __name__])
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker,
+                    initargs=(self.warm_target,), mp_context=context)
+            return self._pool
+
+    def _discard_pool(self, pool):
+        """Drop a pool whose worker died so the next conversion starts a new one"""
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Sigma conversion worker died, restarting the pool")
+
+    def _call(self, function, *args):
+        """Run one call on the pool, replacing the pool if a worker died"""
+        pool = self._get_pool()
+        try:
+            return pool.submit(function, *args).result()
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise
+
+    def warm(self):
+        """Start the workers so plugins and the default backend load before first use"""
+        if not self.available():
+            return
+        pool = self._get_pool()
+        try:
+            for future in [pool.submit(_ready) for _ in range(self.workers)]:
+                future.result()
+        except BrokenProcessPool:
+            self._discard_pool(pool)
+            raise
+        logger.info(f"Sigma converter ready with {self.workers} workers (pySigma {self.version})")
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def plugins(self):
+        """Installed conversion targets and processing pipelines"""
+        if self._plugin_names is None:
+            targets, pipelines = self._call(_plugin_names)
+            self._plugin_names = {"targets": targets, "pipelines": pipelines}
+        return self._plugin_names
+
+    @staticmethod
+    def _pipelines(pipelines):
+        if isinstance(pipelines, str):
+            pipelines = [pipelines]
+        return tuple(p for p in (pipelines or ()) if p)
+
+    def _lookup(self, rule_hash, target, pipeline):
+        row = self._conn().execute(
+            "SELECT output, error FROM conversions WHERE rule_hash = ? AND target = ? "
+            "AND pipeline = ? AND version = ?",
+            (rule_hash, target, pipeline, self.version)).fetchone()
+        return row
+
+    def _store(self, rows):
+        conn = self._conn()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO conversions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(rule_hash, target, pipeline, self.version, output, error, time.time())
+                 for rule_hash, target, pipeline, output, error in rows])
+
+    def _read(self, rule_path):
+        with open(rule_path, 'rb') as f:
+            content = f.read()
+        return hashlib.sha256(content).hexdigest(), content.decode('utf-8', 'replace')
+
+    @staticmethod
+    def _result(rule_path, output, error, cached):
+        result = {"rule": rule_path, "success": error is None, "cached": cached}
+        if error is None:
+            result["output"] = output
+        else:
+            result["error"] = error
+        return result
+
+    def convert(self, rule_path, target, pipelines=()):
+        """Convert one rule file; returns a result dict"""
+        pipelines = self._pipelines(pipelines)
+        pipeline_key = ','.join(pipelines)
+        rule_hash, text = self._read(rule_path)
+        cached = self._lookup(rule_hash, target, pipeline_key)
+        if cached:
+            self.hits += 1
+            return self._result(rule_path, cached[0], cached[1], True)
+        try:
+            [(_, output, error)] = self._call(
+                _convert_chunk, target, pipelines, [(rule_path, text)])
+        except BrokenProcessPool as e:
+            # Not the rule's fault, so not cached
+            return self._result(rule_path, None, f"Conversion worker died: {e}", False)
+        self.conversions += 1
+        self._store([(rule_hash, target, pipeline_key, output, error)])
+        return self._result(rule_path, output, error, False)
+
+    def convert_batch(self, rule_paths, target, pipelines=(), include_output=True):
+        """Convert many rule files in parallel, yielding each result as it is ready.
+
+        Cached rules are yielded first; the rest are converted in chunks of
+        ``BATCH_CHUNK`` rules across the pool. A final ``done`` event carries
+        the totals.
+        """
+        pipelines = self._pipelines(pipelines)
+        pipeline_key = ','.join(pipelines)
+        started = time.monotonic()
+        totals = {"converted": 0, "failed": 0, "cached": 0}
+
+        def emit(result):
+            totals["converted" if result["success"] else "failed"] += 1
+            totals["cached"] += result["cached"]
+            if not include_output:
+                result.pop("output", None)
+            return {"event": "result", **result}
+
+        pending_items = []
+        hashes = {}
+        for rule_path in rule_paths:
+            try:
+                rule_hash, text = self._read(rule_path)
+            except OSError as e:
+                yield emit(self._result(rule_path, None, str(e), False))
+                continue
+            cached = self._lookup(rule_hash, target, pipeline_key)
+            if cached:
+                self.hits += 1
+                yield emit(self._result(rule_path, cached[0], cached[1], True))
+            else:
+                hashes[rule_path] = rule_hash
+                pending_items.append((rule_path, text))
+
+        pool = self._get_pool()
+        chunks = {}
+        lost = []
+        broken = None
+        try:
+            for i in range(0, len(pending_items), BATCH_CHUNK):
+                chunk = pending_items[i:i + BATCH_CHUNK]
+                chunks[pool.submit(_convert_chunk, target, pipelines, chunk)] = chunk
+        except BrokenProcessPool as e:
+            broken = e
+            lost.extend(pending_items[sum(len(chunk) for chunk in chunks.values()):])
+        futures = set(chunks)
+        try:
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        rows = future.result()
+                    except BrokenProcessPool as e:
+                        broken = e
+                        lost.extend(chunks[future])
+                        continue
+                    self.conversions += len(rows)
+                    self._store([(hashes[path], target, pipeline_key, output, error)
+                                 for path, output, error in rows])
+                    for path, output, error in rows:
+                        yield emit(self._result(path, output, error, False))
+            if broken is not None:
+                self._discard_pool(pool)
+                # Lost to a dead worker rather than failed on the rule: not cached
+                for path, _ in lost:
+                    yield emit(self._result(path, None, f"Conversion worker died: {broken}", False))
+        finally:
+            # A client that disconnects does not leave chunks queued
+            for future in futures:
+                future.cancel()
+
+        yield {"event": "done", "target": target, "pipelines": list(pipelines),
+               "total": sum(totals[k] for k in ("converted", "failed")), **totals,
+               "duration": round(time.monotonic() - started, 3)}
+
+    def stats(self):
+        return {
+            "available": self.available(),
+            "pysigma_version": self.version,
+            "workers": self.workers,
+            "workers_started": self._pool is not None,
+            "cached_conversions": self._conn().execute(
+                "SELECT COUNT(*) FROM conversions").fetchone()[0],
+            "cache_hits": self.hits,
+            "conversions": self.conversions
+        }
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal Time-Series Store
+Fixed-size numpy ring buffers with 10s/1m/1h rollups, persisted in
+memory-mapped files so trends survive portal restarts
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+META_FILE = 'trends.json'
+
+# (bucket seconds, slots): 1 hour of 10s points, 24 hours of 1m points and
+# 7 days of 1h points
+RESOLUTIONS = ((10, 360), (60, 1440), (3600, 168))
+
+# Query windows and the resolution that serves them
+WINDOWS = {"1h": (3600, 10), "24h": (86400, 60), "7d": (7 * 86400, 3600)}
+
+
+def _tier_dtype(series_count):
+    return np.dtype([('ts', '<i8'), ('count', '<i4'), ('values', '<f4', (series_count,))])
+
+
+class TimeSeriesStore:
+    """Multi-resolution ring buffer store for a fixed set of numeric series.
+
+    Every sample is folded into the current bucket of each resolution as a
+    running mean, so rollups cost O(1) per sample and no raw history is kept.
+    Slot ``(ts // resolution) % slots`` holds a bucket; a slot whose stored
+    bucket start does not match is a gap. Each resolution lives in its own
+    memory-mapped file under ``directory``.
+    """
+
+    def __init__(self, directory, series, flush_interval=60):
+        self.directory = directory
+        self.series = list(series)
+        self.column = {name: i for i, name in enumerate(self.series)}
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._stopping = threading.Event()
+        self.thread = None
+        self.last_sample = None
+
+        os.makedirs(directory, exist_ok=True)
+        self.tiers = {}
+        previous = self._load_meta()
+        for resolution, slots in RESOLUTIONS:
+            self.tiers[resolution] = self._open_tier(resolution, slots, previous)
+        self._write_meta()
+
+    def _tier_path(self, resolution):
+        return os.path.join(self.directory, f'trends-{resolution}s.dat')
+
+    def _load_meta(self):
+        path = os.path.join(self.directory, META_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable trends metadata: {e}")
+            return None
+
+    def _write_meta(self):
+        path = os.path.join(self.directory, META_FILE)
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({"series": self.series,
+                       "resolutions": [list(r) for r in RESOLUTIONS]}, f)
+        os.replace(tmp, path)
+
+    def _open_tier(self, resolution, slots, previous):
+        """Map a resolution file, migrating columns if the series list changed"""
+        path = self._tier_path(resolution)
+        dtype = _tier_dtype(len(self.series))
+        old_series = previous.get("series") if previous else None
+        expected_size = dtype.itemsize * slots
+
+        if (os.path.exists(path) and old_series == self.series and
+                os.path.getsize(path) == expected_size):
+            return np.memmap(path, dtype=dtype, mode='r+', shape=(slots,))
+
+        old = None
+        if old_series and os.path.exists(path):
+            old_dtype = _tier_dtype(len(old_series))
+            if os.path.getsize(path) == old_dtype.itemsize * slots:
+                old = np.array(np.memmap(path, dtype=old_dtype, mode='r', shape=(slots,)))
+
+        tier = np.memmap(path, dtype=dtype, mode='w+', shape=(slots,))
+        tier['ts'] = -1
+        tier['values'] = np.nan
+        if old is not None:
+            tier['ts'] = old['ts']
+            tier['count'] = old['count']
+            for i, name in enumerate(old_series):
+                if name in self.column:
+                    tier['values'][:, self.column[name]] = old['values'][:, i]
+            logger.info(f"Migrated {resolution}s trends to the new series list")
+        tier.flush()
+        return tier
+
+    def add(self, values, when=None):
+        """Fold one sample (series name -> number) into every resolution"""
+        when = int(when if when is not None else time.time())
+        row = np.full(len(self.series), np.nan, dtype='<f4')
+        for name, value in values.items():
+            if name in self.column and value is not None:
+                row[self.column[name]] = value
+
+        with self._lock:
+            for resolution, tier in self.tiers.items():
+                bucket = when - when % resolution
+                slot = (bucket // resolution) % len(tier)
+                if tier['ts'][slot] != bucket:
+                    tier['ts'][slot] = bucket
+                    tier['count'][slot] = 1
+                    tier['values'][slot] = row
+                else:
+                    count = tier['count'][slot] + 1
+                    current = tier['values'][slot]
+                    # Running mean; a series missing so far takes the new value
+                    tier['values'][slot] = np.where(
+                        np.isnan(current), row,
+                        np.where(np.isnan(row), current, current + (row - current) / count))
+                    tier['count'][slot] = count
+            self.last_sample = when
+
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        for tier in self.tiers.values():
+            tier.flush()
+        self._last_flush = time.monotonic()
+
+    def flush(self):
+        """Write the memory-mapped buffers back to disk"""
+        with self._lock:
+            self._flush()
+
+    def query(self, window='24h', series=None, now=None):
+        """Return (bucket_starts, {series: values}) for a window, oldest first.
+
+        Costs O(points): the bucket slots of the window are gathered with one
+        fancy index. Buckets without samples are returned as None.
+        """
+        span, resolution = WINDOWS[window]
+        tier = self.tiers[resolution]
+        now = int(now if now is not None else time.time())
+        last = now - now % resolution
+        buckets = np.arange(last - span + resolution, last + resolution, resolution,
+                            dtype=np.int64)
+        slots = (buckets // resolution) % len(tier)
+
+        with self._lock:
+            rows = tier[slots]
+        present = rows['ts'] == buckets
+        names = series or self.series
+        data = {}
+        for name in names:
+            column = rows['values'][:, self.column[name]].astype(np.float64)
+            values = np.round(column, 2).tolist()
+            for i in np.flatnonzero(~present | np.isnan(column)):
+                values[i] = None
+            data[name] = values
+        return buckets.tolist(), data
+
+    def start(self, sample_fn, interval=10):
+        """Feed the store from ``sample_fn()`` every ``interval`` seconds"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stopping.clear()
+
+        def run():
+            while not self._stopping.is_set():
+                started = time.monotonic()
+                try:
+                    self.add(sample_fn())
+                except Exception as e:
+                    logger.error(f"Error sampling trends: {e}")
+                self._stopping.wait(max(0.0, interval - (time.monotonic() - started)))
+
+        self.thread = threading.Thread(target=run, name='trends-sampler', daemon=True)
+        self.thread.start()
+
+    def close(self):
+        """Stop the sampler and flush the buffers"""
+        self._stopping.set()
+        if self.thread:
+            self.thread.join()
+        self.flush()
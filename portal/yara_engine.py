@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal YARA Engine
+Compiled ruleset cache (in memory and as saved blobs on disk), a persistent
+scan result cache keyed by file content, and an in-process yara-python
+scanner returning structured matches
+"""
+
+import os
+import re
+import json
+import mmap
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+import subprocess
+from collections import OrderedDict, defaultdict
+
+try:
+    import yara
+except ImportError:
+    yara = None
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+logger = logging.getLogger(__name__)
+
+INCLUDE_PATTERN = re.compile(r'^[ \t]*include[ \t]+"([^"]+)"', re.M)
+
+BLOB_SUFFIX = '.yarc'
+
+# Bounds on what a match reports, so a rule hitting every byte of a large
+# file does not produce a huge response
+MAX_STRING_INSTANCES = 10
+MAX_STRING_DATA = 64
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class YaraRulesetCache:
+    """Compiled rulesets keyed by rule file path and modification time.
+
+    A ruleset is identified by the path of its rule file plus the size and
+    mtime of that file and of every file it includes, so index files such as
+    ``malware_index.yar`` are recompiled when any included rule changes.
+    Compiled rules are kept in memory (up to ``max_rulesets``) and saved to
+    ``cache_dir``, where other worker processes and later runs load them
+    instead of compiling again. Blobs that fail to load (for instance after a
+    libyara upgrade) are recompiled.
+    """
+
+    def __init__(self, cache_dir, max_rulesets=16):
+        self.cache_dir = cache_dir
+        self.max_rulesets = max_rulesets
+        self.hits = 0
+        self.disk_loads = 0
+        self.compiles = 0
+        self._rulesets = OrderedDict()
+        self._includes = {}
+        self._lock = threading.Lock()
+        self._path_locks = defaultdict(threading.Lock)
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _included(self, path):
+        """Files included by a rule file, re-read only when it changed"""
+        signature = _signature(path)
+        cached = self._includes.get(path)
+        if cached and cached[0] == signature:
+            return cached[1]
+        with open(path, 'r', errors='replace') as f:
+            names = INCLUDE_PATTERN.findall(f.read())
+        base = os.path.dirname(path)
+        included = [os.path.normpath(os.path.join(base, name)) for name in names]
+        self._includes[path] = (signature, included)
+        return included
+
+    def fingerprint(self, path):
+        """Hash of the size and mtime of a rule file and everything it includes"""
+        digest = hashlib.sha256()
+        seen = set()
+        pending = [path]
+        while pending:
+            current = pending.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            try:
+                size, mtime = _signature(current)
+                pending.extend(self._included(current))
+            except OSError:
+                # Missing include: compiling reports it
+                size, mtime = -1, -1
+            digest.update(f"{current}\0{size}\0{mtime}\n".encode())
+        return digest.hexdigest()
+
+    def _blob_prefix(self, path):
+        return hashlib.sha1(path.encode()).hexdigest()[:16] + '-'
+
+    def _compile(self, path, fingerprint):
+        """Load the saved blob for this fingerprint or compile and save one"""
+        prefix = self._blob_prefix(path)
+        blob = os.path.join(self.cache_dir, prefix + fingerprint[:16] + BLOB_SUFFIX)
+        if os.path.exists(blob):
+            try:
+                rules = yara.load(filepath=blob)
+                self.disk_loads += 1
+                return rules, 'disk'
+            except yara.Error as e:
+                logger.warning(f"Discarding unreadable compiled ruleset {blob}: {e}")
+
+        rules = yara.compile(filepath=path, includes=True)
+        self.compiles += 1
+        temp = f"{blob}.{os.getpid()}.tmp"
+        try:
+            rules.save(temp)
+            os.replace(temp, blob)
+        except Exception as e:
+            logger.warning(f"Could not save compiled ruleset {blob}: {e}")
+            if os.path.exists(temp):
+                os.remove(temp)
+        for name in os.listdir(self.cache_dir):
+            # Blobs of older versions of the same rule file
+            if name.startswith(prefix) and name.endswith(BLOB_SUFFIX) and \
+                    os.path.join(self.cache_dir, name) != blob:
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    pass
+        return rules, 'compiled'
+
+    def get(self, path):
+        """Return ``(rules, fingerprint, source)``.
+
+        ``source`` is ``memory``, ``disk`` or ``compiled``; the fingerprint
+        identifies the ruleset version for the scan result cache.
+        """
+        path = os.path.realpath(path)
+        with self._lock:
+            path_lock = self._path_locks[path]
+        # Per-path lock: concurrent scans with the same rules compile once,
+        # scans with other rules are not held up
+        with path_lock:
+            fingerprint = self.fingerprint(path)
+            with self._lock:
+                cached = self._rulesets.get(path)
+                if cached and cached[0] == fingerprint:
+                    self._rulesets.move_to_end(path)
+                    self.hits += 1
+                    return cached[1], fingerprint, 'memory'
+
+            rules, source = self._compile(path, fingerprint)
+            with self._lock:
+                self._rulesets[path] = (fingerprint, rules)
+                self._rulesets.move_to_end(path)
+                while len(self._rulesets) > self.max_rulesets:
+                    self._rulesets.popitem(last=False)
+            return rules, fingerprint, source
+
+    def stats(self):
+        return {
+            "cached_rulesets": len(self._rulesets),
+            "hits": self.hits,
+            "disk_loads": self.disk_loads,
+            "compiles": self.compiles,
+            "cache_dir": self.cache_dir
+        }
+
+
+def content_digest(data):
+    """Digest of file content: xxh3-128 when xxhash is installed, else SHA-256"""
+    if xxhash is not None:
+        return 'xxh3:' + xxhash.xxh3_128_hexdigest(data)
+    return 'sha256:' + hashlib.sha256(data).hexdigest()
+
+
+class ScanResultCache:
+    """Scan results keyed by file content digest and ruleset version.
+
+    Stored in SQLite (WAL mode) so the portal workers and the scan job pool
+    processes share it and it survives restarts. Files whose content was
+    already scanned with the same ruleset version are answered from the
+    cache, wherever they are and whatever their mtime. Results of a rule
+    file's previous version are deleted once ``set_ruleset`` records a new
+    one.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            digest TEXT NOT NULL,
+            ruleset TEXT NOT NULL,
+            matches TEXT NOT NULL,
+            size INTEGER,
+            scanned_at REAL,
+            PRIMARY KEY (digest, ruleset)
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS rulesets (
+            rule_path TEXT PRIMARY KEY,
+            ruleset TEXT NOT NULL
+        );
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        with conn:
+            conn.executescript(self.SCHEMA)
+
+    def _conn(self):
+        """Per-thread connection; WAL lets readers run alongside a writer"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, digest, ruleset):
+        """Cached matches (without ``file``) or None"""
+        row = self._conn().execute(
+            "SELECT matches FROM results WHERE digest = ? AND ruleset = ?",
+            (digest, ruleset)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, digest, ruleset, matches, size):
+        conn = self._conn()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                         (digest, ruleset, json.dumps(matches), size, time.time()))
+
+    def set_ruleset(self, rule_path, ruleset):
+        """Record the current version of a rule file, dropping its old results"""
+        conn = self._conn()
+        with conn:
+            row = conn.execute("SELECT ruleset FROM rulesets WHERE rule_path = ?",
+                               (rule_path,)).fetchone()
+            if row and row[0] != ruleset:
+                deleted = conn.execute("DELETE FROM results WHERE ruleset = ?", (row[0],)).rowcount
+                logger.info(f"Dropped {deleted} cached scan results of old {rule_path}")
+            conn.execute("INSERT OR REPLACE INTO rulesets VALUES (?, ?)", (rule_path, ruleset))
+
+    def stats(self):
+        return {
+            "entries": self._conn().execute("SELECT COUNT(*) FROM results").fetchone()[0],
+            "hits": self.hits,
+            "misses": self.misses,
+            "digest": "xxh3" if xxhash is not None else "sha256"
+        }
+
+
+def _string_matches(strings):
+    """Matched strings as dicts, for both the yara-python >= 4.3 and older APIs"""
+    results = []
+    for string in strings:
+        if isinstance(string, tuple):
+            # Before 4.3: (offset, identifier, data) per instance
+            offset, identifier, data = string
+            instances = [(offset, data)]
+        else:
+            identifier = string.identifier
+            instances = [(instance.offset, instance.matched_data)
+                         for instance in string.instances]
+        existing = next((r for r in results if r["identifier"] == identifier), None)
+        if existing is None:
+            existing = {"identifier": identifier, "instances": [], "instance_count": 0}
+            results.append(existing)
+        existing["instance_count"] += len(instances)
+        for offset, data in instances:
+            if len(existing["instances"]) >= MAX_STRING_INSTANCES:
+                break
+            existing["instances"].append({
+                "offset": offset,
+                "length": len(data),
+                "data": data[:MAX_STRING_DATA].decode('utf-8', 'backslashreplace')
+            })
+    return results
+
+
+def match_to_dict(path, match):
+    return {
+        "file": path,
+        "rule": match.rule,
+        "namespace": match.namespace,
+        "tags": list(match.tags),
+        "meta": match.meta,
+        "strings": _string_matches(match.strings)
+    }
+
+
+def scan_file(rules, path, timeout=60, results=None, ruleset=None):
+    """Matches of one file as dicts, and whether they came from ``results``.
+
+    With a ScanResultCache the file is memory-mapped once: the mapping is
+    hashed and, when its content is not cached for ``ruleset``, scanned, so
+    a large file is read from disk only once.
+    """
+    if results is None:
+        return [match_to_dict(path, match) for match in rules.match(path, timeout=timeout)], False
+
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        # Empty files cannot be mapped
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        try:
+            digest = content_digest(data)
+            cached = results.get(digest, ruleset)
+            if cached is not None:
+                return [{"file": path, **match} for match in cached], True
+            matches = [match_to_dict(path, match)
+                       for match in rules.match(data=data, timeout=timeout)]
+        finally:
+            if size:
+                data.close()
+    results.put(digest, ruleset, [{key: value for key, value in match.items() if key != "file"}
+                                  for match in matches], size)
+    return matches, False
+
+
+def iter_files(target):
+    """Regular files at or below ``target``, without following symlinks"""
+    if os.path.isfile(target):
+        yield target
+        return
+    for root, dirs, files in os.walk(target):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                yield path
+
+
+def scan_path(rules, target, timeout=60, results=None, ruleset=None):
+    """Scan a file or directory tree in process.
+
+    ``timeout`` applies to each file, so a large tree is not cut off as a
+    whole; files that time out or cannot be read are reported in ``errors``.
+    """
+    matches = []
+    errors = []
+    files_scanned = 0
+    files_cached = 0
+    bytes_scanned = 0
+    for path in iter_files(target):
+        try:
+            file_matches, cached = scan_file(rules, path, timeout, results, ruleset)
+            matches.extend(file_matches)
+            files_scanned += 1
+            files_cached += cached
+            bytes_scanned += os.path.getsize(path)
+        except (yara.Error, OSError, ValueError) as e:
+            errors.append({"file": path, "error": str(e)})
+    return {
+        "matches": matches,
+        "files_scanned": files_scanned,
+        "files_cached": files_cached,
+        "bytes_scanned": bytes_scanned,
+        "errors": errors
+    }
+
+
+def scan_path_cli(rule_path, target, timeout=60):
+    """Fallback for hosts without yara-python: run the yara CLI.
+
+    The whole scan is bounded by ``timeout``; ``subprocess.TimeoutExpired``
+    propagates to the caller.
+    """
+    result = subprocess.run(['yara', '-r', '-g', '-m', rule_path, target],
+                            capture_output=True, text=True, timeout=timeout)
+    matches = []
+    for line in result.stdout.splitlines():
+        # RULE [tag,tag] [meta="value",...] PATH
+        parts = re.match(r'^(\S+) \[([^\]]*)\] \[.*?\] (.+)$', line)
+        if parts:
+            matches.append({
+                "file": parts.group(3),
+                "rule": parts.group(1),
+                "namespace": None,
+                "tags": [tag for tag in parts.group(2).split(',') if tag],
+                "meta": {},
+                "strings": []
+            })
+    errors = [{"file": None, "error": line}
+              for line in result.stderr.splitlines() if line.strip()]
+    return {"matches": matches, "files_scanned": None, "files_cached": None,
+            "bytes_scanned": None, "errors": errors}
@@ -0,0 +1,561 @@
+#!/usr/bin/env python3
+"""
+CyberBlueSOC Portal YARA Scan Jobs
+Background YARA scans of large trees: files are enumerated lazily, scanned
+in batches by a process pool, and matches are streamed as they are found.
+Jobs and the files already scanned are kept on disk so interrupted jobs
+resume after a restart without rescanning unchanged files
+"""
+
+import os
+import json
+import stat
+import time
+import uuid
+import signal
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+import yara_engine
+from yara_engine import ScanResultCache, YaraRulesetCache, scan_file
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATES = ('queued', 'running')
+
+# Seconds between job checkpoints and between progress events of a stream
+CHECKPOINT_INTERVAL = 5
+PROGRESS_INTERVAL = 2
+
+
+def walk_files(target):
+    """Lazily yield ``(path, stat)`` of regular files at or below ``target``.
+
+    Symlinks are not followed, so a scan cannot loop or leave the tree.
+    """
+    try:
+        root = os.stat(target)
+    except OSError:
+        return
+    if stat.S_ISREG(root.st_mode):
+        yield target, root
+        return
+    stack = [target]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield entry.path, entry.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+
+
+def file_signature(file_stat):
+    return (file_stat.st_size, file_stat.st_mtime_ns, file_stat.st_ino)
+
+
+# Pool worker state: each worker process loads the compiled rules once and
+# keeps its own result cache connection
+_worker_rulesets = None
+_worker_results = None
+
+
+def _init_worker():
+    # The portal's shutdown handler must only run in the portal itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Long scans should not slow down the dashboard
+    os.nice(10)
+
+
+def _scan_batch(cache_dir, results_path, rule_path, paths, timeout):
+    """Scan a batch of files in a pool worker.
+
+    Returns ``(path, signature, matches, cached, error)`` per file; the
+    signature is taken before scanning so a file changed meanwhile is
+    scanned again next time.
+    """
+    global _worker_rulesets, _worker_results
+    if _worker_rulesets is None:
+        _worker_rulesets = YaraRulesetCache(cache_dir)
+        _worker_results = ScanResultCache(results_path)
+    try:
+        rules, ruleset, _ = _worker_rulesets.get(rule_path)
+    except Exception as e:
+        return [(path, None, [], False, f"Rule compilation failed: {e}") for path in paths]
+
+    results = []
+    for path in paths:
+        try:
+            signature = file_signature(os.stat(path))
+            matches, cached = scan_file(rules, path, timeout, _worker_results, ruleset)
+            results.append((path, signature, matches, cached, None))
+        except Exception as e:
+            results.append((path, None, [], False, str(e)))
+    return results
+
+
+class ScanLedger:
+    """Files scanned with one ruleset version and their matches.
+
+    Appended to a JSON-lines file as results arrive and read back when a job
+    with the same ruleset starts, so files whose size, mtime and inode are
+    unchanged are not scanned again, whether after a restart or in a later job.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        lines = 0
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Torn last line of an interrupted run
+                        continue
+                    self.entries[record["path"]] = (tuple(record["signature"]), record["matches"])
+                    lines += 1
+        if lines > 2 * len(self.entries) + 1000:
+            self._compact()
+        self._file = open(path, 'a')
+
+    def _compact(self):
+        temp = f"{self.path}.tmp"
+        with open(temp, 'w') as f:
+            for path, (signature, matches) in self.entries.items():
+                f.write(json.dumps({"path": path, "signature": signature, "matches": matches}) + '\n')
+        os.replace(temp, self.path)
+
+    def lookup(self, path, signature):
+        """Recorded matches of an unchanged file, else None"""
+        entry = self.entries.get(path)
+        if entry and entry[0] == signature:
+            return entry[1]
+        return None
+
+    def record(self, path, signature, matches):
+        with self._lock:
+            self.entries[path] = (tuple(signature), matches)
+            self._file.write(json.dumps(
+                {"path": path, "signature": signature, "matches": matches}) + '\n')
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class ScanJobManager:
+    """Runs YARA scan jobs on a shared process pool.
+
+    Every job has a coordinator thread that walks the target lazily, skips
+    files recorded unchanged in the ruleset's ledger and submits the rest in
+    batches of up to ``batch_files`` files or ``batch_bytes`` bytes to a pool
+    of ``workers`` processes, keeping at most two batches per worker in
+    flight. A second thread sizes the tree so progress can give an ETA.
+
+    Job state is checkpointed to ``jobs_dir/<id>.json`` and matches are
+    appended to ``jobs_dir/<id>.matches.jsonl``. Jobs still active when the
+    portal stopped are restarted by ``resume()``; files scanned before the
+    interruption come from the ledger.
+    """
+
+    def __init__(self, jobs_dir, cache_dir, results_path, workers=None, timeout=60, retained=50,
+                 batch_files=32, batch_bytes=64 * 1024 * 1024):
+        self.jobs_dir = jobs_dir
+        self.cache_dir = cache_dir
+        self.results_path = results_path
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.retained = retained
+        self.batch_files = batch_files
+        self.batch_bytes = batch_bytes
+        self.jobs = {}
+        self._cancel = {}
+        self._ledgers = {}
+        self._pool = None
+        self._closing = False
+        self._lock = threading.Lock()
+        self._changed = threading.Condition()
+        self._rulesets = None
+        self._results = None
+        if yara_engine.yara is not None:
+            self._rulesets = YaraRulesetCache(cache_dir)
+            self._results = ScanResultCache(results_path)
+        os.makedirs(os.path.join(jobs_dir, 'ledgers'), exist_ok=True)
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Persistence
+
+    def _job_path(self, job_id, suffix='.json'):
+        return os.path.join(self.jobs_dir, job_id + suffix)
+
+    def _load(self):
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.jobs_dir, name), 'r') as f:
+                    job = json.load(f)
+                self.jobs[job["id"]] = job
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping unreadable scan job {name}: {e}")
+
+    def _save(self, job):
+        path = self._job_path(job["id"])
+        temp = f"{path}.tmp"
+        with open(temp, 'w') as f:
+            json.dump(job, f)
+        os.replace(temp, path)
+
+    def _prune(self):
+        """Delete the oldest finished jobs beyond ``retained``"""
+        finished = sorted((job for job in self.jobs.values() if job["status"] not in ACTIVE_STATES),
+                          key=lambda job: job["created"])
+        for job in finished[:max(0, len(finished) - self.retained)]:
+            del self.jobs[job["id"]]
+            for suffix in ('.json', '.matches.jsonl'):
+                try:
+                    os.remove(self._job_path(job["id"], suffix))
+                except OSError:
+                    pass
+
+    def _ledger(self, rule_path, fingerprint):
+        """Open ledger of a ruleset version; older versions' ledgers are deleted"""
+        with self._lock:
+            ledger = self._ledgers.get(fingerprint)
+            if ledger is None:
+                ledger_dir = os.path.join(self.jobs_dir, 'ledgers')
+                prefix = hashlib.sha1(rule_path.encode()).hexdigest()[:16] + '-'
+                name = prefix + fingerprint[:16] + '.jsonl'
+                for old in os.listdir(ledger_dir):
+                    if old.startswith(prefix) and old != name:
+                        os.remove(os.path.join(ledger_dir, old))
+                ledger = ScanLedger(os.path.join(ledger_dir, name))
+                self._ledgers[fingerprint] = ledger
+            return ledger
+
+    def _release_ledger(self, fingerprint):
+        with self._lock:
+            if any(job.get("fingerprint") == fingerprint and job["status"] in ACTIVE_STATES
+                   for job in self.jobs.values()):
+                return
+            ledger = self._ledgers.pop(fingerprint, None)
+        if ledger:
+            ledger.close()
+
+    # ------------------------------------------------------------------
+    # Job control
+
+    def submit(self, target, rule_path, rule_name):
+        """Create and start a scan job; raises yara.Error if the rules do not compile"""
+        if self._rulesets is None:
+            raise RuntimeError("yara-python is required for scan jobs")
+        # Compile (and save the blob for the pool workers) before accepting the job
+        self._prepare_rules(rule_path)
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "target": target,
+            "rule": rule_name,
+            "rule_path": rule_path,
+            "status": "queued",
+            "created": datetime.now().isoformat(),
+            "resumed": 0
+        }
+        with self._lock:
+            self.jobs[job["id"]] = job
+            self._prune()
+        self._start(job)
+        return self.status(job["id"])
+
+    def resume(self):
+        """Restart the jobs that were active when the portal stopped"""
+        if self._rulesets is None:
+            return 0
+        interrupted = [job for job in self.jobs.values() if job["status"] in ACTIVE_STATES]
+        for job in interrupted:
+            job["resumed"] = job.get("resumed", 0) + 1
+            logger.info(f"Resuming YARA scan job {job['id']} of {job['target']}")
+            self._start(job)
+        return len(interrupted)
+
+    def cancel(self, job_id):
+        """Stop an active job; returns False for unknown or finished jobs"""
+        cancel = self._cancel.get(job_id)
+        if cancel is None or job_id not in self.jobs or \
+                self.jobs[job_id]["status"] not in ACTIVE_STATES:
+            return False
+        cancel.set()
+        return True
+
+    def close(self):
+        """Stop all jobs without finishing them, so ``resume()`` restarts them"""
+        self._closing = True
+        for cancel in list(self._cancel.values()):
+            cancel.set()
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        for ledger in list(self._ledgers.values()):
+            ledger.close()
+
+    def _start(self, job):
+        # A (re)started job begins from an empty match file and counters;
+        # files already scanned are skipped through the ledger
+        job.update({
+            "status": "queued",
+            "started": None,
+            "finished": None,
+            "error": None,
+            "files_scanned": 0,
+            "files_cached": 0,
+            "files_skipped": 0,
+            "files_failed": 0,
+            "bytes_scanned": 0,
+            "bytes_skipped": 0,
+            "matches": 0,
+            "files_total": None,
+            "bytes_total": None,
+            "files_seen": 0,
+            "bytes_seen": 0
+        })
+        open(self._job_path(job["id"], '.matches.jsonl'), 'w').close()
+        self._save(job)
+        self._cancel[job["id"]] = threading.Event()
+        threading.Thread(target=self._run, args=(job,), name=f"yara-job-{job['id']}",
+                         daemon=True).start()
+
+    def _prepare_rules(self, rule_path):
+        """Compile a rule file; returns its ruleset version"""
+        _, ruleset, source = self._rulesets.get(rule_path)
+        if source == 'compiled':
+            self._results.set_ruleset(os.path.realpath(rule_path), ruleset)
+        return ruleset
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Workers are forked from the single-threaded fork server, not
+                # from the portal, whose other threads may hold locks (logging,
+                # SQLite, malloc) that a forked child could never release
+                context = multiprocessing.get_context('forkserver')
+                context.set_forkserver_preload(['__main__', __name__])
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, initializer=_init_worker,
+                    mp_context=context)
+            return self._pool
+
+    def _size(self, job, cancel):
+        """Count the files and bytes of the target for the ETA"""
+        files = size = 0
+        for _, file_stat in walk_files(job["target"]):
+            if cancel.is_set():
+                return
+            files += 1
+            size += file_stat.st_size
+            if files % 1000 == 0:
+                job["files_seen"], job["bytes_seen"] = files, size
+        job["files_seen"], job["bytes_seen"] = files, size
+        job["files_total"], job["bytes_total"] = files, size
+
+    def _run(self, job):
+        cancel = self._cancel[job["id"]]
+        fingerprint = None
+        outcome = None
+        matches_file = open(self._job_path(job["id"], '.matches.jsonl'), 'a')
+        try:
+            job["status"] = "running"
+            job["started"] = datetime.now().isoformat()
+            job["_started"] = time.time()
+            fingerprint = self._prepare_rules(job["rule_path"])
+            job["fingerprint"] = fingerprint
+            ledger = self._ledger(job["rule_path"], fingerprint)
+            self._save(job)
+            threading.Thread(target=self._size, args=(job, cancel), daemon=True).start()
+
+            pool = self._get_pool()
+            pending = set()
+            batch = []
+            batch_bytes = 0
+            checkpoint = time.monotonic()
+
+            def emit(matches):
+                for match in matches:
+                    matches_file.write(json.dumps(match) + '\n')
+                job["matches"] += len(matches)
+
+            def collect(done):
+                for future in done:
+                    for path, signature, matches, cached, error in future.result():
+                        if error:
+                            job["files_failed"] += 1
+                            emit([{"file": path, "error": error}])
+                            continue
+                        job["files_scanned"] += 1
+                        job["files_cached"] += cached
+                        job["bytes_scanned"] += signature[0]
+                        ledger.record(path, signature, matches)
+                        emit(matches)
+                matches_file.flush()
+                ledger.flush()
+                with self._changed:
+                    self._changed.notify_all()
+
+            def submit(paths):
+                nonlocal pending
+                pending.add(pool.submit(_scan_batch, self.cache_dir, self.results_path,
+                                        job["rule_path"], paths, self.timeout))
+                # Bounded read-ahead: enumeration waits for the pool
+                while len(pending) >= 2 * self.workers and not cancel.is_set():
+                    done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                    collect(done)
+
+            for path, file_stat in walk_files(job["target"]):
+                if cancel.is_set():
+                    break
+                recorded = ledger.lookup(path, file_signature(file_stat))
+                if recorded is not None:
+                    job["files_skipped"] += 1
+                    job["bytes_skipped"] += file_stat.st_size
+                    emit(recorded)
+                else:
+                    batch.append(path)
+                    batch_bytes += file_stat.st_size
+                    if len(batch) >= self.batch_files or batch_bytes >= self.batch_bytes:
+                        submit(batch)
+                        batch, batch_bytes = [], 0
+                if time.monotonic() - checkpoint >= CHECKPOINT_INTERVAL:
+                    checkpoint = time.monotonic()
+                    matches_file.flush()
+                    self._save(job)
+            if batch and not cancel.is_set():
+                submit(batch)
+            while pending and not cancel.is_set():
+                done, pending = wait(pending, timeout=1, return_when=FIRST_COMPLETED)
+                collect(done)
+            # Batches a cancelled job no longer needs do not hold up other jobs
+            for future in pending:
+                future.cancel()
+
+            if self._closing:
+                # Interrupted by shutdown: stays active and is resumed
+                return
+            outcome = "cancelled" if cancel.is_set() else "completed"
+        except BrokenProcessPool as e:
+            with self._lock:
+                self._pool = None
+            outcome = "failed"
+            job["error"] = f"Scan worker died: {e}"
+        except Exception as e:
+            if self._closing:
+                return
+            logger.error(f"YARA scan job {job['id']} failed: {e}")
+            outcome = "failed"
+            job["error"] = str(e)
+        finally:
+            # Every match is on disk before a stream can see the job finish
+            matches_file.close()
+            if outcome:
+                job["status"] = outcome
+                job["finished"] = datetime.now().isoformat()
+            self._save(job)
+            if fingerprint and not self._closing:
+                self._release_ledger(fingerprint)
+            with self._changed:
+                self._changed.notify_all()
+            if job["status"] not in ACTIVE_STATES:
+                logger.info(f"YARA scan job {job['id']} {job['status']}: "
+                            f"{job['files_scanned']} scanned, {job['files_skipped']} skipped, "
+                            f"{job['matches']} matches")
+
+    # ------------------------------------------------------------------
+    # Queries
+
+    def status(self, job_id):
+        """Job state with files/s, bytes/s and ETA, or None if unknown"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        status = {key: value for key, value in job.items() if not key.startswith('_')}
+        status.pop("fingerprint", None)
+        files_done = job.get("files_scanned", 0) + job.get("files_skipped", 0) + \
+            job.get("files_failed", 0)
+        bytes_done = job.get("bytes_scanned", 0) + job.get("bytes_skipped", 0)
+        status["files_done"] = files_done
+        status["bytes_done"] = bytes_done
+        status["files_per_sec"] = status["bytes_per_sec"] = status["eta_seconds"] = None
+        status["progress"] = None
+        if job["status"] == "completed":
+            status["progress"] = 100.0
+        if job["status"] == "running" and job.get("_started"):
+            elapsed = time.time() - job["_started"]
+            if elapsed > 0:
+                status["files_per_sec"] = round(files_done / elapsed, 1)
+                status["bytes_per_sec"] = round(bytes_done / elapsed, 1)
+            if job.get("bytes_total"):
+                status["progress"] = round(min(100.0, 100.0 * bytes_done / job["bytes_total"]), 1)
+                if status["bytes_per_sec"]:
+                    status["eta_seconds"] = round(
+                        max(0, job["bytes_total"] - bytes_done) / status["bytes_per_sec"], 1)
+        return status
+
+    def list_jobs(self):
+        """Status of every retained job, newest first"""
+        jobs = sorted(self.jobs.values(), key=lambda job: job["created"], reverse=True)
+        return [self.status(job["id"]) for job in jobs]
+
+    def stream(self, job_id, offset=0, follow=True):
+        """Yield the job's matches from index ``offset``, then its final status.
+
+        With ``follow`` the stream waits for new matches until the job
+        finishes, yielding a progress event every few seconds.
+        """
+        path = self._job_path(job_id, '.matches.jsonl')
+        if job_id not in self.jobs or not os.path.exists(path):
+            return
+        index = 0
+        finished = False
+        last_progress = time.monotonic()
+        with open(path, 'r') as f:
+            while True:
+                position = f.tell()
+                line = f.readline()
+                if line.endswith('\n'):
+                    if index >= offset:
+                        yield {"event": "match", "index": index, **json.loads(line)}
+                    index += 1
+                    continue
+                # End of what has been written (or a partly written line)
+                f.seek(position)
+                if finished:
+                    break
+                job = self.jobs.get(job_id)
+                if not follow or job is None or job["status"] not in ACTIVE_STATES:
+                    # Matches written just before the status changed are read
+                    # in one more pass
+                    finished = True
+                    continue
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = time.monotonic()
+                    yield {"event": "progress", **self.status(job_id)}
+                with self._changed:
+                    self._changed.wait(timeout=PROGRESS_INTERVAL)
+        yield {"event": "status", **(self.status(job_id) or {})}
@@ -0,0 +1,11 @@
+"""
+Shared setup for the portal unit tests
+
+The portal modules are flat siblings run from ``portal/``, so that
+directory is put on the import path the same way the portal runs them.
+"""
+import os
+import sys
+
+PORTAL_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'portal')
+sys.path.insert(0, os.path.abspath(PORTAL_DIR))
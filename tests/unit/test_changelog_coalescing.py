@@ -0,0 +1,119 @@
+"""
+Changelog Coalescing Tests
+
+Folding of repeated high-frequency entries and sampling of selected actions
+in the portal's ChangelogManager, with the coalesced entry written back to
+storage under its original id.
+"""
+import importlib
+import os
+import time
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def portal_app(tmp_path_factory):
+    """Import the portal app with its data directories under a temp dir"""
+    workdir = tmp_path_factory.mktemp("portal")
+    cwd = os.getcwd()
+    environ = dict(os.environ)
+    os.chdir(workdir)
+    os.environ["DOCKER_SOCKET"] = str(workdir / "docker.sock")
+    try:
+        app = importlib.import_module("app")
+    finally:
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+    yield app
+    app.changelog_manager.close()
+
+
+@pytest.fixture
+def make_manager(portal_app, tmp_path, monkeypatch):
+    monkeypatch.setattr(portal_app, "CHANGELOG_DIR", str(tmp_path / "changelog"))
+    monkeypatch.setattr(portal_app, "CHANGELOG_COALESCE_ACTIONS", ["api_call"])
+    monkeypatch.setattr(portal_app, "CHANGELOG_COALESCE_WINDOW", 60)
+    monkeypatch.setattr(portal_app, "CHANGELOG_SAMPLE_RATES", {})
+    managers = []
+
+    def make_manager():
+        manager = portal_app.ChangelogManager(str(tmp_path / "changelog.json"),
+                                              backend="journal")
+        managers.append(manager)
+        return manager
+
+    yield make_manager
+    for manager in managers:
+        manager.close()
+
+
+def test_repeats_are_folded_into_the_first_entry(make_manager):
+    manager = make_manager()
+    first = manager.add_entry("api_call", "GET /api/containers")
+    for _ in range(4):
+        repeat = manager.add_entry("api_call", "GET /api/containers")
+    other = manager.add_entry("api_call", "GET /api/tools")
+
+    assert repeat is first
+    assert first["count"] == 5
+    assert first["first_timestamp"] == first["timestamp"] <= first["last_timestamp"]
+    assert other["id"] == first["id"] + 1 and "count" not in other
+    assert [entry["id"] for entry in manager.get_entries()] == [first["id"], other["id"]]
+    stats = manager.get_stats()
+    assert stats["total_entries"] == 2
+    assert stats["suppressed_by_action"] == {"api_call": 4}
+
+
+def test_coalesced_count_is_stored_under_the_same_id(make_manager):
+    manager = make_manager()
+    for _ in range(3):
+        entry = manager.add_entry("api_call", "GET /api/containers")
+    manager.add_entry("container_start", "wazuh")
+    manager.close()
+
+    reopened = make_manager()
+    entries = reopened.get_entries()
+    assert [(e["id"], e.get("count")) for e in entries] == [(entry["id"], 3), (entry["id"] + 1, None)]
+    assert reopened.get_stats()["total_entries"] == 2
+
+
+def test_window_expiry_starts_a_new_entry(make_manager, portal_app, monkeypatch):
+    monkeypatch.setattr(portal_app, "CHANGELOG_COALESCE_WINDOW", 0.2)
+    manager = make_manager()
+    first = manager.add_entry("api_call", "GET /api/containers")
+    manager.add_entry("api_call", "GET /api/containers")
+    time.sleep(0.3)
+    later = manager.add_entry("api_call", "GET /api/containers")
+
+    assert first["count"] == 2
+    assert later["id"] == first["id"] + 1
+
+
+def test_counts_reach_storage_when_the_window_closes_without_new_entries(
+        make_manager, portal_app, monkeypatch):
+    monkeypatch.setattr(portal_app, "CHANGELOG_COALESCE_WINDOW", 0.3)
+    manager = make_manager()
+    for _ in range(3):
+        entry = manager.add_entry("api_call", "GET /api/containers")
+
+    deadline = time.monotonic() + 5
+    while True:
+        stored = {e["id"]: e for e in manager.storage.read_hot()}.get(entry["id"], {})
+        if stored.get("count") == 3 or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert stored.get("count") == 3
+    assert stored["last_timestamp"] == entry["last_timestamp"]
+
+
+def test_sampled_actions_keep_one_in_n(make_manager, portal_app, monkeypatch):
+    monkeypatch.setattr(portal_app, "CHANGELOG_SAMPLE_RATES", {"metrics_poll": 0.25})
+    manager = make_manager()
+    results = [manager.add_entry("metrics_poll", f"poll {i}") for i in range(8)]
+
+    kept = [entry for entry in results if not entry.get("sampled")]
+    assert [entry["details"] for entry in kept] == ["poll 0", "poll 4"]
+    assert manager.get_stats()["total_entries"] == 2
+    assert manager.get_stats()["suppressed_by_action"] == {"metrics_poll": 6}
@@ -0,0 +1,128 @@
+"""
+Changelog Compaction Tests
+
+Hot/archive tiering and retention of the journal and SQLite storage engines.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from changelog_store import ARCHIVE_DIR, ChangelogJournal, SQLiteChangelogStore
+
+START = datetime(2026, 1, 1)
+# One entry per hour, so 100 entries span a little over four days
+NOW = START + timedelta(hours=100)
+
+
+def make_entry(entry_id):
+    return {"id": entry_id, "timestamp": (START + timedelta(hours=entry_id)).isoformat(),
+            "action": "scan" if entry_id % 2 else "login", "details": f"entry {entry_id}",
+            "user": "system", "level": "error" if entry_id % 10 == 0 else "info"}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    # Small segments: 9 entries each
+    journal = ChangelogJournal(str(tmp_path), segment_max_bytes=1024)
+    journal.append_batch([make_entry(i) for i in range(1, 101)])
+    yield journal
+    journal.close()
+
+
+@pytest.fixture
+def sqlite_store(tmp_path):
+    store = SQLiteChangelogStore(str(tmp_path / "changelog.db"))
+    store.append_batch([make_entry(i) for i in range(1, 101)])
+    yield store
+    store.close()
+
+
+def ids(entries):
+    return [entry["id"] for entry in entries]
+
+
+def test_journal_archives_segments_outside_the_hot_window(journal, tmp_path):
+    archived, expired = journal.compact(hot_days=1, retention_days=0, now=NOW)
+
+    assert expired == []
+    # The segment holding hour 76 (a day before NOW) and everything after stay hot
+    assert [(s["first_id"], s["last_id"]) for s in archived][-1] == (64, 72)
+    assert journal.hot_first_id == 73
+    assert ids(journal.read_hot()) == list(range(73, 101))
+    assert sorted(os.listdir(tmp_path / ARCHIVE_DIR)) == sorted(
+        os.path.basename(segment["name"]) for segment in archived)
+
+    counts = journal.archived_counts()
+    assert counts["total"] == 72
+    assert counts["levels"] == {"info": 65, "error": 7}
+    assert counts["actions"] == {"scan": 36, "login": 36}
+
+
+def test_journal_archive_is_queryable(journal):
+    journal.compact(hot_days=1, retention_days=0, now=NOW)
+
+    assert ids(journal.query_archive({"level": "error"})) == [10, 20, 30, 40, 50, 60, 70]
+    assert ids(journal.query_archive({}, limit=3, before=20)) == [17, 18, 19]
+    assert ids(journal.query_archive({}, text="entry 5", until=make_entry(52)["timestamp"])) == \
+        [5, 50, 51, 52]
+
+
+def test_journal_hot_entry_limit_archives_older_segments(journal):
+    archived, _ = journal.compact(hot_days=30, hot_entries=20, retention_days=0, now=NOW)
+
+    # The active segment plus the two sealed segments that fit within 20 entries
+    assert journal.hot_first_id == 82
+    assert archived[-1]["last_id"] == 81
+
+
+def test_journal_retention_expires_archived_segments(journal, tmp_path):
+    journal.compact(hot_days=1, retention_days=0, now=NOW)
+    archived, expired = journal.compact(hot_days=1, retention_days=3, now=NOW)
+
+    assert archived == []
+    assert [(s["first_id"], s["last_id"]) for s in expired] == [(1, 9), (10, 18), (19, 27)]
+    assert len(os.listdir(tmp_path / ARCHIVE_DIR)) == 5
+    assert journal.archived_counts()["total"] == 45
+    assert ids(journal.query_archive({}, limit=1, since=START.isoformat())) == [72]
+    assert min(ids(journal.query_archive({}))) == 28
+
+
+def test_journal_tiers_survive_reopening(journal, tmp_path):
+    journal.compact(hot_days=1, retention_days=3, now=NOW)
+    journal.close()
+
+    reopened = ChangelogJournal(str(tmp_path), segment_max_bytes=1024)
+    try:
+        assert reopened.hot_first_id == 73
+        assert reopened.archived_counts()["total"] == 45
+        assert ids(reopened.read_hot()) == list(range(73, 101))
+        reopened.append(make_entry(101))
+        assert reopened.last_id == 101
+    finally:
+        reopened.close()
+
+
+def test_sqlite_compaction_moves_the_hot_window(sqlite_store):
+    archived, expired = sqlite_store.compact(hot_days=1, retention_days=0, now=NOW)
+
+    assert expired == []
+    assert sqlite_store.hot_first_id == 76
+    assert ids(sqlite_store.read_hot()) == list(range(76, 101))
+    assert sqlite_store.archived_counts()["total"] == 75
+    assert ids(sqlite_store.query_archive({"level": "error"}, before=76)) == \
+        [10, 20, 30, 40, 50, 60, 70]
+
+    archived, _ = sqlite_store.compact(hot_days=1, hot_entries=10, retention_days=0, now=NOW)
+    assert archived == [{"first_id": 76, "last_id": 90}]
+    assert sqlite_store.hot_first_id == 91
+
+
+def test_sqlite_retention_deletes_old_rows(sqlite_store):
+    _, expired = sqlite_store.compact(hot_days=1, retention_days=3, now=NOW)
+
+    # Entries before hour 28 are more than three days older than NOW
+    assert expired == [{"count": 27, "levels": {"info": 25, "error": 2},
+                        "actions": {"scan": 14, "login": 13}}]
+    assert min(ids(sqlite_store.query_archive({}))) == 28
+    assert sqlite_store.archived_counts()["total"] == 48
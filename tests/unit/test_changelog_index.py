@@ -0,0 +1,90 @@
+"""
+Changelog Index Tests
+
+Filtered queries and cursor pagination over the in-memory changelog index,
+checked against a plain scan of the entries.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from changelog_store import ChangelogIndex, entry_matches
+
+START = datetime(2026, 1, 1)
+LEVELS = ("info", "info", "warning", "error")
+ACTIONS = ("api_call", "container_start", "container_stop")
+
+
+def make_entry(entry_id):
+    # About three entries per hour, so time ranges cut across buckets
+    return {"id": entry_id,
+            "timestamp": (START + timedelta(minutes=entry_id * 20)).isoformat(),
+            "action": ACTIONS[entry_id % 3], "details": f"entry {entry_id}",
+            "user": "admin" if entry_id % 5 == 0 else "system",
+            "level": LEVELS[entry_id % 4]}
+
+
+@pytest.fixture
+def entries():
+    return {entry_id: make_entry(entry_id) for entry_id in range(1, 301)}
+
+
+@pytest.fixture
+def index(entries):
+    index = ChangelogIndex()
+    index.rebuild(entries.values())
+    return index
+
+
+def scan(entries, since=None, until=None, text=None, **filters):
+    return [entry for entry in entries.values()
+            if entry_matches(entry, filters, since, until, text.lower() if text else None)]
+
+
+def paginate(index, entries, limit, **query):
+    pages = []
+    before = None
+    while True:
+        page, before = index.query(entries.get, limit=limit, before=before, **query)
+        pages.append(page)
+        if before is None:
+            return pages
+
+
+QUERIES = [
+    {},
+    {"level": "error"},
+    {"level": "info", "action": "api_call"},
+    {"user": "admin", "action": "container_stop"},
+    {"since": "2026-01-02T03:30:00", "until": "2026-01-03T10:10:00"},
+    {"since": "2026-01-02T03:30:00", "level": "warning", "text": "ENTRY 1"},
+    {"action": "unknown"},
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_query_matches_a_full_scan(index, entries, query):
+    matches, cursor = index.query(entries.get, **query)
+    assert matches == scan(entries, **query)
+    assert cursor is None
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_cursor_pages_cover_every_match_once(index, entries, query):
+    pages = paginate(index, entries, 7, **query)
+    assert all(len(page) <= 7 for page in pages)
+    flattened = [entry for page in reversed(pages) for entry in page]
+    assert flattened == scan(entries, **query)
+
+
+def test_page_is_the_newest_matches_before_the_cursor(index, entries):
+    page, cursor = index.query(entries.get, limit=3, before=100, level="error")
+    assert [entry["id"] for entry in page] == [91, 95, 99]
+    assert cursor == 91
+
+    page, cursor = index.query(entries.get, limit=3, before=cursor, level="error")
+    assert [entry["id"] for entry in page] == [79, 83, 87]
+
+
+def test_time_range_past_the_last_entry_is_empty(index, entries):
+    assert index.query(entries.get, since="2027-01-01T00:00:00") == ([], None)
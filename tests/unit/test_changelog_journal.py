@@ -0,0 +1,109 @@
+"""
+Changelog Journal Tests
+
+Appending, segment rotation and index recovery of the append-only
+JSON-lines changelog journal.
+"""
+import json
+import os
+
+from changelog_store import ChangelogJournal, INDEX_FILE
+
+
+def make_entry(entry_id, level="info", action="test", timestamp=None):
+    return {"id": entry_id,
+            "timestamp": timestamp or f"2026-01-01T00:{entry_id // 60 % 60:02d}:{entry_id % 60:02d}",
+            "action": action, "details": f"entry {entry_id}", "user": "system",
+            "level": level}
+
+
+def test_entries_survive_reopening(tmp_path):
+    journal = ChangelogJournal(str(tmp_path))
+    for i in range(1, 11):
+        journal.append(make_entry(i))
+    journal.close()
+
+    journal = ChangelogJournal(str(tmp_path))
+    try:
+        assert journal.last_id == 10
+        assert [entry["id"] for entry in journal.read_hot()] == list(range(1, 11))
+        assert journal.total_entries == 10
+    finally:
+        journal.close()
+
+
+def test_segments_rotate_and_are_indexed(tmp_path):
+    journal = ChangelogJournal(str(tmp_path), segment_max_bytes=1024)
+    try:
+        journal.append_batch([make_entry(i, level="error" if i % 5 == 0 else "info")
+                              for i in range(1, 101)])
+        segments = journal.index["segments"]
+        assert len(segments) > 1
+        assert sum(segment["count"] for segment in segments) == 100
+        # Segments cover consecutive id ranges
+        for before, after in zip(segments, segments[1:]):
+            assert after["first_id"] == before["last_id"] + 1
+        levels = {}
+        for segment in segments:
+            for level, count in segment["levels"].items():
+                levels[level] = levels.get(level, 0) + count
+        assert levels == {"info": 80, "error": 20}
+    finally:
+        journal.close()
+
+
+def test_missing_index_is_rebuilt_from_segments(tmp_path):
+    journal = ChangelogJournal(str(tmp_path), segment_max_bytes=1024)
+    journal.append_batch([make_entry(i) for i in range(1, 51)])
+    journal.append(dict(make_entry(3), count=4), update=True)
+    journal.close()
+    expected = [(s["first_id"], s["last_id"], s["count"]) for s in journal.index["segments"]]
+    os.remove(tmp_path / INDEX_FILE)
+
+    journal = ChangelogJournal(str(tmp_path), segment_max_bytes=1024)
+    try:
+        assert [(s["first_id"], s["last_id"], s["count"])
+                for s in journal.index["segments"]] == expected
+        assert journal.total_entries == 50
+    finally:
+        journal.close()
+
+
+def test_torn_last_line_is_dropped(tmp_path):
+    journal = ChangelogJournal(str(tmp_path))
+    journal.append_batch([make_entry(1), make_entry(2)])
+    segment = journal.index["segments"][-1]["name"]
+    journal.close()
+    with open(tmp_path / segment, "a") as f:
+        f.write(json.dumps(make_entry(3))[:20])
+
+    journal = ChangelogJournal(str(tmp_path))
+    assert [entry["id"] for entry in journal.read_hot()] == [1, 2]
+    assert journal.last_id == 2
+    # The next entry starts on its own line instead of extending the torn one
+    journal.append(make_entry(3))
+    journal.close()
+
+    journal = ChangelogJournal(str(tmp_path))
+    try:
+        assert [entry["id"] for entry in journal.read_hot()] == [1, 2, 3]
+        assert journal.index["segments"][-1]["bytes"] == os.path.getsize(tmp_path / segment)
+    finally:
+        journal.close()
+
+
+def test_legacy_changelog_is_imported_once(tmp_path):
+    legacy = tmp_path / "changelog.json"
+    legacy.write_text(json.dumps({
+        "entries": [make_entry(1), make_entry(2)],
+        "metadata": {"created": "2025-12-31T00:00:00"}
+    }))
+    journal = ChangelogJournal(str(tmp_path / "journal"))
+    try:
+        assert journal.import_legacy(str(legacy)) == 2
+        assert journal.created == "2025-12-31T00:00:00"
+        assert journal.last_id == 2
+        assert not legacy.exists()
+        assert (tmp_path / "changelog.json.migrated").exists()
+    finally:
+        journal.close()
@@ -0,0 +1,52 @@
+"""
+SQLite Changelog Store Tests
+
+Filtering and free-text search of the SQLite changelog backend.
+"""
+import pytest
+
+from changelog_store import SQLiteChangelogStore
+
+
+def make_entry(entry_id, action="test", details="", level="info"):
+    return {"id": entry_id, "timestamp": f"2026-01-01T00:00:{entry_id:02d}",
+            "action": action, "details": details, "user": "system", "level": level}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteChangelogStore(str(tmp_path / "changelog.db"))
+    store.append_batch([
+        make_entry(1, details="disk at 100% usage"),
+        make_entry(2, details="disk at 100 usage"),
+        make_entry(3, action="user_login", details="admin"),
+        make_entry(4, action="userXlogin", details="admin"),
+        make_entry(5, details="path C:\\temp"),
+        make_entry(6, details="path C:temp", level="error")
+    ])
+    yield store
+    store.close()
+
+
+def ids(entries):
+    return [entry["id"] for entry in entries]
+
+
+def test_text_search_matches_wildcards_literally(store):
+    assert ids(store.query_archive({}, text="100%")) == [1]
+    assert ids(store.query_archive({}, text="user_login")) == [3]
+    assert ids(store.query_archive({}, text="c:\\temp")) == [5]
+
+
+def test_keyword_search_matches_wildcards_literally(store):
+    assert ids(store.query_archive({}, keywords=["100%", "user_"])) == [1, 3]
+
+
+def test_equality_filters(store):
+    assert ids(store.query_archive({"level": "error"})) == [6]
+    assert ids(store.query_archive({"action": "user_login", "user": "system"})) == [3]
+
+
+def test_unknown_filter_column_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.query_archive({"1=1 OR level": "info"})
@@ -0,0 +1,79 @@
+"""
+Changelog Stats Tests
+
+Running counters and the per-minute recent activity ring.
+"""
+from collections import Counter
+from datetime import datetime, timedelta
+
+from changelog_store import ChangelogStats
+
+START = datetime(2026, 1, 1, 12, 0)
+
+
+def make_entry(entry_id, when, level="info", action="api_call"):
+    return {"id": entry_id, "timestamp": when.isoformat(), "action": action,
+            "details": "", "user": "system", "level": level}
+
+
+def test_recent_activity_expires_with_the_window():
+    stats = ChangelogStats(window_minutes=10)
+    for i in range(5):
+        stats.add(make_entry(i, START))
+    for i in range(5, 8):
+        stats.add(make_entry(i, START + timedelta(minutes=5, seconds=30)))
+
+    assert stats.recent_activity(START + timedelta(minutes=9, seconds=59)) == 8
+    assert stats.recent_activity(START + timedelta(minutes=10)) == 3
+    assert stats.recent_activity(START + timedelta(hours=2)) == 0
+    assert stats.total == 8
+
+
+def test_ring_slots_are_reused_after_wrapping():
+    stats = ChangelogStats(window_minutes=10)
+    stats.add(make_entry(1, START))
+    # Same slot, one full window later
+    stats.add(make_entry(2, START + timedelta(minutes=10)))
+    stats.add(make_entry(3, START + timedelta(minutes=10)))
+    assert stats.recent_activity(START + timedelta(minutes=10)) == 2
+
+
+def test_entries_older_than_the_window_only_count_in_totals():
+    stats = ChangelogStats(window_minutes=10)
+    stats.add(make_entry(1, START + timedelta(minutes=30)))
+    stats.add(make_entry(2, START, level="error"))
+    assert stats.recent_activity(START + timedelta(minutes=30)) == 1
+    assert stats.by_level == {"info": 1, "error": 1}
+
+
+def test_rebuild_matches_incremental_counts():
+    now = datetime.now()
+    # One entry every hour and a half, offset from the window edge by half an hour
+    entries = [make_entry(i, now - timedelta(minutes=90 * (47 - i) + 30),
+                          level="error" if i % 3 == 0 else "info",
+                          action="scan" if i % 2 else "login")
+               for i in range(48)]
+    incremental = ChangelogStats()
+    for entry in entries:
+        incremental.add(entry)
+
+    rebuilt = ChangelogStats()
+    rebuilt.rebuild(entries, archived={"total": 10, "levels": {"info": 10},
+                                       "actions": {"scan": 10}})
+
+    assert rebuilt.recent_activity() == incremental.recent_activity() == 16
+    assert rebuilt.total == incremental.total + 10
+    assert rebuilt.by_level == incremental.by_level + Counter(info=10)
+    assert rebuilt.by_action == incremental.by_action + Counter(scan=10)
+
+
+def test_discard_drops_emptied_counters():
+    stats = ChangelogStats()
+    stats.add(make_entry(1, START, level="error", action="scan"))
+    stats.add(make_entry(2, START, level="info", action="login"))
+    stats.discard(1, {"error": 1}, {"scan": 1})
+
+    snapshot = stats.snapshot()
+    assert snapshot["total_entries"] == 1
+    assert snapshot["by_level"] == {"info": 1}
+    assert snapshot["by_action"] == {"login": 1}
@@ -0,0 +1,143 @@
+"""
+Changelog Writer Tests
+
+Ordering, backpressure and failure handling of the background
+group-commit writer, against the journal and SQLite storage engines.
+"""
+import threading
+import time
+
+import pytest
+
+from changelog_store import ChangelogJournal, ChangelogWriter, SQLiteChangelogStore
+
+
+def make_entry(entry_id, level="info", action="test"):
+    return {"id": entry_id, "timestamp": f"2026-01-01T00:00:{entry_id % 60:02d}",
+            "action": action, "details": f"entry {entry_id}", "user": "system",
+            "level": level}
+
+
+class RecordingStorage:
+    """Storage double that records commits and can be made to fail"""
+
+    def __init__(self):
+        self.committed = []
+        self.updates = []
+        # One flag per upcoming call: True makes that call fail
+        self.failures = []
+        self.gate = None
+
+    def append_batch(self, entries, update=False):
+        if self.gate is not None:
+            self.gate.wait()
+        if self.failures and self.failures.pop(0):
+            raise OSError("disk full")
+        for entry in entries:
+            (self.updates if update else self.committed).append(entry["id"])
+
+
+@pytest.fixture(params=["journal", "sqlite"])
+def storage(request, tmp_path):
+    if request.param == "journal":
+        store = ChangelogJournal(str(tmp_path / "journal"), fsync_batch=1000)
+    else:
+        store = SQLiteChangelogStore(str(tmp_path / "changelog.db"))
+    yield store
+    store.close()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def read_stored(storage):
+    """Latest version of every stored entry by id"""
+    if isinstance(storage, ChangelogJournal):
+        entries = storage.read_all()
+    else:
+        entries = storage.query_archive({})
+    latest = {}
+    for entry in entries:
+        latest[entry["id"]] = entry
+    return latest
+
+
+def test_entries_are_committed_in_order_when_the_queue_overflows():
+    storage = RecordingStorage()
+    storage.gate = threading.Event()
+    writer = ChangelogWriter(storage, max_queue=5, batch_size=2, batch_interval=0.01)
+    try:
+        # The writer is blocked committing, so later submits overflow the queue
+        # and are committed by the caller
+        submitter = threading.Thread(
+            target=lambda: [writer.submit(make_entry(i)) for i in range(1, 21)])
+        submitter.start()
+        storage.gate.set()
+        submitter.join(5)
+    finally:
+        writer.stop()
+    assert storage.committed == list(range(1, 21))
+    assert writer.metrics()["synchronous_writes"] > 0
+
+
+def test_failed_commit_is_retried_in_order():
+    storage = RecordingStorage()
+    storage.failures = [True, True]
+    writer = ChangelogWriter(storage, batch_size=10, batch_interval=0.01,
+                             retry_delay=0.01)
+    for i in range(1, 6):
+        writer.submit(make_entry(i))
+    assert wait_for(lambda: len(storage.committed) == 5)
+    writer.stop()
+    assert storage.committed == [1, 2, 3, 4, 5]
+    metrics = writer.metrics()
+    assert metrics["failed_commits"] == 2
+    assert metrics["entries_awaiting_retry"] == 0
+    assert metrics["entries_committed"] == 5
+
+
+def test_partially_committed_batch_is_not_committed_twice():
+    storage = RecordingStorage()
+    writer = ChangelogWriter(storage, batch_size=10, batch_interval=0.01,
+                             retry_delay=0.01)
+    writer.stop()
+    storage.failures = [False, True]
+    # New entries commit, then the update run fails and is the only thing retried
+    assert not writer._commit([(make_entry(1), False), (make_entry(1), True)])
+    assert writer._retry == [(make_entry(1), True)]
+    assert writer._commit(writer._take_pending())
+    assert storage.committed == [1]
+    assert storage.updates == [1]
+
+
+def test_updates_are_not_counted_again(storage):
+    writer = ChangelogWriter(storage, batch_size=10, batch_interval=0.01)
+    writer.submit(make_entry(1, level="warning"))
+    writer.submit(make_entry(2))
+    updated = dict(make_entry(1, level="warning"), count=5)
+    writer.submit(updated, update=True)
+    writer.submit(make_entry(3))
+    writer.stop()
+
+    latest = read_stored(storage)
+    assert sorted(latest) == [1, 2, 3]
+    assert latest[1]["count"] == 5
+    assert storage.last_id == 3
+    if isinstance(storage, ChangelogJournal):
+        segment = storage.index["segments"][-1]
+        assert segment["count"] == 3
+        assert segment["first_id"] == 1
+        assert segment["levels"] == {"warning": 1, "info": 2}
+
+
+def test_stop_commits_queued_entries(storage):
+    writer = ChangelogWriter(storage, batch_size=1000, batch_interval=5)
+    for i in range(1, 51):
+        writer.submit(make_entry(i))
+    writer.stop()
+    assert storage.last_id == 50
+    assert writer.metrics()["queue_depth"] == 0
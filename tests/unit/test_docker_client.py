@@ -0,0 +1,167 @@
+"""
+Docker Client Tests
+
+The Docker Engine API client against a fake daemon listening on a UNIX
+socket: JSON requests, error responses, keep-alive connection reuse and the
+streaming /events endpoint.
+"""
+import json
+import socketserver
+import threading
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from docker_client import (DockerAPIError, DockerClient, format_ports, format_size,
+                           published_ports, socket_path_from_env)
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, body, close=False):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        # Drop the connection without announcing it, like an idle timeout
+        self.close_connection = close
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        self.server.requests.append((self.command, url.path, parse_qs(url.query)))
+        if url.path == '/containers/json':
+            self._reply(200, [{"Id": "abc", "Names": ["/wazuh"]}],
+                        close=self.server.drop_connections)
+        elif url.path == '/events':
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for event in self.server.events:
+                line = (json.dumps(event) + '\n').encode()
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+            # Keep the stream open until the client goes away
+            self.rfile.read(1)
+            self.close_connection = True
+        else:
+            self._reply(404, {"message": f"No such container: {url.path}"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        self.server.requests.append((self.command, url.path, parse_qs(url.query)))
+        self.send_response(204)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class FakeDockerServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        super().__init__(path, FakeDockerHandler)
+        self.connections = 0
+        self.requests = []
+        self.events = []
+        self.drop_connections = False
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    server = FakeDockerServer(str(tmp_path / "docker.sock"))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(daemon):
+    client = DockerClient(daemon.server_address, timeout=5)
+    yield client
+    client.close()
+
+
+def test_requests_reuse_a_keep_alive_connection(daemon, client):
+    for _ in range(3):
+        containers = client.list_containers(all=True, filters={"name": ["wazuh"]})
+    assert containers == [{"Id": "abc", "Names": ["/wazuh"]}]
+    assert daemon.connections == 1
+    method, path, params = daemon.requests[-1]
+    assert (method, path) == ('GET', '/containers/json')
+    assert params == {"all": ["1"], "size": ["0"], "filters": ['{"name": ["wazuh"]}']}
+
+
+def test_closed_pooled_connection_is_retried(daemon, client):
+    daemon.drop_connections = True
+    assert client.list_containers()
+    assert client.list_containers()
+    assert daemon.connections == 2
+    assert len(daemon.requests) == 2
+
+
+def test_error_response_raises_docker_api_error(client):
+    with pytest.raises(DockerAPIError) as error:
+        client.inspect_container("missing/name")
+    assert error.value.status == 404
+    assert error.value.message == "No such container: /containers/missing%2Fname/json"
+
+
+def test_post_without_body(daemon, client):
+    client.stop_container("wazuh", wait=5)
+    assert daemon.requests[-1] == ('POST', '/containers/wazuh/stop', {"t": ["5"]})
+
+
+def test_event_stream_yields_events_and_closes(daemon, client):
+    daemon.events = [{"Type": "container", "Action": "start", "id": str(i)} for i in range(3)]
+    stream = client.events(filters={"type": ["container"]}, since=10)
+    received = []
+    errors = []
+
+    def read():
+        try:
+            received.extend(stream)
+        except Exception as e:
+            errors.append(e)
+
+    reader = threading.Thread(target=read)
+    reader.start()
+    while len(received) < 3 and reader.is_alive():
+        reader.join(0.05)
+    stream.close()
+    reader.join(5)
+
+    assert not reader.is_alive()
+    assert errors == []
+    assert [event["id"] for event in received] == ["0", "1", "2"]
+    assert daemon.requests[-1][2] == {"filters": ['{"type": ["container"]}'], "since": ["10"]}
+
+
+def test_socket_path_from_env():
+    assert socket_path_from_env("unix:///run/user/1000/docker.sock") == \
+        "/run/user/1000/docker.sock"
+    assert socket_path_from_env("tcp://127.0.0.1:2375") == "/var/run/docker.sock"
+    assert socket_path_from_env(None, default="/tmp/docker.sock") == "/tmp/docker.sock"
+
+
+def test_ports_and_sizes_are_formatted_like_the_cli():
+    ports = [{"IP": "0.0.0.0", "PrivatePort": 443, "PublicPort": 8443, "Type": "tcp"},
+             {"IP": "::", "PrivatePort": 443, "PublicPort": 8443, "Type": "tcp"},
+             {"PrivatePort": 9200, "Type": "tcp"}]
+    assert format_ports(ports) == "0.0.0.0:8443->443/tcp, :::8443->443/tcp, 9200/tcp"
+    assert [port.host_port for port in published_ports(ports)] == [8443, 8443]
+    assert format_size({"SizeRw": 1500, "SizeRootFs": 2_500_000_000}) == \
+        "1.5kB (virtual 2.5GB)"
+    assert format_size({}) == ''
@@ -0,0 +1,30 @@
+"""
+Host Metrics Sampler Tests
+
+Sampling on demand before the background sampler has run.
+"""
+import threading
+
+from host_metrics import HostMetricsSampler
+
+
+def test_concurrent_first_readers_share_one_sample():
+    sampler = HostMetricsSampler()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(sampler.current()))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sampler.samples_taken == 1
+    assert all(result is results[0] for result in results)
+
+
+def test_second_sample_has_rates():
+    sampler = HostMetricsSampler()
+    assert sampler.sample()["rates"] == {}
+    sample = sampler.sample()
+    assert sample["rates"]["net_bytes_recv_per_sec"] >= 0
+    assert set(sampler.current()["interfaces"]) == set(sample["interfaces"])
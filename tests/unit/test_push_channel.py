@@ -0,0 +1,97 @@
+"""
+Push Channel Tests
+
+Subscriber bookkeeping and slow-subscriber handling of the dashboard
+Server-Sent Events broadcaster, locally and through the shared state process.
+"""
+import multiprocessing
+import queue
+import time
+from itertools import count, islice
+
+from push_channel import PushBroadcaster, diff_sections
+from shared_state import SHARED_OBJECTS, connect_state, serve_state
+
+
+def make_broadcaster(max_queue=4):
+    state = {"containers": {"a": "running"}}
+    broadcaster = PushBroadcaster(lambda: (state, {}), interval=0.01,
+                                  heartbeat=0.01, max_queue=max_queue)
+    return broadcaster, state
+
+
+def test_diff_sections_reports_changed_and_removed_keys():
+    changed, removed = diff_sections(
+        {"containers": {"a": "running", "b": "running"}},
+        {"containers": {"a": "exited", "c": "running"}})
+    assert changed == {"containers": {"a": "exited", "c": "running"}}
+    assert removed == {"containers": ["b"]}
+
+
+def test_subscribe_and_unsubscribe():
+    broadcaster, _ = make_broadcaster()
+    subscriber = broadcaster.subscribe()
+    assert broadcaster.subscriber_count == 1
+    broadcaster.unsubscribe(subscriber)
+    assert broadcaster.subscriber_count == 0
+
+
+def test_slow_subscriber_is_dropped_and_its_stream_ends():
+    broadcaster, _ = make_broadcaster(max_queue=2)
+    # Registered directly so no producer thread competes with the test
+    subscriber = queue.Queue(maxsize=broadcaster.max_queue)
+    broadcaster._subscribers.add(subscriber)
+
+    for n in range(broadcaster.max_queue + 1):
+        broadcaster._publish(f"event: diff\ndata: {n}\n\n")
+
+    assert broadcaster.subscriber_count == 0
+    # Bounded so a stream that never ends fails instead of hanging
+    messages = list(islice(broadcaster.stream(subscriber), 10))
+    # retry hint and snapshot, then the stream ends without replaying stale diffs
+    assert len(messages) == 2
+    assert messages[0].startswith("retry:")
+    assert "event: snapshot" in messages[1]
+
+
+def test_fast_subscriber_keeps_receiving():
+    broadcaster, _ = make_broadcaster(max_queue=2)
+    subscriber = queue.Queue(maxsize=broadcaster.max_queue)
+    broadcaster._subscribers.add(subscriber)
+    broadcaster._publish("first")
+    assert subscriber.get_nowait() == "first"
+    broadcaster._publish("second")
+    assert subscriber.get_nowait() == "second"
+    assert broadcaster.subscriber_count == 1
+
+
+
+def serve_counting_broadcaster(address):
+    """State process whose containers section changes on every collection"""
+    collections = count()
+    broadcaster = PushBroadcaster(lambda: ({"containers": {"a": next(collections)}}, {}),
+                                  interval=0.01, heartbeat=0.5)
+    objects = {name: None for name in SHARED_OBJECTS}
+    objects["push_broadcaster"] = broadcaster
+    serve_state(objects, address, b"key")
+    time.sleep(60)
+
+
+def test_workers_listen_through_the_shared_state_process(tmp_path):
+    address = str(tmp_path / "state.sock")
+    process = multiprocessing.get_context("spawn").Process(
+        target=serve_counting_broadcaster, args=(address,), daemon=True)
+    process.start()
+    try:
+        proxy = connect_state(address, b"key", timeout=10)["push_broadcaster"]
+        messages = proxy.listen()
+        assert next(messages).startswith("retry:")
+        assert "event: snapshot" in next(messages)
+        assert proxy.metrics()["subscribers"] == 1
+        diff = next(messages)
+        assert "event: diff" in diff and '"changed":{"containers":{"a":' in diff
+        messages.close()
+        assert proxy.metrics()["subscribers"] == 0
+    finally:
+        process.terminate()
+        process.join()
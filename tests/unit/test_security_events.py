@@ -0,0 +1,67 @@
+"""
+Security Event Stream Tests
+
+Classification of changelog entries and cursor polling of the per-severity
+event rings.
+"""
+from changelog_store import SecurityEventStream
+
+
+def make_entry(entry_id, action="login_failed", level="info", details="login"):
+    return {"id": entry_id, "timestamp": f"2026-01-01T00:00:{entry_id % 60:02d}",
+            "action": action, "details": details, "user": "admin", "level": level}
+
+
+def make_stream(entries):
+    stream = SecurityEventStream(["login", "security"], max_events=100)
+    stream.rebuild(entries)
+    return stream
+
+
+def ids(events):
+    return [event["id"] for event in events]
+
+
+def test_entries_are_classified_by_severity():
+    stream = make_stream([make_entry(1, level="error"), make_entry(2, level="warning"),
+                          make_entry(3), make_entry(4, action="container_start", details="wazuh")])
+    assert stream.statistics() == {"high": 1, "medium": 1, "low": 1, "total": 3}
+    events, cursor = stream.query()
+    assert [event["severity"] for event in events] == ["high", "medium", "low"]
+    assert cursor == 3
+
+
+def test_burst_larger_than_limit_is_delivered_over_several_polls():
+    levels = ("error", "warning", "info")
+    stream = make_stream([make_entry(i, level=levels[i % 3]) for i in range(1, 11)])
+    for i in range(11, 41):
+        stream.add(make_entry(i, level=levels[i % 3]))
+
+    received = []
+    cursor = 10
+    while True:
+        events, cursor = stream.query(since=cursor, limit=20)
+        if not events:
+            break
+        assert len(events) <= 20
+        received.extend(events)
+    assert ids(received) == list(range(11, 41))
+    assert cursor == 40
+
+
+def test_cursor_skips_entries_that_are_not_events():
+    stream = make_stream([make_entry(1)])
+    stream.add(make_entry(2, action="container_start", details="wazuh"))
+    stream.add(make_entry(3))
+    assert stream.query(since=1) == ([stream.by_severity["low"][-1]], 3)
+    assert stream.query(since=3) == ([], 3)
+
+
+def test_full_load_returns_the_newest_events():
+    stream = make_stream([make_entry(i, level="error" if i % 2 else "info")
+                          for i in range(1, 31)])
+    events, cursor = stream.query(limit=5)
+    assert ids(events) == [26, 27, 28, 29, 30]
+    assert cursor == 30
+    events, _ = stream.query(severity="high", limit=3)
+    assert ids(events) == [25, 27, 29]
@@ -0,0 +1,93 @@
+"""
+Sigma Converter Tests
+
+Keying of the conversion cache and recovery of the worker pool after a
+worker dies. Conversions themselves need pySigma and are not covered here.
+"""
+import os
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from sigma_converter import SigmaConverter
+
+RULE = """
+title: Suspicious Whoami
+logsource:
+    category: process_creation
+    product: windows
+detection:
+    selection:
+        Image|endswith: '\\\\whoami.exe'
+    condition: selection
+"""
+
+
+@pytest.fixture
+def converter(tmp_path):
+    converter = SigmaConverter(str(tmp_path / "cache" / "conversions.db"), workers=1)
+    converter.version = "0.11.0"
+    yield converter
+    converter.close()
+
+
+@pytest.fixture
+def rule(tmp_path):
+    path = tmp_path / "whoami.yml"
+    path.write_text(RULE)
+    return str(path)
+
+
+def cache(converter, rule_path, target, pipelines, output=None, error=None):
+    rule_hash, _ = converter._read(rule_path)
+    converter._store([(rule_hash, target, ','.join(converter._pipelines(pipelines)),
+                       output, error)])
+
+
+def test_cached_conversion_is_keyed_by_content_not_path(converter, rule, tmp_path):
+    cache(converter, rule, "splunk", ["sysmon"], output='Image="*\\\\whoami.exe"')
+    copy = tmp_path / "copy.yml"
+    copy.write_text(RULE)
+
+    result = converter.convert(str(copy), "splunk", "sysmon")
+    assert result == {"rule": str(copy), "success": True, "cached": True,
+                      "output": 'Image="*\\\\whoami.exe"'}
+    assert converter.hits == 1
+
+
+def test_cache_key_includes_target_pipelines_and_version(converter, rule):
+    cache(converter, rule, "splunk", ["sysmon", "windows-audit"], output="query")
+    rule_hash, _ = converter._read(rule)
+
+    assert converter._lookup(rule_hash, "splunk", "sysmon,windows-audit") == ("query", None)
+    assert converter._lookup(rule_hash, "lucene", "sysmon,windows-audit") is None
+    assert converter._lookup(rule_hash, "splunk", "windows-audit,sysmon") is None
+    assert converter._lookup(rule_hash, "splunk", "") is None
+    converter.version = "0.12.0"
+    assert converter._lookup(rule_hash, "splunk", "sysmon,windows-audit") is None
+
+
+def test_cached_errors_are_returned_as_failures(converter, rule):
+    cache(converter, rule, "splunk", (), error="SigmaFeatureNotSupportedByBackendError: x")
+    result = converter.convert(rule, "splunk")
+    assert result["success"] is False and result["cached"] is True
+    assert result["error"].startswith("SigmaFeatureNotSupportedByBackendError")
+
+
+def test_batch_yields_cached_results_and_totals(converter, rule, tmp_path):
+    cache(converter, rule, "splunk", (), output="query")
+    events = list(converter.convert_batch([rule, str(tmp_path / "missing.yml")], "splunk",
+                                          include_output=False))
+
+    assert events[0] == {"event": "result", "rule": rule, "success": True, "cached": True}
+    assert events[1]["success"] is False and "missing.yml" in events[1]["error"]
+    assert {k: events[2][k] for k in ("event", "total", "converted", "failed", "cached")} == \
+        {"event": "done", "total": 2, "converted": 1, "failed": 1, "cached": 1}
+
+
+def test_pool_is_replaced_after_a_worker_dies(converter):
+    first_worker = converter._call(os.getpid)
+    with pytest.raises(BrokenProcessPool):
+        converter._call(os._exit, 1)
+    assert converter._pool is None
+    assert converter._call(os.getpid) not in (first_worker, os.getpid())
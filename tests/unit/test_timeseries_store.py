@@ -0,0 +1,84 @@
+"""
+Time-Series Store Tests
+
+Rollups into the 10s/1m/1h ring buffers, gaps, persistence and series
+migration of the trends store.
+"""
+import pytest
+
+from timeseries_store import TimeSeriesStore
+
+# Aligned to an hour so every resolution's bucket starts here
+T0 = 1_767_225_600
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), ["cpu", "memory"])
+    yield store
+    store.close()
+
+
+def test_samples_roll_up_into_every_resolution(store):
+    for offset, cpu in ((0, 10), (5, 20), (10, 30), (30, 60), (3599, 100)):
+        store.add({"cpu": cpu, "memory": 50}, when=T0 + offset)
+    now = T0 + 3599
+
+    buckets, data = store.query("1h", now=now)
+    assert len(buckets) == 360 and buckets[0] == T0 and buckets[-1] == T0 + 3590
+    assert data["cpu"][:4] == [15.0, 30.0, None, 60.0]
+    assert data["cpu"][-1] == 100.0
+
+    buckets, data = store.query("24h", ["cpu"], now=now)
+    assert len(buckets) == 1440 and buckets[-1] == T0 + 3540
+    assert data["cpu"][-60] == 30.0  # mean of 10, 20, 30 and 60 in the first minute
+    assert data["cpu"][-1] == 100.0
+    assert list(data) == ["cpu"]
+
+    buckets, data = store.query("7d", now=now)
+    assert len(buckets) == 168 and buckets[-1] == T0
+    assert data["cpu"][-1] == 44.0
+    assert data["memory"][-1] == 50.0
+
+
+def test_series_missing_from_early_samples_takes_later_values(store):
+    store.add({"cpu": 10}, when=T0)
+    store.add({"cpu": 20, "memory": 70}, when=T0 + 1)
+    store.add({"cpu": 30, "memory": None}, when=T0 + 2)
+
+    _, data = store.query("1h", now=T0)
+    assert data["cpu"][-1] == 20.0
+    assert data["memory"][-1] == 70.0
+
+
+def test_overwritten_ring_slots_are_gaps(store):
+    store.add({"cpu": 10}, when=T0)
+    # 360 slots of 10s: one hour later the same slot holds a new bucket
+    store.add({"cpu": 90}, when=T0 + 3600)
+
+    _, data = store.query("1h", now=T0 + 3600)
+    assert data["cpu"][-1] == 90.0
+    assert data["cpu"][0] is None
+    _, data = store.query("24h", now=T0 + 3600)
+    assert data["cpu"][-61] == 10.0
+
+
+def test_trends_survive_reopening_and_series_changes(tmp_path):
+    store = TimeSeriesStore(str(tmp_path), ["cpu", "memory"])
+    store.add({"cpu": 10, "memory": 50}, when=T0)
+    store.close()
+
+    reopened = TimeSeriesStore(str(tmp_path), ["cpu", "memory"])
+    assert reopened.query("1h", now=T0)[1]["cpu"][-1] == 10.0
+    reopened.close()
+
+    migrated = TimeSeriesStore(str(tmp_path), ["disk", "cpu"])
+    try:
+        _, data = migrated.query("1h", now=T0)
+        assert data["cpu"][-1] == 10.0
+        assert data["disk"][-1] is None
+        assert "memory" not in data
+        migrated.add({"disk": 80}, when=T0 + 1)
+        assert migrated.query("1h", now=T0)[1]["disk"][-1] == 80.0
+    finally:
+        migrated.close()
@@ -0,0 +1,121 @@
+"""
+YARA Engine Tests
+
+Keying of the scan result cache by file content and ruleset version, and
+fingerprinting and reuse of compiled rulesets.
+"""
+import os
+import threading
+
+import pytest
+
+from yara_engine import ScanResultCache, YaraRulesetCache, content_digest, scan_file
+
+RULES = """
+rule marker_string
+{
+    strings:
+        $marker = "EVIL-MARKER"
+    condition:
+        $marker
+}
+"""
+
+MATCHES = [{"rule": "marker_string", "namespace": "default", "tags": [], "meta": {},
+            "strings": []}]
+
+
+@pytest.fixture
+def results(tmp_path):
+    return ScanResultCache(str(tmp_path / "cache" / "results.db"))
+
+
+def test_results_are_keyed_by_digest_and_ruleset(results):
+    digest = content_digest(b"EVIL-MARKER")
+    results.put(digest, "ruleset-1", MATCHES, 11)
+
+    assert results.get(digest, "ruleset-1") == MATCHES
+    assert results.get(digest, "ruleset-2") is None
+    assert results.get(content_digest(b"clean"), "ruleset-1") is None
+    assert (results.hits, results.misses) == (1, 2)
+
+
+def test_content_digest_depends_only_on_content():
+    assert content_digest(b"abc") == content_digest(bytearray(b"abc"))
+    assert content_digest(b"abc") != content_digest(b"abd")
+    assert content_digest(b"").split(":")[0] in ("xxh3", "sha256")
+
+
+def test_new_ruleset_version_drops_only_its_old_results(results):
+    results.set_ruleset("/rules/a.yar", "a-1")
+    results.set_ruleset("/rules/b.yar", "b-1")
+    results.put("d1", "a-1", MATCHES, 1)
+    results.put("d1", "b-1", MATCHES, 1)
+
+    results.set_ruleset("/rules/a.yar", "a-1")
+    assert results.stats()["entries"] == 2
+
+    results.set_ruleset("/rules/a.yar", "a-2")
+    assert results.get("d1", "a-1") is None
+    assert results.get("d1", "b-1") == MATCHES
+
+
+def test_results_are_shared_across_threads_and_reopening(results, tmp_path):
+    thread = threading.Thread(target=results.put, args=("d1", "r1", MATCHES, 1))
+    thread.start()
+    thread.join()
+    assert results.get("d1", "r1") == MATCHES
+
+    reopened = ScanResultCache(str(tmp_path / "cache" / "results.db"))
+    assert reopened.get("d1", "r1") == MATCHES
+
+
+def test_fingerprint_follows_included_files(tmp_path):
+    index = tmp_path / "index.yar"
+    included = tmp_path / "rules" / "marker.yar"
+    included.parent.mkdir()
+    included.write_text(RULES)
+    index.write_text('include "rules/marker.yar"\n')
+    cache = YaraRulesetCache(str(tmp_path / "compiled"))
+
+    before = cache.fingerprint(str(index))
+    assert cache.fingerprint(str(index)) == before
+    included.write_text(RULES + "\n// changed\n")
+    os.utime(included, ns=(0, 10 ** 18))
+    assert cache.fingerprint(str(index)) != before
+
+
+def test_compiled_rulesets_are_reused(tmp_path):
+    pytest.importorskip("yara")
+    rule_path = tmp_path / "rules.yar"
+    rule_path.write_text(RULES)
+
+    cache = YaraRulesetCache(str(tmp_path / "compiled"))
+    _, fingerprint, source = cache.get(str(rule_path))
+    assert source == "compiled"
+    assert cache.get(str(rule_path))[1:] == (fingerprint, "memory")
+    # Another process loads the saved blob instead of compiling
+    assert YaraRulesetCache(str(tmp_path / "compiled")).get(str(rule_path))[1:] == \
+        (fingerprint, "disk")
+
+
+def test_identical_content_is_scanned_once(tmp_path, results):
+    pytest.importorskip("yara")
+    rule_path = tmp_path / "rules.yar"
+    rule_path.write_text(RULES)
+    rules, fingerprint, _ = YaraRulesetCache(str(tmp_path / "compiled")).get(str(rule_path))
+    first = tmp_path / "first.txt"
+    copy = tmp_path / "copy.txt"
+    first.write_text("EVIL-MARKER")
+    copy.write_text("EVIL-MARKER")
+
+    matches, cached = scan_file(rules, str(first), results=results, ruleset=fingerprint)
+    assert not cached and [m["rule"] for m in matches] == ["marker_string"]
+    matches, cached = scan_file(rules, str(copy), results=results, ruleset=fingerprint)
+    assert cached and matches[0]["file"] == str(copy)
+
+    copy.write_text("clean")
+    assert scan_file(rules, str(copy), results=results, ruleset=fingerprint) == ([], False)
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    assert scan_file(rules, str(empty), results=results, ruleset=fingerprint) == ([], False)
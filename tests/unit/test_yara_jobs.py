@@ -0,0 +1,133 @@
+"""
+YARA Scan Job Tests
+
+Resuming interrupted scan jobs from the ledger and completeness of the
+match streams of running and finished jobs.
+"""
+import json
+import time
+
+import pytest
+
+yara = pytest.importorskip("yara")
+
+from yara_jobs import ScanJobManager  # noqa: E402
+
+RULES = """
+rule marker_string
+{
+    strings:
+        $marker = "EVIL-MARKER"
+    condition:
+        $marker
+}
+"""
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """Rule file and a target tree where every third file matches"""
+    rule_path = tmp_path / "rules.yar"
+    rule_path.write_text(RULES)
+    target = tmp_path / "target"
+    for n in range(60):
+        folder = target / f"dir{n % 4}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"file{n}.txt").write_text("EVIL-MARKER" if n % 3 == 0 else "clean")
+    return str(rule_path), str(target)
+
+
+def make_manager(tmp_path, **kwargs):
+    return ScanJobManager(str(tmp_path / "jobs"), str(tmp_path / "cache"),
+                          str(tmp_path / "cache" / "results.db"), workers=2,
+                          batch_files=4, **kwargs)
+
+
+def wait_finished(manager, job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while manager.jobs[job_id]["status"] in ("queued", "running"):
+        assert time.monotonic() < deadline, "scan job did not finish"
+        time.sleep(0.05)
+    return manager.status(job_id)
+
+
+def test_stream_of_finished_job_has_every_match(tmp_path, tree):
+    rule_path, target = tree
+    manager = make_manager(tmp_path)
+    try:
+        job = manager.submit(target, rule_path, "rules.yar")
+        events = list(manager.stream(job["id"]))
+    finally:
+        manager.close()
+    matches = [event for event in events if event["event"] == "match"]
+    assert events[-1]["event"] == "status"
+    assert events[-1]["status"] == "completed"
+    assert len(matches) == events[-1]["matches"] == 20
+    assert [event["index"] for event in matches] == list(range(20))
+
+
+def test_rescan_skips_unchanged_files_and_streams_their_matches(tmp_path, tree):
+    rule_path, target = tree
+    manager = make_manager(tmp_path)
+    try:
+        first = manager.submit(target, rule_path, "rules.yar")
+        wait_finished(manager, first["id"])
+        second = manager.submit(target, rule_path, "rules.yar")
+        # Followed from the start: skipped files' matches must not be lost
+        events = list(manager.stream(second["id"]))
+    finally:
+        manager.close()
+    status = events[-1]
+    assert status["files_skipped"] == 60
+    assert status["files_scanned"] == 0
+    assert len([event for event in events if event["event"] == "match"]) == status["matches"] == 20
+
+
+def test_interrupted_job_resumes_from_the_ledger(tmp_path, tree):
+    rule_path, target = tree
+    manager = make_manager(tmp_path)
+    job = manager.submit(target, rule_path, "rules.yar")
+    wait_finished(manager, job["id"])
+    manager.close()
+
+    # Mark the job as interrupted, as a portal stopped mid-scan leaves it
+    job_file = tmp_path / "jobs" / f"{job['id']}.json"
+    state = json.loads(job_file.read_text())
+    state["status"] = "running"
+    job_file.write_text(json.dumps(state))
+
+    manager = make_manager(tmp_path)
+    try:
+        assert manager.resume() == 1
+        status = wait_finished(manager, job["id"])
+        events = list(manager.stream(job["id"]))
+    finally:
+        manager.close()
+    assert status["status"] == "completed"
+    assert status["resumed"] == 1
+    assert status["files_skipped"] == 60
+    assert len([event for event in events if event["event"] == "match"]) == 20
+
+
+def test_stream_reads_matches_written_as_the_job_finishes(tmp_path):
+    manager = make_manager(tmp_path)
+    job_id = "finishing"
+    matches_path = tmp_path / "jobs" / f"{job_id}.matches.jsonl"
+    matches_path.write_text(json.dumps({"file": "a", "rule": "r"}) + "\n")
+
+    class FinishingJobs(dict):
+        """Finishes the job (writing its last match) when the stream checks its status"""
+
+        def get(self, key, default=None):
+            job = dict.get(self, key, default)
+            if job is not None and job["status"] == "running":
+                with open(matches_path, "a") as f:
+                    f.write(json.dumps({"file": "b", "rule": "r"}) + "\n")
+                job["status"] = "completed"
+            return job
+
+    manager.jobs = FinishingJobs({job_id: {"id": job_id, "status": "running",
+                                           "created": "2026-01-01T00:00:00"}})
+    events = list(manager.stream(job_id))
+    assert [event["file"] for event in events if event["event"] == "match"] == ["a", "b"]
+    assert events[-1]["event"] == "status"